@@ -0,0 +1,127 @@
+"""
+Async-чтение горячих эндпоинтов под ASGI: лента и карточка объявления, категории
+(диалоги — chat.async_views). GET в JSON обслуживает корутина на async ORM, запросы
+к БД не держат воркер; запись и Browsable API (?format=api, Accept: text/html)
+уходят в исходный DRF-вьюсет. Фильтры, пагинатор, кэш ответов и сериализатор —
+те же объекты, что у вьюсета, поэтому и JSON тот же.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from users.authentication import aauthenticate
+from . import catalog
+from .renderers import ORJSONRenderer
+from .serializers import PetReadSerializer
+from .views import CategoryViewSet, PetViewSet
+
+renderer = ORJSONRenderer()
+
+
+def wants_json(request):
+    return request.GET.get('format', 'json') == 'json' and 'text/html' not in request.headers.get('Accept', '')
+
+
+def json_response(data, status=200):
+    return HttpResponse(renderer.render(data), status=status, content_type=renderer.media_type)
+
+
+def error_response(exc):
+    """Как exception_handler DRF: {"detail": ...} или ошибки валидации как есть"""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = json_response(data, status=exc.status_code)
+    if isinstance(exc, exceptions.NotAuthenticated):
+        response['WWW-Authenticate'] = 'Bearer realm="api"'
+    return response
+
+
+def async_read(fallback):
+    """
+    GET/HEAD в JSON — декорированная корутина, остальное — fallback (DRF-вьюха) в потоке.
+    Корутина получает DRF Request с уже определённым пользователем.
+    """
+    view_class = getattr(fallback, 'cls', None)
+    fallback = sync_to_async(fallback)
+
+    def decorator(handler):
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not wants_json(request):
+                return await fallback(request, *args, **kwargs)
+            try:
+                drf_request = Request(request, authenticators=())
+                drf_request.user = await aauthenticate(request)
+                drf_request.accepted_renderer = renderer
+                drf_request.accepted_media_type = renderer.media_type
+                return await handler(drf_request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(exc)
+
+        # CSRF для записи проверяет DRF (SessionAuthentication) внутри fallback
+        view.csrf_exempt = True
+        # как у DRF as_view: по классу вьюсета pet_project.db_routing выбирает реплику
+        view.cls = view_class
+        return view
+
+    return decorator
+
+
+def viewset_for(viewset_class, request, action, basename, **kwargs):
+    """Экземпляр DRF-вьюсета без dispatch — ради его queryset, фильтров, пагинатора и прав"""
+    view = viewset_class(
+        request=request, args=(), kwargs=kwargs, action=action, basename=basename, format_kwarg=None, headers={},
+    )
+    # как APIView.check_permissions; 401 вместо 403 для анонима — аутентификация уже прошла выше
+    for permission in view.get_permissions():
+        if not permission.has_permission(request, view):
+            if not request.user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+    return view
+
+
+async def pet_data(view, rows, many=False):
+    # каталог категорий — заранее и без блокировки цикла событий
+    context = {**view.get_serializer_context(), 'categories': await catalog.aget_categories()}
+    return PetReadSerializer(rows, many=many, context=context).data
+
+
+@async_read(PetViewSet.as_view({'get': 'list', 'post': 'create'}, basename='pets'))
+async def pet_list(request):
+    view = viewset_for(PetViewSet, request, 'list', 'pets')
+    cached = await view.acached_response(request)
+    if cached is not None:
+        return await view.afinalize_content(request, cached)
+
+    queryset = PetReadSerializer.values(view.filter_queryset(view.get_queryset()))
+    page = await view.paginator.apaginate_queryset(queryset, request, view)
+    data = view.paginator.get_paginated_response(await pet_data(view, page, many=True)).data
+    return await view.afinalize_content(request, json_response(data))
+
+
+@async_read(PetViewSet.as_view(
+    {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}, basename='pets'
+))
+async def pet_detail(request, pk):
+    view = viewset_for(PetViewSet, request, 'retrieve', 'pets', pk=pk)
+    cached = await view.acached_response(request)
+    if cached is not None:
+        return await view.afinalize_content(request, cached)
+
+    row = await PetReadSerializer.values(view.filter_queryset(view.get_queryset())).filter(pk=pk).afirst()
+    if row is None:
+        raise exceptions.NotFound()
+    return await view.afinalize_content(request, json_response(await pet_data(view, row)))
+
+
+@async_read(CategoryViewSet.as_view({'get': 'list'}, basename='categories'))
+async def category_list(request):
+    view = viewset_for(CategoryViewSet, request, 'list', 'categories')
+    cached = await view.acached_response(request)
+    if cached is not None:
+        return await view.afinalize_content(request, cached)
+    categories = await catalog.aget_categories()
+    return await view.afinalize_content(request, json_response(list(categories.values())))
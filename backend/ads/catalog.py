@@ -0,0 +1,70 @@
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Q
+
+from .models import Category
+from .response_cache import get_cache
+
+# Версия каталога хранится в общем кэше ответов (RESPONSE_CACHE['ALIAS'], Redis) — так инвалидация
+# доходит до всех воркеров, а сами данные живут в памяти процесса
+CATALOG_VERSION_KEY = 'ads:category_catalog:version'
+CATALOG_TTL = 300  # страховка на случай пропущенной инвалидации (сек)
+
+_lock = threading.Lock()
+_state = {'version': None, 'built_at': 0.0, 'items': {}}
+
+
+def annotated_categories():
+    """Категории с количеством активных объявлений — один агрегирующий запрос"""
+    return Category.objects.annotate(
+        pet_count=Count('pet', filter=Q(pet__is_active=True))
+    ).order_by('name')
+
+
+def get_version():
+    return get_cache().get_or_set(CATALOG_VERSION_KEY, time.time_ns(), None)
+
+
+def get_categories():
+    """Словарь {id: данные категории} из локального кэша процесса"""
+    version = get_version()
+    if _state['version'] == version and time.monotonic() - _state['built_at'] < CATALOG_TTL:
+        return _state['items']
+
+    from .serializers import CategorySerializer
+
+    with _lock:
+        if _state['version'] == version and time.monotonic() - _state['built_at'] < CATALOG_TTL:
+            return _state['items']
+        items = {
+            item['id']: dict(item)
+            for item in CategorySerializer(annotated_categories(), many=True).data
+        }
+        _state.update(version=version, built_at=time.monotonic(), items=items)
+    return items
+
+
+async def aget_categories():
+    """get_categories для async-вьюх: версия — через async API кэша, сборка — в потоке БД"""
+    version = await get_cache().aget_or_set(CATALOG_VERSION_KEY, time.time_ns(), None)
+    if _state['version'] == version and time.monotonic() - _state['built_at'] < CATALOG_TTL:
+        return _state['items']
+    return await sync_to_async(get_categories)()
+
+
+def get_category(category_id):
+    if category_id is None:
+        return None
+    return get_categories().get(category_id)
+
+
+def invalidate():
+    """Сбрасывает каталог во всех процессах (новая версия в общем кэше)"""
+    cache = get_cache()
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+    _state['version'] = None
@@ -0,0 +1,244 @@
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.db import models, close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+DEFAULT_VIEW_COUNTER = {
+    'BACKEND': 'ads.counters.LocalViewCounterBackend',
+    'OPTIONS': {},
+    'DEDUP_WINDOW': 30 * 60,  # повторный просмотр того же клиента не считаем (сек)
+    'FLUSH_INTERVAL': 10,  # фоновый сброс для локального бэкенда, 0 — только командой
+}
+
+logger = logging.getLogger(__name__)
+
+
+class LocalViewCounterBackend:
+    """
+    Буфер просмотров в памяти процесса. Отметки «уже смотрел» — LRU не больше max_seen:
+    при переполнении забываются самые старые, это только ослабляет отсечение повторов
+    """
+
+    def __init__(self, max_seen=100_000, **options):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        # окно одно на всех, поэтому порядок вставки — это и порядок истечения
+        self._seen = OrderedDict()
+        self._max_seen = max_seen
+
+    def incr(self, pet_id, amount=1):
+        with self._lock:
+            self._pending[pet_id] += amount
+            return self._pending[pet_id]
+
+    def pending(self, pet_id):
+        return self._pending.get(pet_id, 0)
+
+    def drain(self):
+        """(партия, {pet_id: дельта}); партия передаётся в ack или restore"""
+        with self._lock:
+            pending, self._pending = dict(self._pending), defaultdict(int)
+        return None, pending
+
+    def ack(self, batch):
+        pass
+
+    def restore(self, batch, deltas):
+        with self._lock:
+            for pet_id, amount in deltas.items():
+                self._pending[pet_id] += amount
+
+    def seen(self, pet_id, client_key, window):
+        """True, если клиент уже смотрел объявление в пределах окна"""
+        now = time.monotonic()
+        key = (pet_id, client_key)
+        with self._lock:
+            while self._seen and next(iter(self._seen.values())) <= now:
+                self._seen.popitem(last=False)
+            if key in self._seen:
+                return True
+            self._seen[key] = now + window
+            if len(self._seen) > self._max_seen:
+                self._seen.popitem(last=False)
+            return False
+
+
+# RENAME + HGETALL одним скриптом: параллельный сброс (поток каждого воркера, flush_views)
+# получает либо весь хэш, либо пустой ответ, а не ошибку «no such key»
+DRAIN_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {}
+end
+redis.call('RENAME', KEYS[1], KEYS[2])
+return redis.call('HGETALL', KEYS[2])
+"""
+# вернуть партию в буфер и удалить её — тоже атомарно
+RESTORE_SCRIPT = """
+local raw = redis.call('HGETALL', KEYS[2])
+for i = 1, #raw, 2 do
+    redis.call('HINCRBY', KEYS[1], raw[i], raw[i + 1])
+end
+redis.call('DEL', KEYS[2])
+return #raw / 2
+"""
+
+
+class RedisViewCounterBackend:
+    """
+    Общий для всех воркеров буфер в Redis (HINCRBY + SET NX EX).
+    Снятая партия живёт в отдельном ключе, пока UPDATE не закоммичен: партии, брошенные
+    упавшим сбросом, старше orphan_after секунд возвращаются в буфер при следующем сбросе
+    """
+
+    def __init__(self, client=None, url=None, prefix='ads:views', orphan_after=300):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(
+                url or f'redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/0'
+            )
+        self.client = client
+        self.hash_key = f'{prefix}:pending'
+        self.prefix = prefix
+        self.orphan_after = orphan_after
+        self.drain_script = client.register_script(DRAIN_SCRIPT)
+        self.restore_script = client.register_script(RESTORE_SCRIPT)
+
+    def incr(self, pet_id, amount=1):
+        return int(self.client.hincrby(self.hash_key, pet_id, amount))
+
+    def pending(self, pet_id):
+        return int(self.client.hget(self.hash_key, pet_id) or 0)
+
+    def drain(self):
+        # новые просмотры копятся уже в свежем хэше
+        self.recover_orphans()
+        draining_key = f'{self.hash_key}:draining:{time.time_ns()}'
+        raw = self.drain_script(keys=[self.hash_key, draining_key])
+        if not raw:
+            return None, {}
+        return draining_key, {int(pet_id): int(amount) for pet_id, amount in zip(raw[::2], raw[1::2])}
+
+    def ack(self, batch):
+        self.client.delete(batch)
+
+    def restore(self, batch, deltas):
+        self.restore_script(keys=[self.hash_key, batch])
+
+    def recover_orphans(self):
+        """Возвращает в буфер партии сбросов, упавших между снятием и коммитом"""
+        deadline = time.time_ns() - self.orphan_after * 10 ** 9
+        for key in self.client.scan_iter(match=f'{self.hash_key}:draining:*'):
+            key = key.decode() if isinstance(key, bytes) else key
+            if int(key.rsplit(':', 1)[1]) < deadline:
+                self.restore_script(keys=[self.hash_key, key])
+
+    def seen(self, pet_id, client_key, window):
+        key = f'{self.prefix}:seen:{pet_id}:{client_key}'
+        return not self.client.set(key, 1, nx=True, ex=int(window))
+
+
+def get_config():
+    return {**DEFAULT_VIEW_COUNTER, **getattr(settings, 'VIEW_COUNTER', {})}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_flusher = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = get_config()
+                _backend = import_string(config['BACKEND'])(**config['OPTIONS'])
+    return _backend
+
+
+def set_backend(backend):
+    """Подмена бэкенда (например, фейковым Redis-клиентом)"""
+    global _backend
+    _backend = backend
+
+
+def record_view(pet_id, persisted_count, client_key=None):
+    """
+    Учитывает просмотр без UPDATE строки объявления.
+    Возвращает число для показа: сохранённое значение + накопленная дельта.
+    """
+    backend = get_backend()
+    config = get_config()
+    if client_key and config['DEDUP_WINDOW'] and backend.seen(pet_id, client_key, config['DEDUP_WINDOW']):
+        return persisted_count + backend.pending(pet_id)
+    _ensure_flusher(backend, config)
+    return persisted_count + backend.incr(pet_id)
+
+
+def flush_views(backend=None):
+    """Записывает накопленные просмотры одним UPDATE ... CASE. Возвращает число объявлений."""
+    from .models import Pet
+
+    backend = backend or get_backend()
+    batch, deltas = backend.drain()
+    if not deltas:
+        return 0
+    try:
+        Pet.objects.filter(id__in=deltas.keys()).update(
+            views_count=models.F('views_count') + models.Case(
+                *[models.When(id=pet_id, then=models.Value(amount)) for pet_id, amount in deltas.items()],
+                default=models.Value(0),
+                output_field=models.PositiveIntegerField(),
+            )
+        )
+    except Exception:
+        backend.restore(batch, deltas)  # не теряем просмотры при сбое БД
+        raise
+    # партия снимается только после коммита UPDATE
+    transaction.on_commit(partial(backend.ack, batch))
+    return len(deltas)
+
+
+def _ensure_flusher(backend, config):
+    """
+    Локальный буфер виден только своему процессу — сбрасываем его фоновым потоком
+    и ещё раз при штатном завершении (SIGTERM воркера gunicorn/uvicorn при деплое)
+    """
+    global _flusher
+    if _flusher is not None or not isinstance(backend, LocalViewCounterBackend):
+        return
+    with _backend_lock:
+        if _flusher is None:
+            atexit.register(_flush_on_exit, backend)
+            interval = config['FLUSH_INTERVAL']
+            # без интервала — только сброс при завершении
+            _flusher = False
+            if interval:
+                _flusher = threading.Thread(
+                    target=_flush_loop, args=(backend, interval), name='views-flusher', daemon=True
+                )
+                _flusher.start()
+
+
+def _flush_on_exit(backend):
+    try:
+        flush_views(backend)
+    except Exception:
+        logger.exception('Просмотры не сброшены при завершении процесса')
+
+
+def _flush_loop(backend, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            flush_views(backend)
+        except Exception:
+            logger.exception('Не удалось сбросить буфер просмотров')
+        finally:
+            close_old_connections()
@@ -1,6 +1,33 @@
 import django_filters
+from django import forms
+from rest_framework import filters
+
+from . import geo
 from .models import Pet
 
+NEAR_PARAM = 'near'
+# ?ordering=distance вместе с near= — ближайшие первыми (постранично, см. PetPagination)
+DISTANCE_ORDERING = 'distance'
+
+
+class PointField(forms.Field):
+    """'широта,долгота' -> (широта, долгота)"""
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            latitude, longitude = (float(part) for part in value.split(','))
+        except ValueError:
+            raise forms.ValidationError('Ожидается широта,долгота', code='invalid')
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise forms.ValidationError('Координаты вне диапазона', code='invalid')
+        return latitude, longitude
+
+
+class PointFilter(django_filters.Filter):
+    field_class = PointField
+
 
 class PetFilter(django_filters.FilterSet):
     price_min = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
@@ -8,7 +35,27 @@ class PetFilter(django_filters.FilterSet):
     breed = django_filters.CharFilter(lookup_expr='iexact')
     category = django_filters.CharFilter(field_name='category__slug', lookup_expr='iexact')
     is_active = django_filters.BooleanFilter()
+    near = PointFilter(method='filter_near')
+    radius_km = django_filters.NumberFilter(method='filter_radius', min_value=0.01, max_value=geo.MAX_RADIUS_KM)
 
     class Meta:
         model = Pet
-        fields = ['breed', 'category', 'is_active', 'price_min', 'price_max']
+        fields = ['breed', 'category', 'is_active', 'price_min', 'price_max', 'near', 'radius_km']
+
+    def filter_near(self, queryset, name, value):
+        radius_km = float(self.form.cleaned_data.get('radius_km') or geo.DEFAULT_RADIUS_KM)
+        return geo.nearby(queryset, *value, radius_km)
+
+    def filter_radius(self, queryset, name, value):
+        # радиус — параметр near, без near не фильтрует
+        return queryset
+
+
+class PetOrderingFilter(filters.OrderingFilter):
+    """OrderingFilter и ?ordering=distance для запросов с near= — после поиска, последним"""
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_param)
+        if ordering == DISTANCE_ORDERING and geo.DISTANCE_ANNOTATION in queryset.query.annotations:
+            return queryset.order_by(geo.DISTANCE_ANNOTATION, 'id')
+        return super().filter_queryset(request, queryset, view)
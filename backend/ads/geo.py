@@ -0,0 +1,207 @@
+"""
+Поиск объявлений рядом с точкой.
+
+У объявления есть координаты и geohash (PRECISION символов) под B-tree индексом.
+Соседние точки имеют общий префикс geohash. Поэтому круг поиска сначала покрывается
+ячейками geohash, и каждая ячейка даёт диапазон индекса [prefix, следующий prefix).
+Точное расстояние (гаверсинус) считается только для строк из этих диапазонов.
+
+Геокодирование офлайн: газеттир городов (GAZETTEER_PATH, CSV name,latitude,longitude,population,aliases).
+"""
+import csv
+import math
+import re
+from functools import cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 9  # ячейка ~5×5 м
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 500
+# больше ячеек — точнее отсев, но длиннее OR диапазонов в запросе
+MAX_CELLS = 16
+DISTANCE_ANNOTATION = 'distance_km'
+
+DEFAULT_GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'gazetteer.csv'
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # биты чередуются: долгота, широта, долгота...
+        target, point = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (target[0] + target[1]) / 2
+        value <<= 1
+        if point >= middle:
+            value |= 1
+            target[0] = middle
+        else:
+            target[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(высота, ширина) ячейки в градусах"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def covering_cells(latitude, longitude, radius_km, max_cells=MAX_CELLS):
+    """
+    Ячейки geohash, покрывающие прямоугольник вокруг круга: самые мелкие, каких
+    не больше max_cells. Пустой префикс — вся Земля (отсева нет).
+    """
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+    widest = math.cos(math.radians(max(abs(south), abs(north))))
+    delta_lon = 180.0 if widest < 1e-9 else math.degrees(radius_km / (EARTH_RADIUS_KM * widest))
+    if delta_lon >= 180:
+        west, east = -180.0, 180.0 - 1e-9
+    else:
+        west, east = longitude - delta_lon, longitude + delta_lon
+
+    for precision in range(PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows_total, columns_total = round(180 / height), round(360 / width)
+        rows = range(
+            min(int((south + 90) // height), rows_total - 1),
+            min(int((north + 90) // height), rows_total - 1) + 1,
+        )
+        first, last = int((west + 180) // width), int((east + 180) // width)
+        if len(rows) * (last - first + 1) > max_cells:
+            continue
+        # через антимеридиан номера колонок заворачиваются
+        columns = {column % columns_total for column in range(first, last + 1)}
+        return sorted({
+            encode(-90 + (row + 0.5) * height, -180 + (column + 0.5) * width, precision)
+            for row in rows for column in columns
+        })
+    return ['']
+
+
+def successor(prefix):
+    """Наименьший префикс после всех строк, начинающихся с prefix; None — таких нет"""
+    while prefix:
+        position = BASE32.index(prefix[-1])
+        if position + 1 < len(BASE32):
+            return prefix[:-1] + BASE32[position + 1]
+        prefix = prefix[:-1]
+    return None
+
+
+def cell_ranges(cells):
+    """[(от, до)) по ячейкам; соседние по порядку geohash диапазоны склеиваются"""
+    ranges = []
+    for cell in sorted(cells):
+        high = successor(cell)
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1] = (ranges[-1][0], high)
+        else:
+            ranges.append((cell, high))
+    return ranges
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(math.sqrt(a), 1.0))
+
+
+def distance_expression(latitude, longitude):
+    """Гаверсинус до точки в SQL (км); Least — защита asin от погрешности округления"""
+    phi = math.radians(latitude)
+    row_phi = Radians(F('latitude'))
+    half_dlat = (row_phi - Value(phi)) / 2
+    half_dlon = (Radians(F('longitude')) - Value(math.radians(longitude))) / 2
+    a = Power(Sin(half_dlat), 2) + Value(math.cos(phi)) * Cos(row_phi) * Power(Sin(half_dlon), 2)
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), Value(1.0)), output_field=FloatField())
+
+
+def prefilter(latitude, longitude, radius_km):
+    """Условие по диапазонам geohash — только индекс, без вычислений на строку"""
+    condition = Q()
+    for low, high in cell_ranges(covering_cells(latitude, longitude, radius_km)):
+        condition |= Q(geohash__gte=low, geohash__lt=high) if high else Q(geohash__gte=low)
+    return condition
+
+
+def nearby(queryset, latitude, longitude, radius_km):
+    """Объявления в радиусе radius_km с аннотацией distance_km (км до точки)"""
+    return (
+        queryset.filter(prefilter(latitude, longitude, radius_km), geohash__isnull=False)
+        .annotate(**{DISTANCE_ANNOTATION: distance_expression(latitude, longitude)})
+        .filter(**{f'{DISTANCE_ANNOTATION}__lte': radius_km})
+    )
+
+
+def normalize_place(text):
+    text = text.lower().replace('ё', 'е')
+    text = re.sub(r'^\s*(г\.|г\s|город\s)\s*', '', text)
+    return re.sub(r'\s+', ' ', text).strip(' .')
+
+
+@cache
+def load_places():
+    """Строки газеттира: [(название, широта, долгота, население, [синонимы])]"""
+    path = getattr(settings, 'GAZETTEER_PATH', None) or DEFAULT_GAZETTEER_PATH
+    with open(path, encoding='utf-8', newline='') as file:
+        return [
+            (
+                row['name'], float(row['latitude']), float(row['longitude']), int(row['population'] or 0),
+                [alias for alias in (row.get('aliases') or '').split('|') if alias],
+            )
+            for row in csv.DictReader(file)
+        ]
+
+
+@cache
+def load_gazetteer():
+    """{нормализованное название или синоним: (широта, долгота)}"""
+    index = {}
+    for name, latitude, longitude, _, aliases in load_places():
+        for variant in [name, *aliases]:
+            index.setdefault(normalize_place(variant), (latitude, longitude))
+    return index
+
+
+def geocode(text):
+    """(широта, долгота) города из текста вроде «г. Москва» или «Россия, Казань»; None — не найден"""
+    if not text:
+        return None
+    places = load_gazetteer()
+    for part in [text, *text.split(',')]:
+        point = places.get(normalize_place(part))
+        if point:
+            return point
+    return None
+
+
+def locate(pet, owner_location=None):
+    """
+    Заполняет место объявления: текст по умолчанию — город владельца (owner_location,
+    иначе pet.user.location), координаты, если не заданы явно, — из газеттира, geohash — по координатам.
+    """
+    if not pet.location:
+        if owner_location is None and pet.user_id:
+            owner_location = getattr(pet.user, 'location', '')
+        pet.location = owner_location or ''
+    if (pet.latitude is None or pet.longitude is None) and pet.location:
+        pet.latitude, pet.longitude = geocode(pet.location) or (None, None)
+    has_point = pet.latitude is not None and pet.longitude is not None
+    pet.geohash = encode(pet.latitude, pet.longitude) if has_point else None
+    return pet
@@ -0,0 +1,69 @@
+"""
+Обработка фото объявлений на Pillow. Модуль не зависит от Django:
+render_variants выполняется в дочерних процессах пула (см. ads.photos).
+"""
+import hashlib
+import re
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+# вариант -> (ширина, высота, обрезать точно под размер)
+VARIANTS = {
+    'thumb': (400, 300, True),
+    'medium': (800, 800, False),
+    'large': (1600, 1600, False),
+}
+
+# формат -> (кодек Pillow, расширение, параметры сохранения)
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+DIGEST_LENGTH = 16
+# имя файла варианта: <хэш содержимого>_<вариант>.<расширение>
+VARIANT_NAME_RE = re.compile(
+    rf"[0-9a-f]{{{DIGEST_LENGTH}}}_(?:{'|'.join(VARIANTS)})\.(?:{'|'.join(ext for _, ext, _ in FORMATS.values())})"
+)
+
+
+def render_variants(data):
+    """
+    Байты исходника -> {вариант: {'width', 'height', 'jpeg': (имя, байты), 'webp': (имя, байты)}}.
+    Ориентация из EXIF применяется к пикселям, сами метаданные (включая GPS) не сохраняются.
+    Имена файлов — хэш содержимого, поэтому их можно кэшировать бессрочно.
+    """
+    with Image.open(BytesIO(data)) as source:
+        icc_profile = source.info.get('icc_profile')
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    result = {}
+    for variant, (width, height, crop) in VARIANTS.items():
+        if crop:
+            resized = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail((width, height), Image.Resampling.LANCZOS)
+
+        item = {'width': resized.width, 'height': resized.height}
+        for fmt, (codec, ext, options) in FORMATS.items():
+            content = encode(resized, codec, options, icc_profile)
+            digest = hashlib.sha256(content).hexdigest()[:DIGEST_LENGTH]
+            item[fmt] = (f'{digest}_{variant}.{ext}', content)
+        result[variant] = item
+    return result
+
+
+def encode(image, codec, options, icc_profile=None):
+    if codec == 'JPEG' and image.mode == 'RGBA':
+        # в JPEG нет прозрачности — кладём на белый фон
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    if icc_profile:
+        options = {**options, 'icc_profile': icc_profile}
+    image.save(buffer, codec, **options)
+    return buffer.getvalue()
@@ -0,0 +1,106 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ads.management.commands.run_benchmarks import Command as Benchmarks, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Горячие GET под нагрузкой: WSGI (N синхронных воркеров, как gunicorn sync) против ASGI "
+        "(async-вьюхи в одном цикле событий). Замкнутая нагрузка: C клиентов шлют запросы подряд"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=32, help="Одновременных клиентов")
+        parser.add_argument("--requests", type=int, default=400, help="Запросов на эндпоинт")
+        parser.add_argument("--wsgi-workers", type=int, default=4, help="Воркеров WSGI (gunicorn --workers)")
+        parser.add_argument("--only", nargs="+", help="Только эти эндпоинты (имена из списка ниже)")
+
+    def handle(self, *args, **options):
+        fixtures = Benchmarks().pick_fixtures()
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(fixtures['user'])}"}
+        member_headers = {"Authorization": f"Bearer {AccessToken.for_user(fixtures['chat'].users.first())}"}
+        endpoints = {
+            "pets_list": ("/api/pets/", {}),
+            "pets_filter": ("/api/pets/?category=" + fixtures["category"].slug, headers),
+            "pet_detail": (f"/api/pets/{fixtures['pet_id']}/", headers),
+            "categories": ("/api/categories/", {}),
+            "chat_inbox": ("/api/chats/", headers),
+            "chat_history": (f"/api/chats/{fixtures['chat'].pk}/messages/", member_headers),
+        }
+        names = options["only"] or list(endpoints)
+        unknown = set(names) - set(endpoints)
+        if unknown:
+            raise CommandError(f"Неизвестные эндпоинты: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(
+            f"Клиентов {options['concurrency']}, запросов {options['requests']}, "
+            f"воркеров WSGI {options['wsgi_workers']}"
+        )
+        for name in names:
+            path, request_headers = endpoints[name]
+            wsgi = self.run_wsgi(path, request_headers, options)
+            asgi = asyncio.run(self.run_asgi(path, request_headers, options))
+            for label, (timings, elapsed) in (("wsgi", wsgi), ("asgi", asgi)):
+                self.stdout.write(
+                    f"{name:<13} {label} {len(timings) / elapsed:>7.0f} req/s "
+                    f"p50={statistics.median(timings):>7.1f}мс p95={percentile(timings, 0.95):>7.1f}мс "
+                    f"p99={percentile(timings, 0.99):>7.1f}мс"
+                )
+
+    def run_wsgi(self, path, headers, options):
+        """Клиенты — потоки; семафор — число воркеров: лишние запросы ждут в очереди, как в backlog"""
+        workers = threading.Semaphore(options["wsgi_workers"])
+        local = threading.local()
+        timings = []
+
+        def client_loop(count):
+            client = getattr(local, "client", None) or Client()
+            local.client = client
+            try:
+                for _ in range(count):
+                    started = time.perf_counter()
+                    with workers:
+                        response = client.get(path, headers=headers)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    self.expect_ok(response, path)
+            finally:
+                # тестовый клиент не закрывает соединения по request_finished — вернуть их в пул
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options["concurrency"]) as pool:
+            list(pool.map(client_loop, self.split(options)))
+        return timings, time.perf_counter() - started
+
+    async def run_asgi(self, path, headers, options):
+        client = AsyncClient()
+        timings = []
+
+        async def client_loop(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                timings.append((time.perf_counter() - started) * 1000)
+                self.expect_ok(response, path)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(count) for count in self.split(options)))
+        return timings, time.perf_counter() - started
+
+    def split(self, options):
+        """Запросы поровну между клиентами"""
+        base, extra = divmod(options["requests"], options["concurrency"])
+        return [base + (i < extra) for i in range(options["concurrency"]) if base + (i < extra)]
+
+    def expect_ok(self, response, path):
+        if response.status_code not in (200, 304):
+            raise CommandError(f"GET {path} → {response.status_code}")
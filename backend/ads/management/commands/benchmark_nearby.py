@@ -0,0 +1,78 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ads import geo
+from ads.filters import PetFilter
+from ads.management.commands.run_benchmarks import percentile
+from ads.models import Pet
+
+
+class Command(BaseCommand):
+    help = (
+        "Поиск рядом: near= из PetFilter (диапазоны geohash + гаверсинус) против полного прохода "
+        "с гаверсинусом по каждой строке и против ILIKE по названию города"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--radius", type=float, nargs="+", default=[2, 10, 50], help="Радиусы, км")
+        parser.add_argument("--centers", type=int, default=10, help="Точек поиска на радиус")
+        parser.add_argument("--repeat", type=int, default=5, help="Замеров на точку")
+        parser.add_argument("--page-size", type=int, default=12)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        located = Pet.objects.filter(is_active=True, geohash__isnull=False).count()
+        if not located:
+            raise CommandError("Нет объявлений с координатами — manage.py generate_fake_data или geocode_pets")
+        self.stdout.write(f"БД: {connection.vendor}, активных объявлений с координатами: {located}")
+
+        rng = random.Random(options["seed"])
+        places = geo.load_places()
+        base = Pet.objects.filter(is_active=True)
+        for radius in options["radius"]:
+            timings = {"geohash": [], "full_scan": [], "city_ilike": []}
+            found, recall, precision = [], [], []
+            for _ in range(options["centers"]):
+                # точки там, где объявления: города с весом по населению
+                city, latitude, longitude, *_ = rng.choices(places, weights=[place[3] for place in places])[0]
+                latitude += rng.gauss(0, 0.03)
+                longitude += rng.gauss(0, 0.05)
+                strategies = {
+                    "geohash": PetFilter(
+                        {"near": f"{latitude},{longitude}", "radius_km": radius}, queryset=base
+                    ).qs,
+                    "full_scan": base.filter(latitude__isnull=False)
+                    .annotate(**{geo.DISTANCE_ANNOTATION: geo.distance_expression(latitude, longitude)})
+                    .filter(**{f"{geo.DISTANCE_ANNOTATION}__lte": radius}),
+                    "city_ilike": base.filter(location__icontains=city),
+                }
+                exact = set(strategies["full_scan"].values_list("id", flat=True))
+                if set(strategies["geohash"].values_list("id", flat=True)) != exact:
+                    raise CommandError(f"near= разошёлся с полным проходом: {latitude:.4f},{longitude:.4f} r={radius}")
+                by_city = set(strategies["city_ilike"].values_list("id", flat=True))
+                found.append(len(exact))
+                recall.append(len(by_city & exact) / len(exact) if exact else 1.0)
+                precision.append(len(by_city & exact) / len(by_city) if by_city else 1.0)
+
+                for name, queryset in strategies.items():
+                    ordered = queryset.order_by(
+                        geo.DISTANCE_ANNOTATION if name != "city_ilike" else "-created_at", "id"
+                    )
+                    for _ in range(options["repeat"]):
+                        started = time.perf_counter()
+                        list(ordered.values_list("id", flat=True)[:options["page_size"]])
+                        timings[name].append((time.perf_counter() - started) * 1000)
+
+            self.stdout.write(
+                f"r={radius:g} км: найдено в среднем {statistics.mean(found):.0f}, "
+                f"ILIKE по городу находит {statistics.mean(recall):.0%} из них, "
+                f"в радиусе {statistics.mean(precision):.0%} его результатов"
+            )
+            for name, values in timings.items():
+                self.stdout.write(
+                    f"  {name:<11} p50={statistics.median(values):>8.2f}мс p95={percentile(values, 0.95):>8.2f}мс"
+                )
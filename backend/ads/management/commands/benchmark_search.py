@@ -0,0 +1,71 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ads.models import Pet
+from ads.search import FullTextSearchFilter
+from ads.views import PetViewSet
+
+User = get_user_model()
+
+WORDS = [
+    "щенок", "котёнок", "лабрадор", "британская", "шиншилла", "попугай", "ласковый",
+    "привит", "игривый", "рыжий", "пушистый", "хомяк", "черепаха", "корм", "документы",
+    "метис", "здоровый", "спокойный", "ретривер", "сиамская", "мейн-кун", "овчарка",
+]
+
+
+class Command(BaseCommand):
+    help = "Сравнивает полнотекстовый поиск с ILIKE (SearchFilter) на текущей БД"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических объявлений")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--terms", nargs="+", default=["лабрадор", "рыжий котёнок", "попугай привит"])
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.seed(options["seed"])
+
+        total = Pet.objects.count()
+        self.stdout.write(f"Объявлений в таблице: {total}")
+        backends = {"ilike": filters.SearchFilter(), "fulltext": FullTextSearchFilter()}
+        factory = APIRequestFactory()
+        view = PetViewSet()
+
+        for term in options["terms"]:
+            request = Request(factory.get("/api/pets/", {"search": term}))
+            for label, backend in backends.items():
+                timings = []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    qs = backend.filter_queryset(request, Pet.objects.filter(is_active=True), view)
+                    list(qs[:12].values_list("id", flat=True))
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f"{term!r:<22} {label:<9} p50={timings[len(timings) // 2]:.2f}ms "
+                    f"p95={timings[int(len(timings) * 0.95) - 1]:.2f}ms"
+                )
+
+    def seed(self, count, batch_size=10000):
+        user, _ = User.objects.get_or_create(username="benchmark")
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            Pet.objects.bulk_create([
+                Pet(
+                    user=user,
+                    name=" ".join(random.sample(WORDS, 2)),
+                    breed=random.choice(WORDS),
+                    description=" ".join(random.choices(WORDS, k=20)),
+                )
+                for _ in range(size)
+            ])
+            created += size
+        self.stdout.write(self.style.SUCCESS(f"✅ Добавлено {created} объявлений"))
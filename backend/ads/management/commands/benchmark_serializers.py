@@ -0,0 +1,64 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ads.models import Pet
+from ads.query_plans import seed_pets
+from ads.renderers import ORJSONRenderer
+from ads.serializers import PetReadSerializer, PetSerializer
+
+
+class Command(BaseCommand):
+    help = "Стоимость сериализации строки ленты: PetSerializer + JSONRenderer против PetReadSerializer + orjson"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических объявлений")
+        parser.add_argument("--rows", type=int, default=500, help="Строк в одном прогоне")
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            created = seed_pets(options["seed"])
+            self.stdout.write(self.style.SUCCESS(f"✅ Добавлено {created} объявлений"))
+
+        request = Request(APIRequestFactory().get("/api/pets/"))
+        context = {"request": request}
+        queryset = Pet.objects.select_related("category", "user").order_by("-created_at", "-id")[:options["rows"]]
+        instances = list(queryset)
+        rows = list(PetReadSerializer.values(queryset))
+        if not rows:
+            raise CommandError("Нет объявлений — запустите с --seed")
+
+        paths = {
+            "PetSerializer + JSONRenderer": (
+                lambda: PetSerializer(instances, many=True, context=context).data, JSONRenderer()
+            ),
+            "PetReadSerializer + ORJSONRenderer": (
+                lambda: PetReadSerializer(rows, many=True, context=context).data, ORJSONRenderer()
+            ),
+        }
+
+        outputs = []
+        for label, (serialize, renderer) in paths.items():
+            serialize_ms, render_ms = [], []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                data = serialize()
+                serialized = time.perf_counter()
+                content = renderer.render(data)
+                serialize_ms.append(serialized - started)
+                render_ms.append(time.perf_counter() - serialized)
+            outputs.append(json.loads(content))
+            per_row = 1e6 / len(rows)
+            self.stdout.write(
+                f"{label:<36} сериализация {min(serialize_ms) * per_row:.1f} мкс/строка, "
+                f"рендер {min(render_ms) * per_row:.1f} мкс/строка"
+            )
+
+        if outputs[0] != outputs[1]:
+            raise CommandError("Вывод сериализаторов отличается")
+        self.stdout.write(self.style.SUCCESS(f"✅ Вывод совпадает ({len(rows)} строк)"))
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ads.models import Pet
+from ads.query_plans import check_feed_plans, seed_pets
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN для всех комбинаций фильтров PetFilter; ошибка, если где-то Seq Scan по ads_pet. "
+        "Та же проверка в тестах — ads.tests.QueryPlanTests"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических объявлений")
+        parser.add_argument("--verbose-plans", action="store_true", help="Печатать планы целиком")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Проверка планов поддерживается только для PostgreSQL")
+        if options["seed"]:
+            created = seed_pets(options["seed"])
+            self.stdout.write(self.style.SUCCESS(f"✅ Добавлено {created} объявлений"))
+
+        failures = []
+        for label, plan, seq_scan in check_feed_plans():
+            if seq_scan:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f"✗ {label}"))
+            else:
+                self.stdout.write(f"✓ {label}")
+            if options["verbose_plans"]:
+                self.stdout.write(json.dumps(plan, ensure_ascii=False, indent=2))
+
+        if failures:
+            raise CommandError(f"Seq Scan по {Pet._meta.db_table} в {len(failures)} комбинациях")
+        self.stdout.write(self.style.SUCCESS("✅ Все комбинации используют индексы"))
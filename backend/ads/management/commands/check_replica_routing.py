@@ -0,0 +1,96 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ads import catalog
+from ads.models import Pet
+from pet_project import db_routing
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверка маршрутизации чтения на реплику через реальный URLconf: публичные GET — на реплику, "
+        "запись и закреплённый после неё пользователь — на default, отстающая реплика пропускается. "
+        "Локально вместо реплики годится вторая база: SQLITE_REPLICA_PATH или DB_REPLICA_HOSTS "
+        "и manage.py migrate --database replica_1"
+    )
+
+    def handle(self, *args, **options):
+        config = db_routing.get_config()
+        if not config["ALIASES"]:
+            raise CommandError("Реплик нет: задайте DB_REPLICA_HOSTS или SQLITE_REPLICA_PATH")
+        replica = config["ALIASES"][0]
+        for alias in config["ALIASES"]:
+            self.stdout.write(f"{alias}: отставание {db_routing.replica_lag(alias):.2f}с")
+
+        pet = Pet.objects.select_related("user").order_by("-id").first()
+        other = pet and User.objects.exclude(pk=pet.user_id).order_by("pk").first()
+        if other is None:
+            raise CommandError("Нет данных — сначала manage.py generate_fake_data")
+        owner, reader = self.client_for(pet.user), self.client_for(other)
+        pins = caches[config["CACHE"]]
+        pins.delete_many([db_routing.pin_key(pet.user_id), db_routing.pin_key(other.pk)])
+        db_routing.reset_health()
+        catalog.invalidate()  # каталог живёт в памяти процесса: первое чтение категорий — из БД
+
+        toggle = f"/api/pets/{pet.pk}/toggle_active/"
+        checks = [
+            ("категории", reader, "get", "/api/categories/", "ads_category", replica),
+            ("лента объявлений", reader, "get", "/api/pets/", "ads_pet", replica),
+            ("форум", reader, "get", "/api/forum/", "forum_", replica),
+            ("диалоги (не в VIEWS)", reader, "get", "/api/chats/", "chat_", DEFAULT_DB_ALIAS),
+            ("запись: toggle_active", owner, "post", toggle, "ads_pet", DEFAULT_DB_ALIAS),
+            ("автор сразу после записи", owner, "get", "/api/pets/my_pets/", "ads_pet", DEFAULT_DB_ALIAS),
+            ("другой пользователь", reader, "get", "/api/pets/my_pets/", "ads_pet", replica),
+        ]
+        failures = [name for name, *check in checks if not self.check_route(name, *check)]
+
+        # окно STICKY_SECONDS истекло
+        pins.delete(db_routing.pin_key(pet.user_id))
+        if not self.check_route("автор после окна", owner, "get", "/api/pets/my_pets/", "ads_pet", replica):
+            failures.append("автор после окна")
+
+        with override_settings(DATABASE_REPLICA={**settings.DATABASE_REPLICA, "MAX_LAG": -1}):
+            db_routing.reset_health()
+            if not self.check_route("реплика отстаёт", reader, "get", "/api/pets/", "ads_pet", DEFAULT_DB_ALIAS):
+                failures.append("реплика отстаёт")
+        db_routing.reset_health()
+
+        owner.post(toggle)  # вернуть объявлению исходный is_active
+        pins.delete(db_routing.pin_key(pet.user_id))
+        if failures:
+            raise CommandError(f"Маршрут не тот: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("✅ Маршрутизация чтения работает"))
+
+    def client_for(self, user):
+        # авторизованные запросы идут мимо кэша ответов и доходят до БД
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def check_route(self, name, client, method, url, table, expected):
+        """Какие базы прочитали таблицу table за время запроса"""
+        queries = []
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(connections[alias].execute_wrapper(
+                    lambda execute, sql, *args, alias=alias: queries.append((alias, sql)) or execute(sql, *args)
+                ))
+            response = getattr(client, method)(url)
+        served = sorted({alias for alias, sql in queries if table in sql})
+        ok = response.status_code < 400 and served == [expected]
+        mark = self.style.SUCCESS("✓") if ok else self.style.ERROR("✗")
+        self.stdout.write(
+            f"{mark} {name:<26} {method.upper()} {url} → {response.status_code}, "
+            f"{table}: {', '.join(served) or '—'} (ожидалось {expected})"
+        )
+        return ok
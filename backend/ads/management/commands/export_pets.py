@@ -0,0 +1,98 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+from ads.models import Pet
+
+# внешний id объявлений, созданных на сайте: префикс не пересекается с числовыми id внешних систем
+SITE_ID_PREFIX = "site-"
+
+# поля файла; их же читает import_pets
+FIELDS = [
+    "external_id", "user", "category", "name", "breed", "age", "description",
+    "price", "location", "latitude", "longitude", "photo", "is_active", "views_count",
+]
+
+
+def assign_external_ids(queryset):
+    """
+    Объявлениям без external_id — постоянный SITE_ID_PREFIX<id> одним UPDATE:
+    повторный импорт выгрузки в ту же базу обновит их, а не создаст копии
+    """
+    return queryset.filter(external_id__isnull=True).update(
+        external_id=Concat(Value(SITE_ID_PREFIX), Cast("id", CharField()), output_field=CharField())
+    )
+
+
+def export_rows(queryset, chunk_size):
+    """Строки экспорта генератором — в памяти не больше одного чанка"""
+    rows = queryset.order_by("id").values(
+        "external_id", "user__username", "category__slug", "name", "breed", "age",
+        "description", "price", "location", "latitude", "longitude", "photo", "is_active", "views_count",
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield {
+            "external_id": row["external_id"],
+            "user": row["user__username"],
+            "category": row["category__slug"],
+            "name": row["name"],
+            "breed": row["breed"],
+            "age": row["age"],
+            "description": row["description"],
+            "price": None if row["price"] is None else str(row["price"]),
+            "location": row["location"],
+            "latitude": row["latitude"],
+            "longitude": row["longitude"],
+            "photo": row["photo"] or None,
+            "is_active": row["is_active"],
+            "views_count": row["views_count"],
+        }
+
+
+class Command(BaseCommand):
+    help = "Потоковая выгрузка объявлений в JSONL или CSV (постоянная память)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Файл выгрузки или '-' для stdout")
+        parser.add_argument("--format", choices=["jsonl", "csv"], help="По умолчанию — по расширению файла")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--active-only", action="store_true")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or ("csv" if options["output"].endswith(".csv") else "jsonl")
+        queryset = Pet.objects.all()
+        if options["active_only"]:
+            queryset = queryset.filter(is_active=True)
+
+        started = time.perf_counter()
+        assign_external_ids(queryset)
+        stream = sys.stdout if options["output"] == "-" else open(options["output"], "w", encoding="utf-8", newline="")
+        try:
+            count = self.write(stream, fmt, export_rows(queryset, options["chunk_size"]))
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f"✅ Выгружено объявлений: {count} за {elapsed:.1f}с ({count / max(elapsed, 1e-9):.0f} строк/с)"
+        ))
+
+    def write(self, stream, fmt, rows):
+        count = 0
+        if fmt == "csv":
+            writer = csv.DictWriter(stream, fieldnames=FIELDS)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                stream.write(json.dumps(row, ensure_ascii=False) + "\n")
+                count += 1
+        return count
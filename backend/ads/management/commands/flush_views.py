@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ads.counters import flush_views
+
+
+class Command(BaseCommand):
+    help = "Сбрасывает накопленные просмотры объявлений в БД (один UPDATE на интервал)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Повторять сброс каждые N секунд (0 — один раз и выйти)",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            flushed = flush_views()
+            if flushed or not interval:
+                self.stdout.write(self.style.SUCCESS(f"✅ Обновлено объявлений: {flushed}"))
+            if not interval:
+                break
+            time.sleep(interval)
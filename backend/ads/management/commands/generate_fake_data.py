@@ -0,0 +1,293 @@
+import math
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from functools import cache
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from ads import catalog, geo, response_cache
+from ads.management.commands.init_categories import DEFAULT_CATEGORIES
+from ads.models import Category, Pet
+from chat.models import Chat, Message
+from forum.models import ForumCategory, ForumComment, ForumTopic
+
+User = get_user_model()
+
+# доля объявлений по категориям DEFAULT_CATEGORIES: собаки и кошки — основная масса
+CATEGORY_WEIGHTS = [34, 34, 8, 6, 10, 3, 5]
+BREEDS = {
+    "Собаки": ["Лабрадор", "Овчарка", "Такса", "Корги", "Хаски", "Шпиц", "Метис", "Йоркширский терьер"],
+    "Кошки": ["Британская", "Мейн-кун", "Сиамская", "Сфинкс", "Шотландская вислоухая", "Метис"],
+    "Птицы": ["Волнистый попугай", "Корелла", "Канарейка", "Неразлучник"],
+    "Рыбы": ["Гуппи", "Скалярия", "Петушок", "Неон"],
+    "Грызуны": ["Хомяк", "Морская свинка", "Шиншилла", "Декоративная крыса"],
+    "Рептилии": ["Красноухая черепаха", "Эублефар", "Бородатая агама"],
+    "Прочие животные": ["Хорёк", "Ахатина", "Кролик"],
+}
+NAMES = ["Барсик", "Мурка", "Рекс", "Бобик", "Кеша", "Лаки", "Симба", "Луна", "Граф", "Пушок", "Тоша", "Ника"]
+ADJECTIVES = ["ласковый", "игривый", "спокойный", "привит", "с документами", "пушистый", "здоровый", "рыжий"]
+AGES = ["2 месяца", "4 месяца", "полгода", "1 год", "2 года", "3 года", "5 лет"]
+PHRASES = [
+    "Здравствуйте, ещё актуально?", "Да, актуально", "Можно посмотреть завтра?", "Какая цена окончательная?",
+    "Привит по возрасту", "Пришлите ещё фото, пожалуйста", "Договорились", "Где вы находитесь?",
+    "Есть документы?", "Спасибо!", "Могу подъехать вечером", "Торг уместен",
+]
+FORUM_CATEGORIES = [("general", "Общее"), ("dogs", "Собаки"), ("cats", "Кошки"), ("health", "Здоровье")]
+FORUM_TITLES = ["Чем кормить", "Посоветуйте ветклинику", "Как приучить к лотку", "Прививки", "Первая прогулка"]
+
+
+@contextmanager
+def backdated(*models):
+    """bulk_create пишет заданные даты: auto_now/auto_now_add моделей временно выключены"""
+    fields = [field for model in models for field in auto_time_fields(model)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+@cache
+def auto_time_fields(model):
+    """Запоминается до backdated(): внутри него флаги auto_now уже сброшены"""
+    return [
+        field for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+
+
+def stamp(obj, when):
+    """Проставляет when во все auto_now/auto_now_add поля объекта"""
+    for field in auto_time_fields(type(obj)):
+        setattr(obj, field.attname, when)
+    return obj
+
+
+def through_row(relation, source_id, target_id):
+    """Строка промежуточной таблицы M2M (relation — Model.field.m2m)"""
+    field = relation.field
+    return relation.through(**{
+        f"{field.m2m_field_name()}_id": source_id,
+        f"{field.m2m_reverse_field_name()}_id": target_id,
+    })
+
+
+class Command(BaseCommand):
+    help = (
+        "Синтетические данные в масштабе продакшена: пользователи, объявления, диалоги с сообщениями "
+        "и темы форума. Активность пользователей — по Парето, цены — логнормально, всё пачками bulk_create"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--pets", type=int, default=10000)
+        parser.add_argument("--chats", type=int, default=3000)
+        parser.add_argument("--messages", type=float, default=12, help="Среднее число сообщений в диалоге")
+        parser.add_argument("--topics", type=int, default=500)
+        parser.add_argument("--comments", type=float, default=8, help="Среднее число комментариев в теме")
+        parser.add_argument("--days", type=int, default=180, help="Глубина истории в днях")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, help="Зерно генератора для воспроизводимого набора")
+        parser.add_argument("--prefix", default="fake", help="Префикс имён пользователей")
+        parser.add_argument("--password", default="password", help="Пароль всех созданных пользователей")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options["seed"])
+        self.now = timezone.now()
+        started = time.perf_counter()
+
+        with backdated(Pet, Chat, Message, ForumTopic, ForumComment):
+            steps = [
+                ("пользователей", self.create_users),
+                ("объявлений", self.create_pets),
+                ("диалогов", self.create_chats),
+                ("тем форума", self.create_topics),
+            ]
+            for label, step in steps:
+                step_started = time.perf_counter()
+                with transaction.atomic():
+                    count = step()
+                self.stdout.write(f"… {count} {label} за {time.perf_counter() - step_started:.1f}с")
+
+        # денормализованные счётчики: bulk_create идёт мимо сервисов и сигналов
+        call_command("rebuild_chat_state", stdout=self.stdout)
+        call_command("rebuild_user_stats", stdout=self.stdout, batch_size=options["batch_size"])
+        catalog.invalidate()
+        response_cache.bump("pets", "categories")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Синтетические данные созданы за {time.perf_counter() - started:.1f}с "
+            f"(вход: {self.usernames[0]} / {options['password']})"
+        ))
+
+    def moment(self, not_before=None):
+        """Случайный момент в окне --days, не раньше not_before"""
+        start = not_before or self.now - timedelta(days=self.options["days"])
+        return start + (self.now - start) * self.rng.random()
+
+    def weighted_users(self, k):
+        """k пользователей с перекосом по Парето: немногие продавцы активны больше всех"""
+        return self.rng.choices(self.user_ids, cum_weights=self.activity, k=k)
+
+    def create_users(self):
+        prefix = self.options["prefix"]
+        offset = User.objects.filter(username__startswith=f"{prefix}_").count()
+        password = make_password(self.options["password"])  # хэш считается один раз на весь набор
+        self.usernames = [f"{prefix}_{offset + i}" for i in range(self.options["users"])]
+        # город пользователя — пропорционально населению по газеттиру
+        places = geo.load_places()
+        homes = self.rng.choices(places, weights=[place[3] for place in places], k=len(self.usernames))
+        users = [
+            User(
+                username=name, password=password, email=f"{name}@example.com",
+                date_joined=self.moment(), location=home[0],
+            )
+            for name, home in zip(self.usernames, homes)
+        ]
+        created = User.objects.bulk_create(users, batch_size=self.options["batch_size"])
+        if created and created[0].pk is None:
+            created = list(User.objects.filter(username__in=self.usernames).order_by("pk"))
+        self.user_ids = [user.pk for user in created]
+        self.homes = dict(zip(self.user_ids, homes))
+
+        total = 0
+        self.activity = []
+        for _ in self.user_ids:
+            total += self.rng.paretovariate(1.16)
+            self.activity.append(total)
+        return len(self.user_ids)
+
+    def create_pets(self):
+        categories = [
+            Category.objects.get_or_create(name=name, defaults={"description": desc, "icon": icon})[0]
+            for name, desc, icon in DEFAULT_CATEGORIES
+        ]
+        created = 0
+        while created < self.options["pets"]:
+            size = min(self.options["batch_size"], self.options["pets"] - created)
+            sellers = self.weighted_users(size)
+            pets = []
+            for seller in sellers:
+                city, city_latitude, city_longitude, *_ = self.homes[seller]
+                # точка в пределах города владельца (σ ≈ 5 км)
+                latitude = city_latitude + self.rng.gauss(0, 0.045)
+                longitude = city_longitude + self.rng.gauss(0, 0.045 / math.cos(math.radians(city_latitude)))
+                category = self.rng.choices(categories, weights=CATEGORY_WEIGHTS)[0]
+                published = self.moment()
+                age_days = (self.now - published).days + 1
+                price = None if self.rng.random() < 0.12 else Decimal(
+                    min(round(self.rng.lognormvariate(8.6, 1.1), -1), 99_999_990)
+                )
+                pets.append(stamp(Pet(
+                    user_id=seller,
+                    category=category,
+                    name=self.rng.choice(NAMES),
+                    breed=self.rng.choice(BREEDS.get(category.name, [""])),
+                    age=self.rng.choice(AGES),
+                    description=", ".join(self.rng.sample(ADJECTIVES, self.rng.randint(1, 4))).capitalize(),
+                    price=price,
+                    # bulk_create идёт мимо Pet.save — geohash считаем сами
+                    location=city,
+                    latitude=latitude,
+                    longitude=longitude,
+                    geohash=geo.encode(latitude, longitude),
+                    is_active=self.rng.random() < 0.85,
+                    # просмотры копятся со временем и сильно неравномерны
+                    views_count=int(self.rng.expovariate(1 / 6) * age_days),
+                ), published))
+            Pet.objects.bulk_create(pets)
+            created += size
+        return created
+
+    def create_chats(self):
+        if len(self.user_ids) < 2:
+            return 0
+        pairs = set()
+        attempts = 0
+        # покупатель — любой пользователь, продавец — с перекосом по активности
+        while len(pairs) < self.options["chats"] and attempts < self.options["chats"] * 10:
+            attempts += 1
+            buyer = self.rng.choice(self.user_ids)
+            seller = self.weighted_users(1)[0]
+            if buyer != seller:
+                pairs.add((min(buyer, seller), max(buyer, seller)))
+
+        pairs = sorted(pairs)
+        per_chunk = max(self.options["batch_size"] // max(int(self.options["messages"]), 1), 1)
+        for start in range(0, len(pairs), per_chunk):
+            self.create_chat_chunk(pairs[start:start + per_chunk])
+        return len(pairs)
+
+    def create_chat_chunk(self, pairs):
+        plans = []
+        for low, high in pairs:
+            opened = self.moment()
+            count = 1 + int(self.rng.expovariate(1 / max(self.options["messages"] - 1, 0.1)))
+            times = sorted(self.moment(opened) for _ in range(count))
+            plans.append((low, high, opened, times))
+
+        chats = []
+        for low, high, opened, times in plans:
+            chat = stamp(Chat(user_low_id=low, user_high_id=high), times[-1])
+            chat.created_at = opened
+            chats.append(chat)
+        Chat.objects.bulk_create(chats)
+
+        Chat.users.through.objects.bulk_create([
+            through_row(Chat.users, chat.pk, user_id)
+            for chat, (low, high, _, _) in zip(chats, plans)
+            for user_id in (low, high)
+        ])
+        messages = []
+        for chat, (low, high, _, times) in zip(chats, plans):
+            # непрочитанным остаётся только хвост диалога
+            unread_tail = self.rng.choice([0, 0, 0, 1, 2, 3])
+            for position, sent_at in enumerate(times):
+                messages.append(stamp(Message(
+                    chat_id=chat.pk,
+                    sender_id=self.rng.choice((low, high)),
+                    text=self.rng.choice(PHRASES),
+                    is_read=position < len(times) - unread_tail,
+                ), sent_at))
+        Message.objects.bulk_create(messages, batch_size=self.options["batch_size"])
+
+    def create_topics(self):
+        categories = [
+            ForumCategory.objects.get_or_create(slug=slug, defaults={"name": name})[0]
+            for slug, name in FORUM_CATEGORIES
+        ]
+        topics = ForumTopic.objects.bulk_create([
+            stamp(ForumTopic(
+                title=f"{self.rng.choice(FORUM_TITLES)} ({i})",
+                content=" ".join(self.rng.sample(PHRASES, 3)),
+                author_id=author,
+                category=self.rng.choice(categories),
+            ), self.moment())
+            for i, author in enumerate(self.weighted_users(self.options["topics"]))
+        ], batch_size=self.options["batch_size"])
+
+        comments, likes = [], []
+        for topic in topics:
+            count = int(self.rng.expovariate(1 / self.options["comments"])) if self.options["comments"] else 0
+            for author in self.weighted_users(count):
+                comments.append(stamp(
+                    ForumComment(topic_id=topic.pk, author_id=author, text=self.rng.choice(PHRASES)),
+                    self.moment(topic.created_at),
+                ))
+            liked_by = {self.rng.choice(self.user_ids) for _ in range(int(self.rng.expovariate(1 / 3)))}
+            likes += [through_row(ForumTopic.likes, topic.pk, user_id) for user_id in liked_by]
+        ForumComment.objects.bulk_create(comments, batch_size=self.options["batch_size"])
+        ForumTopic.likes.through.objects.bulk_create(likes, batch_size=self.options["batch_size"])
+        return len(topics)
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ads import geo, response_cache
+from ads.models import Pet
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет место, координаты и geohash объявлений без geohash: город владельца "
+        "и газеттир ads.geo, пачками bulk_update"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--all", action="store_true", help="Пересчитать все объявления, а не только без geohash")
+
+    def handle(self, *args, **options):
+        pets = Pet.objects.order_by("pk").only("pk", "location", "latitude", "longitude", "user__location")
+        pets = pets.select_related("user")
+        if not options["all"]:
+            pets = pets.filter(geohash__isnull=True)
+
+        started = time.perf_counter()
+        total = located = 0
+        last_id = 0
+        while batch := list(pets.filter(pk__gt=last_id)[:options["batch_size"]]):
+            for pet in batch:
+                geo.locate(pet, owner_location=pet.user.location)
+            Pet.objects.bulk_update(batch, ["location", "latitude", "longitude", "geohash"])
+            total += len(batch)
+            located += sum(pet.geohash is not None for pet in batch)
+            last_id = batch[-1].pk
+            self.stdout.write(f"… {total} объявлений")
+
+        if total:
+            response_cache.bump("pets")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Обработано объявлений: {total}, с координатами: {located} "
+            f"за {time.perf_counter() - started:.1f}с"
+        ))
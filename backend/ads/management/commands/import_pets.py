@@ -0,0 +1,231 @@
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from urllib.request import urlopen
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Case, CharField, Value, When
+
+from ads import catalog, geo, response_cache
+from ads.management.commands.export_pets import FIELDS
+from ads.models import Category, Pet
+
+User = get_user_model()
+
+UPDATE_FIELDS = [
+    "user", "category", "name", "breed", "age", "description",
+    "price", "location", "latitude", "longitude", "geohash", "is_active", "views_count", "updated_at",
+]
+TRUE_VALUES = {"1", "true", "yes", "да"}
+
+
+def read_records(path, fmt):
+    """Записи файла генератором — файл не читается в память целиком"""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8", newline="")
+    try:
+        if fmt == "csv":
+            yield from csv.DictReader(stream)
+        else:
+            for number, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as exc:
+                    raise CommandError(f"Строка {number}: некорректный JSON ({exc})")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = "Потоковый импорт объявлений из JSONL/CSV: upsert по external_id пачками, фото — пулом потоков"
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help=f"Файл с полями {', '.join(FIELDS)} или '-' для stdin")
+        parser.add_argument("--format", choices=["jsonl", "csv"], help="По умолчанию — по расширению файла")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--photo-workers", type=int, default=8, help="Потоков для загрузки/копирования фото")
+        parser.add_argument("--photos-dir", help="Каталог, относительно которого ищутся локальные фото")
+        parser.add_argument("--create-users", action="store_true", help="Создавать неизвестных пользователей")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or ("csv" if options["input"].endswith(".csv") else "jsonl")
+        self.options = options
+        self.storage = Pet._meta.get_field("photo").storage
+        self.categories = dict(Category.objects.values_list("slug", "id"))
+        self.users = {}
+        self.locations = {}
+        self.errors = 0
+        self.photo_updates = {}
+        imported = 0
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(options["photo_workers"], 1)) as pool:
+            self.photo_jobs = {}
+            for batch in batched(read_records(options["input"], fmt), options["batch_size"]):
+                pets, photos = self.build(batch)
+                Pet.objects.bulk_create(
+                    pets, update_conflicts=True, unique_fields=["external_id"], update_fields=UPDATE_FIELDS
+                )
+                imported += len(pets)
+                for external_id, source in photos.items():
+                    self.photo_jobs[pool.submit(self.fetch_photo, source)] = external_id
+                self.collect_photos(block=False)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"… {imported} объявлений, {imported / elapsed:.0f} строк/с")
+            self.collect_photos(block=True)
+
+        if imported:
+            # bulk-операции идут мимо сигналов
+            catalog.invalidate()
+            response_cache.bump("pets", "categories")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Импортировано объявлений: {imported} за {elapsed:.1f}с "
+            f"({imported / max(elapsed, 1e-9):.0f} строк/с), ошибок: {self.errors}"
+        ))
+        self.stdout.write("Превью для новых фото строит manage.py process_photos")
+
+    def build(self, batch):
+        """Pet без сохранения + {external_id: источник фото}; дубли id внутри пачки — побеждает последний"""
+        self.resolve_users({record.get("user") for record in batch} - {None, ""})
+        pets, photos = {}, {}
+        for record in batch:
+            try:
+                pet = self.make_pet(record)
+            except (KeyError, ValueError, InvalidOperation) as exc:
+                self.errors += 1
+                self.stderr.write(f"Пропущена запись {record.get('external_id')!r}: {exc}")
+                continue
+            pets[pet.external_id] = pet
+            if record.get("photo"):
+                photos[pet.external_id] = record["photo"]
+        return list(pets.values()), photos
+
+    def make_pet(self, record):
+        external_id = str(record.get("external_id") or "").strip()
+        if not external_id:
+            raise ValueError("нет external_id")
+        user_id = self.users.get(record.get("user"))
+        if user_id is None:
+            raise ValueError(f"неизвестный пользователь {record.get('user')!r}")
+        # без категории — можно, с несуществующей — ошибка записи, как у пользователя
+        category_id = None
+        if record.get("category"):
+            category_id = self.categories.get(record["category"])
+            if category_id is None:
+                raise ValueError(f"неизвестная категория {record['category']!r}")
+        price = record.get("price")
+        is_active = record.get("is_active", True)
+        if isinstance(is_active, str):
+            is_active = is_active.strip().lower() in TRUE_VALUES
+        latitude, longitude = (
+            float(value) if value not in (None, "") else None
+            for value in (record.get("latitude"), record.get("longitude"))
+        )
+        if (latitude is None) != (longitude is None) or (
+            latitude is not None and not (-90 <= latitude <= 90 and -180 <= longitude <= 180)
+        ):
+            raise ValueError("некорректные координаты")
+        pet = Pet(
+            external_id=external_id,
+            user_id=user_id,
+            category_id=category_id,
+            name=record["name"],
+            breed=record.get("breed") or "",
+            age=record.get("age") or "",
+            description=record.get("description") or "",
+            price=Decimal(str(price)) if price not in (None, "") else None,
+            location=record.get("location") or "",
+            latitude=latitude,
+            longitude=longitude,
+            is_active=bool(is_active),
+            views_count=int(record.get("views_count") or 0),
+        )
+        # bulk_create идёт мимо Pet.save — место и geohash заполняем здесь
+        return geo.locate(pet, owner_location=self.locations.get(user_id, ""))
+
+    def resolve_users(self, usernames):
+        """Дополняет карту username -> id одним запросом на пачку"""
+        missing = usernames - self.users.keys()
+        if not missing:
+            return
+        self.load_users(missing)
+        missing -= self.users.keys()
+        if missing and self.options["create_users"]:
+            User.objects.bulk_create(
+                [User(username=name, password=make_password(None)) for name in missing], ignore_conflicts=True
+            )
+            self.load_users(missing)
+
+    def load_users(self, usernames):
+        # город владельца — место объявления по умолчанию
+        for username, user_id, location in User.objects.filter(username__in=usernames).values_list(
+            "username", "id", "location"
+        ):
+            self.users[username] = user_id
+            self.locations[user_id] = location
+
+    def fetch_photo(self, source):
+        """Выполняется в пуле потоков: скачивает или копирует фото в хранилище, возвращает имя файла"""
+        if source.startswith(("http://", "https://")):
+            with urlopen(source, timeout=30) as response:
+                content = response.read()
+        else:
+            local = os.path.join(self.options["photos_dir"], source) if self.options["photos_dir"] else None
+            if not (local and os.path.exists(local)):
+                if self.storage.exists(source):
+                    return source  # файл уже в нашем хранилище (выгрузка того же сервера)
+                raise FileNotFoundError(source)
+            with open(local, "rb") as file:
+                content = file.read()
+        return self.storage.save(f"pets/{os.path.basename(source.split('?')[0])}", ContentFile(content))
+
+    def collect_photos(self, block):
+        if block:
+            wait(self.photo_jobs)
+        else:
+            # очередь загрузок ограничена — память не растёт, если сеть медленнее БД
+            while len(self.photo_jobs) > self.options["batch_size"]:
+                wait(self.photo_jobs, return_when=FIRST_COMPLETED)
+                self.take_finished()
+        self.take_finished()
+        if self.photo_updates and (block or len(self.photo_updates) >= self.options["batch_size"]):
+            self.save_photos()
+
+    def take_finished(self):
+        for future in [f for f in self.photo_jobs if f.done()]:
+            external_id = self.photo_jobs.pop(future)
+            try:
+                self.photo_updates[external_id] = future.result()
+            except Exception as exc:
+                self.errors += 1
+                self.stderr.write(f"Фото для {external_id!r} не загружено: {exc}")
+
+    def save_photos(self):
+        """Имена загруженных фото — одним UPDATE ... CASE на пачку"""
+        for chunk in batched(self.photo_updates.items(), self.options["batch_size"]):
+            Pet.objects.filter(external_id__in=[external_id for external_id, _ in chunk]).update(
+                photo=Case(
+                    *[When(external_id=external_id, then=Value(name)) for external_id, name in chunk],
+                    output_field=CharField(),
+                )
+            )
+        self.photo_updates = {}
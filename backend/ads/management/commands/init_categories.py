@@ -12,17 +12,27 @@ DEFAULT_CATEGORIES = [
     ("Прочие животные", "Насекомые, экзотика и другие", "🐾"),
 ]
 
+
+def bulk_create_categories(rows):
+    """
+    Категории (название, описание, иконка) одним INSERT ... ON CONFLICT DO NOTHING: уже существующие
+    (в том числе правленые в админке) не трогаем. Возвращает число добавленных
+    """
+    before = Category.objects.count()
+    Category.objects.bulk_create(
+        [
+            # bulk_create идёт мимо Category.save — slug с кириллицей заполняем здесь
+            Category(name=name, slug=slugify(name, allow_unicode=True), description=desc, icon=icon)
+            for name, desc, icon in rows
+        ],
+        ignore_conflicts=True,
+    )
+    return Category.objects.count() - before
+
+
 class Command(BaseCommand):
     help = "Создает базовые категории животных (без дубликатов)"
 
     def handle(self, *args, **options):
-        created_count = 0
-        for name, desc, icon in DEFAULT_CATEGORIES:
-            slug = slugify(name)
-            category, created = Category.objects.get_or_create(
-                slug=slug,
-                defaults={"name": name, "description": desc, "icon": icon},
-            )
-            if created:
-                created_count += 1
+        created_count = bulk_create_categories(DEFAULT_CATEGORIES)
         self.stdout.write(self.style.SUCCESS(f"✅ Добавлено {created_count} категорий"))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ads.notifications import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Разбирает outbox уведомлений пачками: bulk_create, счётчики непрочитанных, рассылка онлайн"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Строк outbox за транзакцию")
+        parser.add_argument(
+            "--interval", type=float, default=1.0,
+            help="Пауза, когда очередь пуста (сек); 0 — разобрать очередь один раз и выйти",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            processed = 0
+            while True:
+                drained = drain_outbox(options["batch_size"])
+                processed += drained
+                if drained < options["batch_size"]:
+                    break
+            if processed or not interval:
+                self.stdout.write(self.style.SUCCESS(f"✅ Разобрано записей outbox: {processed}"))
+            if not interval:
+                break
+            time.sleep(interval)
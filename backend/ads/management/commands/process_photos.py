@@ -0,0 +1,54 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from ads import imaging, photos
+from ads.models import Pet
+
+
+class Command(BaseCommand):
+    help = "Строит превью и WebP-варианты для уже загруженных фото объявлений (параллельно)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Процессов в пуле")
+        parser.add_argument("--force", action="store_true", help="Перестроить и уже обработанные фото")
+
+    def handle(self, *args, **options):
+        rows = Pet.objects.exclude(photo="").exclude(photo__isnull=True).values_list("id", "photo", "photo_variants")
+        pending = (
+            (pet_id, photo)
+            for pet_id, photo, variants in rows.iterator()
+            if options["force"] or photos.needs_processing(photo, variants)
+        )
+
+        workers = max(options["workers"] or 1, 1)
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            in_flight = {}
+            for pet_id, photo in pending:
+                data = photos.read_source(photo)
+                if data is None:
+                    failed += 1
+                    continue
+                in_flight[executor.submit(imaging.render_variants, data)] = (pet_id, photo)
+                # в памяти держим ограниченное число исходников
+                if len(in_flight) >= workers * 2:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    done, failed = self.collect(finished, in_flight, done, failed)
+            finished, _ = wait(in_flight)
+            done, failed = self.collect(finished, in_flight, done, failed)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Обработано фото: {done}, ошибок: {failed}"))
+
+    def collect(self, finished, in_flight, done, failed):
+        for future in finished:
+            pet_id, photo = in_flight.pop(future)
+            try:
+                photos.store_variants(pet_id, photo, future.result())
+                done += 1
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f"Объявление {pet_id} ({photo}): {exc}")
+        return done, failed
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ads import similar
+
+
+class Command(BaseCommand):
+    help = (
+        "Похожие объявления (ads.similar): полная пересборка top-K соседей или, с --incremental, "
+        "досчёт изменённых после прошлой сборки. С --interval работает фоном и пересобирает всё раз в --rebuild-every"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--incremental", action="store_true", help="Только изменённые объявления")
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Пауза между досчётами (сек); 0 — один проход и выход",
+        )
+        parser.add_argument("--rebuild-every", type=float, default=24 * 3600, help="Полная пересборка (сек)")
+
+    def handle(self, *args, **options):
+        incremental = options["incremental"]
+        rebuilt_at = time.monotonic()
+        while True:
+            started = time.perf_counter()
+            if incremental:
+                updated = similar.update()
+                if updated or not options["interval"]:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"✅ Досчитано объявлений: {updated} за {time.perf_counter() - started:.1f}с"
+                    ))
+            else:
+                total = similar.rebuild()
+                rebuilt_at = time.monotonic()
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ Соседи пересчитаны для {total} объявлений за {time.perf_counter() - started:.1f}с"
+                ))
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+            incremental = time.monotonic() - rebuilt_at < options["rebuild_every"]
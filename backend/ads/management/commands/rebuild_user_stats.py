@@ -0,0 +1,64 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ads.stats import refresh_stats, stale_user_ids
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает таблицу статистики профилей (UserStats) пачками пользователей. "
+        "С --stale — только помеченные и устаревшие строки; с --interval работает фоном"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Только эти id (можно повторять)")
+        parser.add_argument("--stale", action="store_true", help="Только dirty и старше USER_STATS_MAX_AGE")
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Пауза между проходами --stale (сек); 0 — один проход и выход",
+        )
+
+    def handle(self, *args, **options):
+        if options["stale"]:
+            while True:
+                started = time.perf_counter()
+                total = self.refresh_stale(options["batch_size"])
+                if total or not options["interval"]:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"✅ Обновлена статистика {total} пользователей за {time.perf_counter() - started:.1f}с"
+                    ))
+                if not options["interval"]:
+                    return
+                time.sleep(options["interval"])
+
+        user_ids = User.objects.order_by("pk").values_list("pk", flat=True)
+        if options["users"]:
+            user_ids = user_ids.filter(pk__in=options["users"])
+
+        started = time.perf_counter()
+        total = 0
+        last_id = 0
+        while batch := list(user_ids.filter(pk__gt=last_id)[:options["batch_size"]]):
+            refresh_stats(batch)
+            total += len(batch)
+            last_id = batch[-1]
+            self.stdout.write(f"… {total} пользователей")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Статистика пересчитана для {total} пользователей за {time.perf_counter() - started:.1f}с"
+        ))
+
+    def refresh_stale(self, batch_size):
+        # пересчитанная строка получает computed_at позже начала прохода и выпадает из выборки
+        started = timezone.now()
+        total = 0
+        while batch := stale_user_ids(batch_size, started):
+            refresh_stats(batch)
+            total += len(batch)
+        return total
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ads.models import Category, Pet
+from chat.models import Chat
+
+User = get_user_model()
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmark_baseline.json"
+# метрики, по которым сравниваем с базой: (ключ, допуск в долях, минимальный абсолютный рост)
+COMPARED = [("p95_ms", None, 1.0), ("queries", 0, 0), ("alloc_kb", None, 64)]
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Сквозной бенчмарк в процессе: реальный URLconf (лента, фильтры, поиск, диалоги, форум) "
+        "и ChatConsumer. p50/p95, запросов на запрос и аллокации; сравнение с сохранённой базой"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=30, help="Замеров на сценарий")
+        parser.add_argument("--only", nargs="+", help="Только эти сценарии")
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="JSON-файл базы")
+        parser.add_argument("--save-baseline", action="store_true", help="Записать результат как новую базу")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="Допустимый рост p95 и аллокаций")
+        parser.add_argument("--ws-messages", type=int, default=200, help="Сообщений в сценарии ws_fanout")
+
+    def handle(self, *args, **options):
+        self.options = options
+        fixtures = self.pick_fixtures()
+        scenarios = self.http_scenarios(fixtures)
+        names = options["only"] or [*scenarios, "ws_fanout"]
+        unknown = set(names) - {*scenarios, "ws_fanout"}
+        if unknown:
+            raise CommandError(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(f"БД: {connection.vendor}, объявлений {fixtures['pets']}, замеров {options['repeat']}")
+        results = {}
+        for name in names:
+            if name == "ws_fanout":
+                results[name] = self.measure_ws(fixtures)
+            else:
+                results[name] = self.measure_http(*scenarios[name])
+            self.report(name, results[name])
+
+        baseline_path = Path(options["baseline"])
+        if options["save_baseline"]:
+            baseline_path.write_text(json.dumps(
+                {"vendor": connection.vendor, "results": results}, indent=2, ensure_ascii=False
+            ))
+            self.stdout.write(self.style.SUCCESS(f"✅ База сохранена в {baseline_path}"))
+        elif baseline_path.exists():
+            self.compare(json.loads(baseline_path.read_text()), results)
+        else:
+            self.stdout.write(f"Базы {baseline_path} нет — запустите с --save-baseline")
+
+    def pick_fixtures(self):
+        """Самые нагруженные пользователь и диалог — худший случай для инбокса и истории"""
+        chatter = (
+            User.objects.annotate(chats_total=Count("chats")).filter(chats_total__gt=0)
+            .order_by("-chats_total").first()
+        )
+        chat = (
+            Chat.objects.annotate(messages_total=Count("messages")).filter(messages_total__gt=0)
+            .order_by("-messages_total").first()
+        )
+        category = Category.objects.annotate(total=Count("pet")).order_by("-total").first()
+        pets = Pet.objects.count()
+        pet_id = Pet.objects.filter(is_active=True).order_by("-id").values_list("id", flat=True).first()
+        if not (chatter and chat and category and pet_id):
+            raise CommandError("Нет данных — сначала manage.py generate_fake_data")
+        return {"user": chatter, "chat": chat, "category": category, "pets": pets, "pet_id": pet_id}
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def http_scenarios(self, fixtures):
+        """{имя: (клиент, URL, параметры)}; запросы авторизованы — кэш ответов анонимам их не перехватывает"""
+        user_client = self.client_for(fixtures["user"])
+        member = fixtures["chat"].users.first()
+        member_client = self.client_for(member)
+        chat_id = fixtures["chat"].pk
+        return {
+            "pets_list": (user_client, "/api/pets/", {}),
+            "pets_filter": (user_client, "/api/pets/", {
+                "category": fixtures["category"].slug, "price_min": 1000, "price_max": 50000,
+            }),
+            "pets_search": (user_client, "/api/pets/", {"search": "ласковый"}),
+            "pet_detail": (user_client, f"/api/pets/{fixtures['pet_id']}/", {}),
+            "pet_similar": (user_client, f"/api/pets/{fixtures['pet_id']}/similar/", {}),
+            "chat_inbox": (user_client, "/api/chats/", {}),
+            "chat_history": (member_client, f"/api/chats/{chat_id}/messages/", {}),
+            "forum_topics": (user_client, "/api/forum/", {}),
+            "profile_stats": (user_client, "/api/profile/stats/", {}),
+        }
+
+    def measure_http(self, client, url, params):
+        response = client.get(url, params)  # прогрев: импорты, кэш каталога, план запроса
+        if response.status_code != 200:
+            raise CommandError(f"GET {url} → {response.status_code}")
+
+        timings = []
+        for _ in range(self.options["repeat"]):
+            started = time.perf_counter()
+            client.get(url, params)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        # запросы и аллокации — отдельными проходами, чтобы их учёт не попадал во время.
+        # CaptureQueriesContext не годится: request_started сбрасывает connection.queries.
+        # Считаем по всем базам: чтения могут уйти на реплику (pet_project.db_routing)
+        queries = []
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(connections[alias].execute_wrapper(
+                    lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)
+                ))
+            client.get(url, params)
+        tracemalloc.start()
+        client.get(url, params)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return self.summary(timings, queries=len(queries), alloc_kb=peak / 1024)
+
+    def measure_ws(self, fixtures):
+        """Задержка доставки сообщения второму участнику через ChatConsumer (InMemoryChannelLayer)"""
+        chat = fixtures["chat"]
+        members = list(chat.users.all()[:2])
+        layers = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+        with override_settings(CHANNEL_LAYERS=layers):
+            timings = asyncio.run(self.ws_roundtrips(chat.pk, members, self.options["ws_messages"]))
+            tracemalloc.start()
+            asyncio.run(self.ws_roundtrips(chat.pk, members, 20))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        # запросы консьюмера идут из потоков database_sync_to_async — здесь они не считаются
+        return self.summary(timings, queries=None, alloc_kb=peak / 1024)
+
+    async def ws_roundtrips(self, chat_id, members, count):
+        # channels.testing тянет daphne, поэтому импортируем только здесь
+        from channels.testing import WebsocketCommunicator
+        from pet_project.asgi import application
+
+        sender, receiver = [
+            WebsocketCommunicator(application, f"/ws/chat/{chat_id}/?token={AccessToken.for_user(user)}")
+            for user in members
+        ]
+        for communicator in (sender, receiver):
+            connected, _ = await communicator.connect()
+            if not connected:
+                raise CommandError(f"Не удалось подключиться к чату {chat_id}")
+
+        timings = []
+        for i in range(count):
+            started = time.perf_counter()
+            await sender.send_json_to({"text": f"benchmark #{i}"})
+            while True:
+                event = await receiver.receive_json_from(timeout=30)
+                if event.get("type") == "message":
+                    break
+            timings.append((time.perf_counter() - started) * 1000)
+            while (await sender.receive_json_from(timeout=30)).get("type") != "message":
+                pass  # эхо отправителю
+
+        for communicator in (sender, receiver):
+            await communicator.disconnect()
+        return timings
+
+    def summary(self, timings, queries, alloc_kb):
+        return {
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(percentile(timings, 0.95), 3),
+            "queries": queries,
+            "alloc_kb": round(alloc_kb, 1),
+        }
+
+    def report(self, name, result):
+        queries = "—" if result["queries"] is None else result["queries"]
+        self.stdout.write(
+            f"{name:<14} p50={result['p50_ms']:>8.2f}мс p95={result['p95_ms']:>8.2f}мс "
+            f"запросов={queries!s:>3} аллокации={result['alloc_kb']:>8.1f}КБ"
+        )
+
+    def compare(self, baseline, results):
+        if baseline.get("vendor") != connection.vendor:
+            self.stdout.write(self.style.WARNING(
+                f"База снята на {baseline.get('vendor')}, сейчас {connection.vendor} — сравнение ориентировочное"
+            ))
+        regressions = []
+        for name, result in results.items():
+            before = baseline["results"].get(name)
+            if not before:
+                continue
+            for key, tolerance, min_delta in COMPARED:
+                old, new = before.get(key), result.get(key)
+                if old is None or new is None:
+                    continue
+                allowed = old * (1 + (self.options["tolerance"] if tolerance is None else tolerance))
+                if new > allowed and new - old > min_delta:
+                    regressions.append(f"{name}.{key}: {old} → {new}")
+
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(f"✗ {line}"))
+            raise CommandError(f"Регрессий относительно базы: {len(regressions)}")
+        self.stdout.write(self.style.SUCCESS("✅ Регрессий относительно базы нет"))
@@ -1,8 +1,13 @@
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.functions import Cast, Upper
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
 from django.utils.text import slugify
 from django.utils import timezone
 
+from . import geo
+
 User = get_user_model()
 
 
@@ -17,6 +22,10 @@ class Category(models.Model):
         ordering = ['name']
         verbose_name = "Категория"
         verbose_name_plural = "Категории"
+        indexes = [
+            # category__slug__iexact -> UPPER(slug::text) = UPPER(%s)
+            models.Index(Upper(Cast('slug', models.TextField())), name='category_slug_upper'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -28,7 +37,11 @@ class Category(models.Model):
 
 
 class Pet(models.Model):
+    LOCATION_FIELDS = {'location', 'latitude', 'longitude', 'geohash'}
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pets', verbose_name="Владелец")
+    # id во внешней системе — ключ upsert для manage.py import_pets
+    external_id = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Категория")
 
     name = models.CharField(max_length=255, verbose_name="Имя питомца")
@@ -37,9 +50,24 @@ class Pet(models.Model):
     description = models.TextField(blank=True, verbose_name="Описание")
     price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Цена")
     photo = models.ImageField(upload_to='pets/', null=True, blank=True, verbose_name="Фото")
+    # превью и WebP-варианты фото, заполняются фоново (см. ads.photos)
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    # по умолчанию — город владельца; координаты без явных значений берутся из газеттира (см. ads.geo)
+    location = models.CharField(max_length=255, blank=True, verbose_name="Местоположение")
+    latitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)], verbose_name="Широта"
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)], verbose_name="Долгота"
+    )
+    # geohash координат: поиск рядом идёт диапазонами по его индексу
+    geohash = models.CharField(max_length=geo.PRECISION, null=True, blank=True, editable=False)
 
     is_active = models.BooleanField(default=True, verbose_name="Активное объявление")
     views_count = models.PositiveIntegerField(default=0, verbose_name="Просмотры")
+    # заполняется триггером БД (см. ads.search), вручную не редактируется
+    search_vector = SearchVectorField(null=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -48,13 +76,113 @@ class Pet(models.Model):
         ordering = ['-created_at']
         verbose_name = "Объявление"
         verbose_name_plural = "Объявления"
+        # Под фильтры PetFilter и сортировки ленты (id — добивка keyset-пагинации).
+        # Проверка планов: ads.tests.QueryPlanTests (PostgreSQL) и manage.py check_query_plans
+        indexes = [
+            models.Index(fields=['is_active', 'category', '-created_at', '-id'], name='pet_active_category_created'),
+            models.Index(fields=['is_active', 'price', 'id'], name='pet_active_price'),
+            models.Index(
+                fields=['-created_at', '-id'], name='pet_feed_created', condition=models.Q(is_active=True)
+            ),
+            models.Index(
+                fields=['-views_count', '-id'], name='pet_feed_views', condition=models.Q(is_active=True)
+            ),
+            models.Index(Upper(Cast('breed', models.TextField())), name='pet_breed_upper'),
+            # near= в PetFilter: geohash >= ячейка AND geohash < следующая ячейка
+            models.Index(fields=['geohash'], name='pet_geohash'),
+        ]
 
-    def increment_views(self):
-        """ Увеличивает количество просмотров (при открытии карточки) """
-        self.views_count = models.F('views_count') + 1
-        self.save(update_fields=['views_count'])
-        # Принудительно обновляем объект в памяти
-        self.refresh_from_db()
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or self.LOCATION_FIELDS & set(update_fields):
+            geo.locate(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *self.LOCATION_FIELDS}
+        super().save(*args, **kwargs)
+
+    def increment_views(self, client_key=None):
+        """ Учитывает просмотр через буфер (см. ads.counters), строку не блокирует """
+        from .counters import record_view
+        return record_view(self.pk, self.views_count, client_key)
 
     def __str__(self):
         return f"{self.name} ({self.category})"
+
+
+class Notification(models.Model):
+    TYPE_CHOICES = [
+        ('info', 'Информация'),
+        ('message', 'Сообщение'),
+        ('system', 'Системное'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications', verbose_name="Получатель")
+    message = models.TextField(verbose_name="Текст")
+    notification_type = models.CharField(max_length=20, choices=TYPE_CHOICES, default='info', verbose_name="Тип")
+    is_read = models.BooleanField(default=False, verbose_name="Прочитано")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Уведомление"
+        verbose_name_plural = "Уведомления"
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_user_created'),
+            models.Index(fields=['user', 'id'], name='notification_user_unread', condition=models.Q(is_read=False)),
+        ]
+
+    def __str__(self):
+        return f"{self.user} — {self.message[:30]}"
+
+
+class NotificationOutbox(models.Model):
+    """
+    Очередь уведомлений: продюсер пишет одну строку в своей транзакции,
+    воркер (manage.py notification_worker) раскладывает её по получателям пачками.
+    """
+    recipient_ids = models.JSONField()
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, default='info')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class NotificationCounter(models.Model):
+    """Непрочитанные уведомления пользователя — вместо COUNT(*) на каждый запрос"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread = models.PositiveIntegerField(default=0)
+
+
+class UserStats(models.Model):
+    """
+    Статистика профиля, посчитанная заранее (см. ads.stats): эндпоинт читает одну строку.
+    dirty ставят сигналы после коммита изменений пользователя; помеченные и старше USER_STATS_MAX_AGE
+    строки пересчитывает фоновый rebuild_user_stats --stale.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total_pets = models.PositiveIntegerField(default=0)
+    active_pets = models.PositiveIntegerField(default=0)
+    hidden_pets = models.PositiveIntegerField(default=0)
+    total_views = models.PositiveBigIntegerField(default=0)
+    avg_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    chats_count = models.PositiveIntegerField(default=0)
+    unread_messages = models.PositiveIntegerField(default=0)
+    forum_topics = models.PositiveIntegerField(default=0)
+    forum_comments = models.PositiveIntegerField(default=0)
+    dirty = models.BooleanField(default=False)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+
+class SimilarPet(models.Model):
+    """
+    Готовый список похожих объявлений (см. ads.similar): rank — место соседа в списке pet.
+    /api/pets/<id>/similar/ — один запрос по индексу (pet, rank) с join объявлений-соседей.
+    """
+    pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='similar_links', db_index=False)
+    neighbor = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='similar_to')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pet', 'rank'], name='similar_pet_rank'),
+        ]
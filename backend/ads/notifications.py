@@ -0,0 +1,118 @@
+"""
+Уведомления через outbox: notify() добавляет строку в транзакции вызывающего кода,
+drain_outbox() (воркер manage.py notification_worker) раскладывает пачку строк
+по получателям одним bulk_create, обновляет счётчики непрочитанных
+и после коммита рассылает события онлайн-пользователям через channel layer.
+"""
+import asyncio
+import logging
+from collections import Counter
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+
+from chat.realtime import user_group
+from .models import Notification, NotificationCounter, NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def notify(user_ids, message, notification_type='info'):
+    """Одна строка outbox на всех получателей; доставит воркер после коммита вызывающей транзакции"""
+    user_ids = sorted({int(user_id) for user_id in user_ids})
+    if not user_ids:
+        return None
+    return NotificationOutbox.objects.create(
+        recipient_ids=user_ids, message=message, notification_type=notification_type
+    )
+
+
+def drain_outbox(batch_size=100):
+    """Разбирает до batch_size строк outbox. Возвращает число разобранных строк"""
+    with transaction.atomic():
+        entries = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size]
+        )
+        if not entries:
+            return 0
+
+        wanted = {user_id for entry in entries for user_id in entry.recipient_ids}
+        # получатели могли удалить аккаунт, пока строка ждала в очереди
+        existing = set(User.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+        notifications = Notification.objects.bulk_create(
+            [
+                Notification(user_id=user_id, message=entry.message, notification_type=entry.notification_type)
+                for entry in entries
+                for user_id in entry.recipient_ids
+                if user_id in existing
+            ],
+            batch_size=1000,
+        )
+        add_unread(Counter(n.user_id for n in notifications))
+        NotificationOutbox.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+        transaction.on_commit(lambda: push(notifications))
+    return len(entries)
+
+
+def add_unread(per_user):
+    """+n к счётчикам пользователей одним UPDATE (строки счётчиков создаются при необходимости)"""
+    if not per_user:
+        return
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in per_user], ignore_conflicts=True
+    )
+    NotificationCounter.objects.filter(user_id__in=per_user).update(
+        unread=F('unread') + Case(
+            *[When(user_id=user_id, then=Value(count)) for user_id, count in per_user.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def push(notifications):
+    """Событие notification в группу пользователя; офлайн-получателям достаточно записи в БД"""
+    if not notifications:
+        return
+    channel_layer = get_channel_layer()
+
+    async def send_all():
+        await asyncio.gather(*(
+            channel_layer.group_send(user_group(n.user_id), {
+                'type': 'notification.event',
+                'notification': {
+                    'id': n.id,
+                    'message': n.message,
+                    'notification_type': n.notification_type,
+                    'created_at': n.created_at.isoformat(),
+                },
+            })
+            for n in notifications
+        ))
+
+    try:
+        async_to_sync(send_all)()
+    except Exception:
+        logger.exception('Не удалось разослать %s уведомлений', len(notifications))
+
+
+def unread_count(user):
+    return NotificationCounter.objects.filter(user=user).values_list('unread', flat=True).first() or 0
+
+
+def mark_read(user, up_to_id=None):
+    """Отмечает прочитанными уведомления до up_to_id включительно (по умолчанию все) одним UPDATE"""
+    unread = Notification.objects.filter(user=user, is_read=False)
+    if up_to_id is not None:
+        unread = unread.filter(id__lte=up_to_id)
+    with transaction.atomic():
+        updated = unread.update(is_read=True)
+        if updated:
+            NotificationCounter.objects.filter(user=user).update(unread=Greatest(F('unread') - updated, 0))
+    return updated
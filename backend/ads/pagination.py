@@ -1,7 +1,264 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .filters import DISTANCE_ORDERING, NEAR_PARAM
 
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 12
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+
+def estimate_count(queryset):
+    """
+    Приблизительное число строк без COUNT(*): reltuples из pg_class для всей таблицы,
+    оценка планировщика для отфильтрованного запроса. Вне PostgreSQL — точный count().
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    queryset = queryset.order_by()
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            estimate = cursor.fetchone()[0]
+            if estimate >= 0:  # -1 — таблица ещё ни разу не анализировалась
+                return estimate
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+async def aestimate_count(queryset):
+    if connections[queryset.db].vendor != 'postgresql':
+        return await queryset.acount()
+    # EXPLAIN через курсор — у async ORM для него нет API
+    return await sync_to_async(estimate_count)(queryset)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (ordering-поле, id) вместо OFFSET + COUNT(*).
+    Курсоры непрозрачные и подписаны SECRET_KEY — подделать их нельзя.
+    NULL-значения идут последними при возрастании и первыми при убывании.
+    """
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering_param = api_settings.ORDERING_PARAM
+    total_query_param = 'with_total'
+    default_ordering = '-created_at'
+    cursor_salt = 'ads.pagination.keyset'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_query = self.get_page_query(queryset, request, view)
+        if request.query_params.get(self.total_query_param):
+            self.total = estimate_count(queryset)
+        return self.set_page(list(page_query))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """То же для async-вьюх (ads.async_views)"""
+        page_query = self.get_page_query(queryset, request, view)
+        if request.query_params.get(self.total_query_param):
+            self.total = await aestimate_count(queryset)
+        return self.set_page([row async for row in page_query.aiterator()])
+
+    def get_page_query(self, queryset, request, view):
+        """Запрос страницы (page_size + 1 строк — признак следующей) без выполнения"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, view)
+        self.field_name = self.ordering.lstrip('-')
+        self.field = queryset.model._meta.get_field(self.field_name)
+        self.total = None
+        self.page_size_value = self.get_page_size(request)
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = bool(self.cursor and self.cursor['r'])
+        descending = self.ordering.startswith('-') != self.reverse
+
+        queryset = queryset.order_by(*self.get_order_by(descending))
+        if self.cursor:
+            value = None if self.cursor['v'] is None else self.field.to_python(self.cursor['v'])
+            queryset = queryset.filter(self.get_keyset_filter(value, self.cursor['id'], descending))
+        return queryset[:self.page_size_value + 1]
+
+    def set_page(self, rows):
+        has_more = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        payload = {}
+        if self.total is not None:
+            payload['count'] = self.total
+        payload.update({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'description': f'Приблизительно, только с ?{self.total_query_param}=1'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {'name': self.cursor_query_param, 'required': False, 'in': 'query', 'schema': {'type': 'string'}},
+            {'name': self.page_size_query_param, 'required': False, 'in': 'query', 'schema': {'type': 'integer'}},
+            {'name': self.total_query_param, 'required': False, 'in': 'query', 'schema': {'type': 'boolean'}},
+        ]
+
+    def get_ordering(self, request, view):
+        allowed = set(getattr(view, 'ordering_fields', None) or [])
+        for term in request.query_params.get(self.ordering_param, '').split(','):
+            term = term.strip()
+            if term.lstrip('-') in allowed:
+                return term
+        return self.default_ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def get_order_by(self, descending):
+        if descending:
+            return [F(self.field_name).desc(nulls_first=True), '-id']
+        return [F(self.field_name).asc(nulls_last=True), 'id']
+
+    def get_keyset_filter(self, value, last_id, descending):
+        """Строки строго после (value, last_id) в выбранном порядке"""
+        name, nullable = self.field_name, self.field.null
+        if descending:
+            if value is None:
+                return Q(**{f'{name}__isnull': True, 'id__lt': last_id}) | Q(**{f'{name}__isnull': False})
+            return Q(**{f'{name}__lt': value}) | Q(**{name: value, 'id__lt': last_id})
+        if value is None:
+            return Q(**{f'{name}__isnull': True, 'id__gt': last_id})
+        condition = Q(**{f'{name}__gt': value}) | Q(**{name: value, 'id__gt': last_id})
+        if nullable:
+            condition |= Q(**{f'{name}__isnull': True})
+        return condition
+
+    def encode_cursor(self, row, reverse):
+        if isinstance(row, dict):
+            # строки .values() (PetReadSerializer)
+            value, row_id = row[self.field_name], row['id']
+        else:
+            value, row_id = getattr(row, self.field_name), row.pk
+        # value_to_string читает значение атрибутом объекта
+        holder = SimpleNamespace(**{self.field.attname: value})
+        payload = {
+            'o': self.ordering,
+            'v': None if value is None else self.field.value_to_string(holder),
+            'id': row_id,
+            'r': reverse,
+        }
+        token = signing.dumps(payload, salt=self.cursor_salt, compress=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            cursor = signing.loads(token, salt=self.cursor_salt)
+        except signing.BadSignature:
+            raise NotFound('Неверный курсор')
+        if cursor.get('o') != self.ordering:
+            raise NotFound('Курсор не соответствует сортировке')
+        return cursor
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+
+class PetPagination(BasePagination):
+    """
+    Лента объявлений: по умолчанию keyset-курсоры, ?page=N — прежняя постраничная
+    пагинация. Ранжированный поиск без явной сортировки и сортировка по расстоянию
+    тоже идут постранично.
+    """
+    page_query_param = 'page'
+
+    def __init__(self):
+        self.keyset = KeysetPagination()
+        self.page_number = StandardResultsSetPagination()
+        self.delegate = self.keyset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.choose(request)
+        return self.delegate.paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.choose(request)
+        if self.delegate is self.keyset:
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+        # постраничный режим (Paginator с COUNT(*)) — редкий путь, остаётся синхронным
+        return await sync_to_async(self.page_number.paginate_queryset)(queryset, request, view)
+
+    def choose(self, request):
+        params = request.query_params
+        ranked_search = params.get(api_settings.SEARCH_PARAM) and not params.get(self.keyset.ordering_param)
+        # расстояние — вычисляемое поле, курсор по нему не строится
+        by_distance = params.get(NEAR_PARAM) and params.get(self.keyset.ordering_param) == DISTANCE_ORDERING
+        paged = self.page_query_param in params or ranked_search or by_distance
+        self.delegate = self.page_number if paged else self.keyset
+
+    def get_paginated_response(self, data):
+        return self.delegate.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.keyset.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return (
+            self.keyset.get_schema_operation_parameters(view)
+            + self.page_number.get_schema_operation_parameters(view)[:1]
+        )
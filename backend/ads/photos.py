@@ -0,0 +1,153 @@
+"""
+Фоновая обработка Pet.photo: варианты (ads.imaging) считаются в пуле процессов,
+а запись в хранилище и в БД делает поток записи родительского процесса по готовности.
+Любой сбой (пул упал, процесс перезапущен) оставляет фото необработанным —
+его достроит process_photos.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+
+from . import imaging, response_cache
+from .models import Pet
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_TO = 'pets/'
+
+_executor = None
+_executor_lock = threading.Lock()
+# готовые задачи пула: (pet_id, photo_name, пул, future) -> поток записи
+_results = queue.Queue()
+_writer = None
+
+
+def get_executor(workers=None):
+    """Общий пул процессов (spawn: дочерним процессам не нужны Django и соединения с БД)"""
+    global _executor, _writer
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=workers or settings.IMAGE_PIPELINE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        if _writer is None:
+            _writer = threading.Thread(target=write_results, name='photo-variants-writer', daemon=True)
+            _writer.start()
+        return _executor
+
+
+def discard_executor(executor):
+    """Сломанный пул (дочерний процесс упал, например по OOM) задач не примет: следующий get_executor создаст новый"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def needs_processing(photo_name, variants):
+    """Фото загружено, но варианты для него ещё не построены"""
+    return bool(photo_name) and (variants or {}).get('source') != photo_name
+
+
+def schedule(pet):
+    """Обработать фото после коммита транзакции, в которой оно сохранено"""
+    pet_id, photo_name = pet.pk, pet.photo.name
+    transaction.on_commit(lambda: submit(pet_id, photo_name))
+
+
+def submit(pet_id, photo_name):
+    # выполняется в on_commit: строка уже закоммичена, ошибка здесь не должна стать ответом 500
+    try:
+        data = read_source(photo_name)
+        if data is None:
+            return
+        if not settings.IMAGE_PIPELINE_WORKERS:
+            store_variants(pet_id, photo_name, imaging.render_variants(data))
+            return
+        executor = get_executor()
+        try:
+            future = executor.submit(imaging.render_variants, data)
+        except BrokenProcessPool:
+            discard_executor(executor)
+            executor = get_executor()
+            future = executor.submit(imaging.render_variants, data)
+        # служебный поток пула только передаёт результат потоку записи
+        future.add_done_callback(lambda done: _results.put((pet_id, photo_name, executor, done)))
+    except Exception:
+        logger.exception('Фото %s объявления %s не поставлено в обработку, его построит process_photos', photo_name, pet_id)
+
+
+def write_results():
+    """Поток записи: сохраняет варианты из пула в хранилище и БД, соединение закрывает после каждой задачи"""
+    while True:
+        pet_id, photo_name, executor, future = _results.get()
+        try:
+            store_variants(pet_id, photo_name, future.result())
+        except BrokenProcessPool:
+            logger.error('Пул обработки фото упал на %s объявления %s, пул пересоздаётся', photo_name, pet_id)
+            discard_executor(executor)
+        except Exception:
+            logger.exception('Не удалось обработать фото %s объявления %s', photo_name, pet_id)
+        finally:
+            connection.close()
+
+
+def read_source(photo_name):
+    storage = Pet._meta.get_field('photo').storage
+    try:
+        with storage.open(photo_name, 'rb') as source:
+            return source.read()
+    except OSError:
+        logger.warning('Исходное фото %s не найдено', photo_name)
+        return None
+
+
+def store_variants(pet_id, photo_name, rendered):
+    """
+    Сохраняет варианты (одинаковое содержимое пишется один раз — имя из хэша)
+    и подменяет фото на очищенный от EXIF large. Если фото успели заменить, ничего не меняет.
+    """
+    storage = Pet._meta.get_field('photo').storage
+    variants = {}
+    for variant, item in rendered.items():
+        entry = {'width': item['width'], 'height': item['height']}
+        for fmt in imaging.FORMATS:
+            name, content = item[fmt]
+            path = UPLOAD_TO + name
+            if not storage.exists(path):
+                path = storage.save(path, ContentFile(content))
+            entry[fmt] = path
+        variants[variant] = entry
+
+    photo = variants['large']['jpeg']
+    variants['source'] = photo
+    updated = Pet.objects.filter(pk=pet_id, photo=photo_name).update(photo=photo, photo_variants=variants)
+    if updated:
+        # update() мимо сигналов — сбрасываем кэш ответов сами
+        response_cache.bump('pets', f'pet:{pet_id}')
+    if updated and photo != photo_name and is_disposable_source(photo_name):
+        # исходник с метаданными больше не нужен
+        storage.delete(photo_name)
+    return bool(updated)
+
+
+def is_disposable_source(photo_name):
+    """
+    Исходник можно удалить, только если это загруженный файл, а не вариант: варианты
+    (имя — хэш содержимого) общие у объявлений с одинаковым фото, например при process_photos --force.
+    И только если на него больше не ссылается ни одно объявление.
+    """
+    return (
+        imaging.VARIANT_NAME_RE.fullmatch(os.path.basename(photo_name)) is None
+        and not Pet.objects.filter(photo=photo_name).exists()
+    )
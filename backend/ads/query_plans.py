@@ -0,0 +1,113 @@
+"""
+Планы запросов ленты объявлений (только PostgreSQL): EXPLAIN для всех комбинаций фильтров
+PetFilter и сортировок так, как их строит API. Seq Scan по ads_pet — регрессия индексов.
+Используют тест ads.tests.QueryPlanTests и команда check_query_plans.
+"""
+import itertools
+import json
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from .filters import PetFilter
+from .management.commands.init_categories import DEFAULT_CATEGORIES, bulk_create_categories
+from .models import Category, Pet
+from .pagination import KeysetPagination
+
+User = get_user_model()
+
+BREEDS = ['Лабрадор', 'Мейн-кун', 'Британская', 'Корелла', 'Джунгарский', 'Такса', 'Сфинкс', 'Метис']
+
+# Фильтры, которые отдаёт API (значения подставляются из данных)
+FILTER_SETS = [
+    (),
+    ('category',),
+    ('breed',),
+    ('price_min',),
+    ('price_min', 'price_max'),
+    ('category', 'breed'),
+    ('category', 'price_min', 'price_max'),
+    ('near',),
+    ('category', 'near'),
+]
+ORDERINGS = ['-created_at', 'created_at', 'price', '-price', 'views_count', '-views_count']
+
+
+def seed_pets(count, batch_size=10000):
+    """Синтетические объявления по категориям по умолчанию; повторный вызов только добавляет объявления"""
+    user, _ = User.objects.get_or_create(username='benchmark')
+    bulk_create_categories(DEFAULT_CATEGORIES)
+    categories = list(Category.objects.filter(name__in=[name for name, _, _ in DEFAULT_CATEGORIES]))
+
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        Pet.objects.bulk_create([
+            Pet(
+                user=user,
+                category=random.choice(categories),
+                name=f'Питомец {created + i}',
+                breed=random.choice(BREEDS),
+                price=None if random.random() < 0.1 else Decimal(random.randint(0, 100000)),
+                views_count=random.randint(0, 5000),
+                is_active=random.random() < 0.9,
+            )
+            for i in range(size)
+        ])
+        created += size
+    return created
+
+
+def feed_querysets():
+    """(метка, queryset страницы ленты) для каждой комбинации фильтров и сортировки"""
+    sample = {
+        'category': Category.objects.values_list('slug', flat=True).first() or 'sobaki',
+        'breed': BREEDS[0].lower(),
+        'price_min': '1000',
+        'price_max': '5000',
+        'near': '55.7558,37.6173',
+    }
+    paginator = KeysetPagination()
+    for filter_names, ordering in itertools.product(FILTER_SETS, ORDERINGS):
+        params = {name: sample[name] for name in filter_names}
+        # так же, как лента для анонимного пользователя
+        queryset = PetFilter(params, queryset=Pet.objects.filter(is_active=True)).qs
+        paginator.field_name = ordering.lstrip('-')
+        queryset = queryset.order_by(*paginator.get_order_by(ordering.startswith('-')))[:paginator.page_size + 1]
+        yield f"{','.join(filter_names) or '—':<30} ordering={ordering}", queryset
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def walk(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from walk(child)
+
+
+def pet_seq_scans(plan):
+    return [
+        node for node in walk(plan)
+        if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') == Pet._meta.db_table
+    ]
+
+
+def check_feed_plans():
+    """[(метка, план, есть ли Seq Scan по ads_pet)] после свежего ANALYZE"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'ANALYZE {Pet._meta.db_table}')
+    results = []
+    for label, queryset in feed_querysets():
+        plan = explain(queryset)
+        results.append((label, plan, bool(pet_seq_scans(plan))))
+    return results
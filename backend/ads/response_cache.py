@@ -0,0 +1,196 @@
+"""
+Кэш готовых ответов API для анонимных пользователей.
+
+Ключ ответа включает поколения (generation) данных, от которых он зависит:
+'pets' — любое объявление, 'pet:<id>' — конкретное, 'categories' — категории,
+'similar' — списки похожих объявлений (ads.similar).
+Сигналы увеличивают поколения, старые ключи просто перестают читаться и истекают по TTL.
+Бэкенд — любой кэш Django (RESPONSE_CACHE['ALIAS']): память процесса или Redis.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+DEFAULT_RESPONSE_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,  # страховка: просмотры и счётчики категорий обновляются без сигналов (сек)
+}
+
+GENERATION_PREFIX = 'ads:resp:gen:'
+# ответ зависит от пользователя: JWT в Authorization или сессия в Cookie
+VARY_HEADERS = ('Authorization', 'Cookie')
+
+
+def get_config():
+    return {**DEFAULT_RESPONSE_CACHE, **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+def get_cache():
+    return caches[get_config()['ALIAS']]
+
+
+def get_generations(scopes):
+    cache = get_cache()
+    keys = [GENERATION_PREFIX + scope for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+async def aget_generations(scopes):
+    cache = get_cache()
+    keys = [GENERATION_PREFIX + scope for scope in scopes]
+    found = await cache.aget_many(keys)
+    for key in keys:
+        if key not in found:
+            await cache.aadd(key, time.time_ns(), None)
+            found[key] = await cache.aget(key)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Новое поколение для scopes — закэшированные ответы по ним больше не отдаются"""
+    cache = get_cache()
+    for scope in scopes:
+        key = GENERATION_PREFIX + scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def normalized_query(request):
+    """Параметры запроса в каноническом виде: порядок ключей и значений не важен, пустые отброшены"""
+    items = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+        if value != ''
+    )
+    return urlencode(items)
+
+
+def make_etag(content):
+    return '"%s"' % hashlib.sha1(content).hexdigest()
+
+
+class ResponseCacheMixin:
+    """
+    Кэширует list/retrieve для анонимных и отвечает 304 на If-None-Match.
+    Авторизованные видят другие данные (скрытые объявления, свои действия) —
+    им считается только ETag, без общего кэша.
+
+    Поколения, от которых зависят ответы, — cache_scopes или get_cache_scopes(),
+    если они зависят от действия; без них класс не создаётся.
+    """
+    cached_actions = ('list', 'retrieve')
+    cache_scopes = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not cls.cache_scopes and cls.get_cache_scopes is ResponseCacheMixin.get_cache_scopes:
+            raise ImproperlyConfigured(
+                f'{cls.__qualname__}: задайте cache_scopes или get_cache_scopes() для ResponseCacheMixin'
+            )
+
+    def get_cache_scopes(self):
+        return list(self.cache_scopes)
+
+    def is_cacheable(self, request):
+        return (
+            request.method == 'GET'
+            and getattr(self, 'action', None) in self.cached_actions
+            and not request.user.is_authenticated
+        )
+
+    def get_response_cache_key(self, request, generations=None):
+        if generations is None:
+            generations = get_generations(self.get_cache_scopes())
+        generations = ':'.join(str(gen) for gen in generations)
+        # хост и схема входят в ключ: в ответе абсолютные ссылки (next/previous, фото)
+        url = f'{request.build_absolute_uri(request.path)}?{normalized_query(request)}'
+        query = hashlib.sha1(url.encode()).hexdigest()
+        renderer = request.accepted_renderer.format
+        return f'ads:resp:{self.basename}:{self.action}:{renderer}:{generations}:{query}'
+
+    def list(self, request, *args, **kwargs):
+        cached = self.cached_response(request)
+        if cached is not None:
+            return cached
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        cached = self.cached_response(request)
+        if cached is not None:
+            return cached
+        return super().retrieve(request, *args, **kwargs)
+
+    def cached_response(self, request):
+        if not self.is_cacheable(request):
+            return None
+        self._response_cache_key = self.get_response_cache_key(request)
+        entry = get_cache().get(self._response_cache_key)
+        return None if entry is None else self.entry_response(entry)
+
+    def entry_response(self, entry):
+        etag, content_type, content = entry
+        response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['X-Cache'] = 'HIT'
+        return response
+
+    async def acached_response(self, request):
+        """cached_response для async-вьюх (ads.async_views): кэш читается через async API"""
+        if not self.is_cacheable(request):
+            return None
+        generations = await aget_generations(self.get_cache_scopes())
+        self._response_cache_key = self.get_response_cache_key(request, generations)
+        entry = await get_cache().aget(self._response_cache_key)
+        return None if entry is None else self.entry_response(entry)
+
+    async def afinalize_content(self, request, response):
+        """finalize_response для готового HttpResponse async-вьюхи: ETag, запись в кэш, 304"""
+        patch_vary_headers(response, VARY_HEADERS)
+        if response.status_code != 200:
+            return response
+        if not response.has_header('ETag'):
+            response['ETag'] = make_etag(response.content)
+            cache_key = getattr(self, '_response_cache_key', None)
+            if cache_key:
+                await get_cache().aset(
+                    cache_key,
+                    (response['ETag'], response['Content-Type'], response.content),
+                    get_config()['TIMEOUT'],
+                )
+                response['X-Cache'] = 'MISS'
+        return get_conditional_response(request, etag=response['ETag'], response=response)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method != 'GET' or getattr(self, 'action', None) not in self.cached_actions:
+            return response
+        patch_vary_headers(response, VARY_HEADERS)
+        if response.status_code != 200:
+            return response
+
+        if not response.has_header('ETag'):
+            response.render()
+            response['ETag'] = make_etag(response.content)
+            cache_key = getattr(self, '_response_cache_key', None)
+            if cache_key:
+                get_cache().set(
+                    cache_key,
+                    (response['ETag'], response['Content-Type'], response.content),
+                    get_config()['TIMEOUT'],
+                )
+                response['X-Cache'] = 'MISS'
+        return get_conditional_response(request, etag=response['ETag'], response=response)
@@ -0,0 +1,111 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F
+from rest_framework import filters
+
+from .models import Pet
+
+SEARCH_CONFIG = 'russian'
+PET_TABLE = Pet._meta.db_table
+FTS_TABLE = f'{PET_TABLE}_fts'
+
+POSTGRES_SETUP = [
+    f"""
+    CREATE OR REPLACE FUNCTION {PET_TABLE}_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.breed, '')), 'B') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.description, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"DROP TRIGGER IF EXISTS {PET_TABLE}_search_vector_trigger ON {PET_TABLE}",
+    # search_vector в списке колонок: полный save() из Django тоже пересчитывает вектор
+    f"""
+    CREATE TRIGGER {PET_TABLE}_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, breed, description, search_vector ON {PET_TABLE}
+    FOR EACH ROW EXECUTE FUNCTION {PET_TABLE}_search_vector_update()
+    """,
+    f"UPDATE {PET_TABLE} SET search_vector = NULL WHERE search_vector IS NULL",
+    f"CREATE INDEX IF NOT EXISTS {PET_TABLE}_search_vector_gin ON {PET_TABLE} USING gin (search_vector)",
+]
+
+SQLITE_SETUP = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, breed, description,
+        content='{PET_TABLE}', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {PET_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, breed, description)
+        VALUES (new.id, new.name, new.breed, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {PET_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, breed, description)
+        VALUES ('delete', old.id, old.name, old.breed, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, breed, description ON {PET_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, breed, description)
+        VALUES ('delete', old.id, old.name, old.breed, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, breed, description)
+        VALUES (new.id, new.name, new.breed, new.description);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def install_search_backend(using='default'):
+    """Создаёт триггеры и индексы полнотекстового поиска (идемпотентно)"""
+    connection = connections[using]
+    statements = {'postgresql': POSTGRES_SETUP, 'sqlite': SQLITE_SETUP}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def fts5_query(terms):
+    """Термы пользователя -> безопасный запрос FTS5 (все слова, по префиксу)"""
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Поиск по ?search= с ранжированием:
+    PostgreSQL — tsvector (russian) + GIN + ts_rank, SQLite — FTS5 + bm25,
+    остальные СУБД — обычный ILIKE из SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        vendor = connections[queryset.db].vendor
+        if vendor == 'postgresql':
+            query = SearchQuery(' '.join(terms), config=SEARCH_CONFIG, search_type='websearch')
+            queryset = queryset.filter(search_vector=query).annotate(
+                search_rank=SearchRank(F('search_vector'), query)
+            )
+        elif vendor == 'sqlite':
+            # join с FTS5-таблицей: bm25() доступна только в контексте MATCH
+            queryset = queryset.extra(
+                tables=[FTS_TABLE],
+                where=[f'{FTS_TABLE}.rowid = {PET_TABLE}.id', f'{FTS_TABLE} MATCH %s'],
+                params=[fts5_query(terms)],
+                # bm25 тем меньше, чем релевантнее — инвертируем, как ts_rank
+                select={'search_rank': f'-bm25({FTS_TABLE})'},
+            )
+        else:
+            return super().filter_queryset(request, queryset, view)
+
+        # явный ?ordering= из OrderingFilter применится позже и перекроет ранжирование
+        return queryset.order_by('-search_rank', '-created_at')
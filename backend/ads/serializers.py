@@ -1,6 +1,10 @@
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Pet, Category
+from django.utils import timezone
+from .models import Pet, Category, Notification, UserStats
+from . import catalog, geo, imaging
 
 User = get_user_model()
 
@@ -13,7 +17,57 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ["id", "name", "slug", "icon", "description", "pet_count"]
 
     def get_pet_count(self, obj):
-        return obj.pet_set.filter(is_active=True).count()
+        # pet_count приходит из annotate() (см. catalog.annotated_categories)
+        if hasattr(obj, 'pet_count'):
+            return obj.pet_count
+        cached = catalog.get_category(obj.id)
+        return cached['pet_count'] if cached else 0
+
+
+class CachedCategoryField(serializers.Field):
+    """Вложенная категория из каталога в памяти процесса — без запросов на каждую строку"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs.setdefault('source', 'category_id')
+        super().__init__(**kwargs)
+        self._categories = None
+
+    def to_representation(self, value):
+        # снимок каталога берём один раз на ответ
+        if self._categories is None:
+            self._categories = catalog.get_categories()
+        return self._categories.get(value)
+
+
+class PhotoVariantsField(serializers.Field):
+    """Превью и srcset по форматам из Pet.photo_variants; None, пока фото не обработано"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value or 'source' not in value:
+            return None
+        storage = Pet._meta.get_field('photo').storage
+        request = self.context.get('request')
+
+        def url(name):
+            location = storage.url(name)
+            return request.build_absolute_uri(location) if request else location
+
+        variants = {name: value[name] for name in imaging.VARIANTS if name in value}
+        data = {
+            name: {'width': item['width'], 'height': item['height'],
+                   **{fmt: url(item[fmt]) for fmt in imaging.FORMATS}}
+            for name, item in variants.items()
+        }
+        data['srcset'] = {
+            fmt: ', '.join(f"{data[name][fmt]} {item['width']}w" for name, item in variants.items())
+            for fmt in imaging.FORMATS
+        }
+        return data
 
 
 class UserShortSerializer(serializers.ModelSerializer):
@@ -24,7 +78,8 @@ class UserShortSerializer(serializers.ModelSerializer):
 
 class PetSerializer(serializers.ModelSerializer):
     user = UserShortSerializer(read_only=True)
-    category = CategorySerializer(read_only=True)
+    category = CachedCategoryField()
+    photo_variants = PhotoVariantsField()
     category_id = serializers.PrimaryKeyRelatedField(
         source="category",
         queryset=Category.objects.all(),
@@ -37,14 +92,135 @@ class PetSerializer(serializers.ModelSerializer):
         fields = [
             "id", "user", "category", "category_id",
             "name", "breed", "age", "description", "price",
-            "photo", "is_active", "views_count",
+            "location", "latitude", "longitude",
+            "photo", "photo_variants", "is_active", "views_count",
             "created_at", "updated_at"
         ]
         read_only_fields = ["id", "user", "views_count", "created_at", "updated_at"]
 
+    def validate(self, attrs):
+        point = [name for name in ("latitude", "longitude") if attrs.get(name) is not None]
+        if len(point) == 1:
+            raise serializers.ValidationError({"detail": "Широта и долгота задаются вместе"})
+        if "location" in attrs and not point:
+            # новое место без координат — геокодируем заново (Pet.save -> geo.locate)
+            attrs["latitude"] = attrs["longitude"] = None
+        return attrs
+
     def create(self, validated_data):
         request = self.context.get("request")
         user = getattr(request, "user", None)
         if not user or user.is_anonymous:
             raise serializers.ValidationError({"detail": "Авторизация обязательна"})
-        return Pet.objects.create(user=user, **validated_data)
+        # perform_create уже передаёт user через save(user=...)
+        validated_data.setdefault("user", user)
+        return Pet.objects.create(**validated_data)
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ["id", "message", "notification_type", "is_read", "created_at"]
+        read_only_fields = fields
+
+
+class UserStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserStats
+        fields = [
+            "total_pets", "active_pets", "hidden_pets", "total_views", "avg_price",
+            "chats_count", "unread_messages", "forum_topics", "forum_comments", "computed_at",
+        ]
+        read_only_fields = fields
+
+
+class PetReadSerializer:
+    """
+    Быстрый путь чтения для PetViewSet: тот же JSON, что у PetSerializer, но из строк .values()
+    (см. values()) без полей DRF на каждую строку. Цены и даты форматируют поля PetSerializer,
+    категория берётся из каталога, пользователь собирается один раз на id.
+    """
+    pet_fields = (
+        "id", "category_id", "name", "breed", "age", "description", "price",
+        "location", "latitude", "longitude",
+        "photo", "photo_variants", "is_active", "views_count", "created_at", "updated_at",
+    )
+    user_fields = UserShortSerializer.Meta.fields
+
+    def __init__(self, instance, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @classmethod
+    def values(cls, queryset):
+        # расстояние есть у запросов с ?near= (ads.geo.nearby)
+        extra = [geo.DISTANCE_ANNOTATION] if geo.DISTANCE_ANNOTATION in queryset.query.annotations else []
+        return queryset.values(*cls.pet_fields, *(f"user__{name}" for name in cls.user_fields), *extra)
+
+    @property
+    def data(self):
+        fields = PetSerializer(context=self.context).fields
+        self._price = fields["price"].to_representation
+        self._datetime = fields["created_at"].to_representation
+        if api_settings.DATETIME_FORMAT == ISO_8601 and settings.USE_TZ:
+            # часовой пояс DateTimeField ищет на каждое значение — берём его один раз
+            self._timezone = timezone.get_current_timezone()
+            self._datetime = self.format_datetime
+        self._photo_variants = fields["photo_variants"].to_representation
+        # async-вьюхи передают каталог, полученный заранее (ads.async_views)
+        self._categories = self.context["categories"] if "categories" in self.context else catalog.get_categories()
+        self._users = {}
+        self._request = self.context.get("request")
+        self._pet_storage = Pet._meta.get_field("photo").storage
+        self._avatar_storage = User._meta.get_field("avatar").storage
+        if self.many:
+            return [self.to_representation(row) for row in self.instance]
+        return self.to_representation(self.instance)
+
+    def format_datetime(self, value):
+        # как DateTimeField DRF в формате ISO 8601
+        value = value.astimezone(self._timezone).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    def file_url(self, storage, name):
+        # как FileField DRF: абсолютный URL, если есть запрос
+        if not name:
+            return None
+        url = storage.url(name)
+        return self._request.build_absolute_uri(url) if self._request else url
+
+    def get_user(self, row):
+        user_id = row["user__id"]
+        user = self._users.get(user_id)
+        if user is None:
+            user = self._users[user_id] = {
+                name: row[f"user__{name}"] for name in self.user_fields
+            }
+            user["avatar"] = self.file_url(self._avatar_storage, user["avatar"])
+        return user
+
+    def to_representation(self, row):
+        price = row["price"]
+        data = {
+            "id": row["id"],
+            "user": self.get_user(row),
+            "category": self._categories.get(row["category_id"]),
+            "name": row["name"],
+            "breed": row["breed"],
+            "age": row["age"],
+            "description": row["description"],
+            "price": None if price is None else self._price(price),
+            "location": row["location"],
+            "latitude": row["latitude"],
+            "longitude": row["longitude"],
+            "photo": self.file_url(self._pet_storage, row["photo"]),
+            "photo_variants": self._photo_variants(row["photo_variants"]),
+            "is_active": row["is_active"],
+            "views_count": row["views_count"],
+            "created_at": self._datetime(row["created_at"]),
+            "updated_at": self._datetime(row["updated_at"]),
+        }
+        if geo.DISTANCE_ANNOTATION in row:
+            data[geo.DISTANCE_ANNOTATION] = round(row[geo.DISTANCE_ANNOTATION], 3)
+        return data
@@ -1,9 +1,9 @@
 import logging
-from .models import Notification
+from .notifications import notify
 
 logger = logging.getLogger(__name__)
 
 def send_notification(user, message, notification_type='info'):
-    """Создаёт уведомление пользователю"""
-    Notification.objects.create(user=user, message=message, notification_type=notification_type)
-    logger.info(f"Notification sent to {user.username}: {message}")
+    """Ставит уведомление пользователю в outbox (доставит notification_worker)"""
+    notify([user.pk], message, notification_type)
+    logger.info(f"Notification queued for {user.username}: {message}")
@@ -0,0 +1,84 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Pet, Category
+from chat.models import Chat
+from . import catalog, photos, response_cache, stats
+from .search import install_search_backend
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Pet)
+def invalidate_category_catalog(sender, **kwargs):
+    # после коммита: иначе параллельный запрос соберёт каталог из старых данных под новой версией
+    transaction.on_commit(catalog.invalidate)
+
+
+@receiver(post_save, sender=Pet)
+def invalidate_catalog_on_pet_save(sender, instance, update_fields=None, **kwargs):
+    # просмотры на pet_count не влияют — не сбрасываем каталог на каждый показ карточки
+    if update_fields is not None and set(update_fields) <= {'views_count'}:
+        return
+    transaction.on_commit(catalog.invalidate)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_responses(sender, **kwargs):
+    # категория вложена во все ответы по объявлениям
+    transaction.on_commit(partial(response_cache.bump, 'categories'))
+
+
+@receiver(post_save, sender=Pet)
+@receiver(post_delete, sender=Pet)
+def invalidate_pet_responses(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'views_count'}:
+        return
+    transaction.on_commit(partial(response_cache.bump, 'pets', f'pet:{instance.pk}'))
+
+
+@receiver(post_save, sender=Pet)
+def process_uploaded_photo(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and 'photo' not in update_fields):
+        return
+    if photos.needs_processing(instance.photo.name, instance.photo_variants):
+        photos.schedule(instance)
+
+
+@receiver(post_save, sender=Pet)
+@receiver(post_delete, sender=Pet)
+def mark_owner_stats_dirty(sender, instance, update_fields=None, **kwargs):
+    # просмотры учитываются по USER_STATS_MAX_AGE, а не пометкой на каждый показ
+    if update_fields is not None and set(update_fields) <= {'views_count'}:
+        return
+    transaction.on_commit(partial(stats.mark_dirty, [instance.user_id]))
+
+
+@receiver(m2m_changed, sender=Chat.users.through)
+def mark_chat_members_stats_dirty(sender, instance, action, pk_set=None, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if isinstance(instance, Chat):
+        user_ids = pk_set if action != 'pre_clear' else instance.users.values_list('pk', flat=True)
+        transaction.on_commit(partial(stats.mark_dirty, list(user_ids)))
+    else:
+        transaction.on_commit(partial(stats.mark_dirty, [instance.pk]))
+
+
+@receiver(post_save, sender='forum.ForumTopic')
+@receiver(post_delete, sender='forum.ForumTopic')
+@receiver(post_save, sender='forum.ForumComment')
+@receiver(post_delete, sender='forum.ForumComment')
+def mark_author_stats_dirty(sender, instance, created=True, **kwargs):
+    # правка текста на счётчики не влияет
+    if created:
+        transaction.on_commit(partial(stats.mark_dirty, [instance.author_id]))
+
+
+def install_search(sender, using='default', **kwargs):
+    """post_migrate: триггеры и индексы полнотекстового поиска"""
+    install_search_backend(using)
@@ -0,0 +1,321 @@
+"""
+Похожие объявления (/api/pets/<id>/similar/): соседи считаются заранее, эндпоинт читает готовый список.
+
+Объявление — разреженный вектор (scipy.sparse): TF-IDF по словам name/breed/description,
+категория, ценовой и возрастной диапазоны. Блоки нормируются и взвешиваются (BLOCK_WEIGHTS),
+затем строка нормируется целиком: скалярное произведение строк — косинусная близость.
+
+rebuild() — полная пересборка: словарь и idf по всем активным объявлениям, top-K соседей
+блоками X[i:j] @ X.T, таблица SimilarPet переписывается в одной транзакции. Модель (словарь, idf,
+матрица признаков) сохраняется в SIMILAR_PETS['MODEL_PATH'].
+
+update() — между пересборками: объявления, изменённые после сборки модели (updated_at) или вновь
+ставшие активными, векторизуются тем же словарём, получают свои списки и встают в списки
+своих соседей. Скрытые выпадают из кандидатов сразу, а из чужих списков — при чтении (is_active)
+и окончательно при следующей пересборке.
+"""
+import bisect
+import datetime
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from functools import partial
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from scipy import sparse
+
+from . import response_cache
+from .models import Pet, SimilarPet
+
+DEFAULT_SIMILAR_PETS = {
+    'K': 12,
+    'MODEL_PATH': None,  # по умолчанию BASE_DIR / 'var' / 'similar_pets.npz'
+    # ячеек плотного блока X[i:j] @ X.T за раз (float32): ограничивает память пересборки
+    'BLOCK_CELLS': 8_000_000,
+}
+
+SOURCE_FIELDS = ('id', 'name', 'breed', 'description', 'category_id', 'price', 'age')
+# кличка говорит о сходстве меньше породы
+FIELD_WEIGHTS = {'name': 0.5, 'breed': 2.0, 'description': 1.0}
+BLOCK_WEIGHTS = {'text': 1.0, 'category': 0.8, 'price': 0.4, 'age': 0.3}
+
+WORD_RE = re.compile(r'[^\W\d_]{2,}')
+# вместо морфологии — общий префикс: «британская», «британский», «британец» -> «британ»
+STEM_LENGTH = 6
+MIN_DF = 2
+MAX_DF = 0.5  # слова из большей доли объявлений ничего не различают
+
+# цена — по степеням двойки, соседний диапазон засчитывается наполовину
+PRICE_BUCKETS = 28
+AGE_RE = re.compile(r'(\d+(?:[.,]\d+)?)?\s*(полгод|нед|мес|год|лет|г\b|л\b)', re.IGNORECASE)
+AGE_UNITS = {'полгод': 6, 'нед': 0.25, 'мес': 1, 'год': 12, 'лет': 12, 'г': 12, 'л': 12}
+AGE_LIMITS = [3, 12, 36, 84]  # месяцы: малыш, до года, 1–3 года, 3–7 лет, старше
+
+
+def get_config():
+    config = {**DEFAULT_SIMILAR_PETS, **getattr(settings, 'SIMILAR_PETS', {})}
+    config['MODEL_PATH'] = config['MODEL_PATH'] or settings.BASE_DIR / 'var' / 'similar_pets.npz'
+    return config
+
+
+def source_rows(queryset=None):
+    queryset = Pet.objects.filter(is_active=True) if queryset is None else queryset
+    return queryset.order_by('id').values(*SOURCE_FIELDS)
+
+
+def terms(row):
+    """{основа слова: вес} по текстовым полям"""
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for word in WORD_RE.findall((row[field] or '').lower().replace('ё', 'е')):
+            counts[word[:STEM_LENGTH]] += weight
+    return counts
+
+
+def age_bucket(text):
+    match = AGE_RE.search(text or '')
+    if match is None:
+        return -1
+    amount = float(match[1].replace(',', '.')) if match[1] else 1
+    return bisect.bisect_right(AGE_LIMITS, amount * AGE_UNITS[match[2].lower()])
+
+
+def price_bucket(price):
+    if price is None:
+        return -1
+    return min(int(math.log2(float(price) + 1)), PRICE_BUCKETS - 1)
+
+
+def one_hot(columns, width, weight=1.0):
+    """Разреженная матрица len(columns)×width с weight в columns[i]; -1 и выход за width — пусто"""
+    columns = np.asarray(columns, dtype=np.int64)
+    rows = np.flatnonzero((columns >= 0) & (columns < width))
+    return sparse.csr_matrix(
+        (np.full(len(rows), weight, dtype=np.float32), (rows, columns[rows])), shape=(len(columns), width)
+    )
+
+
+def normalize(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1), dtype=np.float32).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix, dtype=np.float32)
+
+
+class Model:
+    """Словарь, idf и нормированные признаки активных объявлений (строка i — объявление ids[i])"""
+
+    def __init__(self, ids, matrix, vocabulary, idf, categories, built_at):
+        self.ids = ids
+        self.matrix = matrix
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.categories = categories
+        self.built_at = built_at
+
+    @classmethod
+    def fit(cls, rows, built_at):
+        counts = [terms(row) for row in rows]
+        df = Counter(term for row_terms in counts for term in row_terms)
+        limit = MAX_DF * len(rows)
+        kept = sorted(term for term, seen in df.items() if MIN_DF <= seen <= limit)
+        idf = np.log((1 + len(rows)) / (1 + np.array([df[term] for term in kept], dtype=np.float32))) + 1
+        categories = np.array(sorted({row['category_id'] for row in rows if row['category_id']}), dtype=np.int64)
+        model = cls(
+            np.array([row['id'] for row in rows], dtype=np.int64), None,
+            {term: column for column, term in enumerate(kept)}, idf.astype(np.float32), categories, built_at,
+        )
+        model.matrix = model.features(rows, counts)
+        return model
+
+    def features(self, rows, counts=None):
+        counts = counts if counts is not None else [terms(row) for row in rows]
+        indptr, indices, data = [0], [], []
+        for row_terms in counts:
+            for term, count in row_terms.items():
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    indices.append(column)
+                    data.append((1 + math.log(count)) * self.idf[column])
+            indptr.append(len(indices))
+        text = sparse.csr_matrix(
+            (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(rows), len(self.vocabulary)),
+        )
+
+        # категории вне модели (появились после пересборки) — без признака
+        category_ids = np.array([row['category_id'] or 0 for row in rows], dtype=np.int64)
+        position = np.searchsorted(self.categories, category_ids)
+        known = np.isin(category_ids, self.categories)
+        category = one_hot(np.where(known, position, -1), len(self.categories))
+
+        prices = np.array([price_bucket(row['price']) for row in rows], dtype=np.int64)
+        price = one_hot(prices, PRICE_BUCKETS)
+        for shift in (-1, 1):
+            price += one_hot(np.where(prices >= 0, prices + shift, -1), PRICE_BUCKETS, 0.5)
+
+        age = one_hot([age_bucket(row['age']) for row in rows], len(AGE_LIMITS) + 1)
+        blocks = {'text': text, 'category': category, 'price': price, 'age': age}
+        return normalize(sparse.hstack(
+            [normalize(blocks[name]) * weight for name, weight in BLOCK_WEIGHTS.items()], format='csr',
+        ))
+
+    def neighbors(self, queries, query_ids, k, block_cells):
+        """
+        (индексы, близость) top-k строк matrix для каждой строки queries, по убыванию близости;
+        само объявление (query_ids) исключается. Плотный блок — не больше block_cells ячеек.
+        """
+        total = self.matrix.shape[0]
+        k = min(k, total - 1)
+        if k <= 0 or not queries.shape[0]:
+            return np.empty((queries.shape[0], 0), dtype=np.int64), np.empty((queries.shape[0], 0), dtype=np.float32)
+        # сам себе — по позиции в ids (отсортированы при fit и после update)
+        own = np.searchsorted(self.ids, query_ids)
+        own[(own >= total) | (self.ids[np.minimum(own, total - 1)] != query_ids)] = -1
+        # разреженная × плотная (блок запросов) в разы быстрее разреженной × разреженной:
+        # общая категория или цена дают ненулевую близость большой доле пар, результат почти плотный
+        step = max(1, block_cells // max(total, self.matrix.shape[1]))
+        found, similarity = [], []
+        for start in range(0, queries.shape[0], step):
+            scores = np.ascontiguousarray((self.matrix @ queries[start:start + step].T.toarray()).T)
+            block_own = own[start:start + step]
+            rows = np.flatnonzero(block_own >= 0)
+            scores[rows, block_own[rows]] = -np.inf
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            found.append(np.take_along_axis(top, order, axis=1))
+            similarity.append(np.take_along_axis(top_scores, order, axis=1))
+        return np.vstack(found), np.vstack(similarity)
+
+    def replace(self, rows, drop_ids):
+        """Строки rows — новые признаки этих объявлений; drop_ids и прежние версии rows — из модели вон"""
+        new_ids = np.array([row['id'] for row in rows], dtype=np.int64)
+        keep = ~np.isin(self.ids, np.concatenate([new_ids, np.asarray(drop_ids, dtype=np.int64)]))
+        ids = np.concatenate([self.ids[keep], new_ids])
+        matrix = sparse.vstack([self.matrix[keep], self.features(rows)], format='csr')
+        order = np.argsort(ids, kind='stable')
+        self.ids, self.matrix = ids[order], matrix[order]
+
+    def save(self, path):
+        # во временный файл и переименованием: читатель не увидит недописанную модель
+        path = str(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.tmp', 'wb') as file:
+            np.savez(
+                file, ids=self.ids, data=self.matrix.data, indices=self.matrix.indices,
+                indptr=self.matrix.indptr, shape=np.array(self.matrix.shape),
+                terms=np.array(sorted(self.vocabulary, key=self.vocabulary.get), dtype=str),
+                idf=self.idf, categories=self.categories, built_at=np.array(self.built_at.timestamp()),
+            )
+        os.replace(f'{path}.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        """Модель из файла; None — её ещё нет"""
+        try:
+            stored = np.load(path, allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        with stored:
+            matrix = sparse.csr_matrix(
+                (stored['data'], stored['indices'], stored['indptr']), shape=tuple(stored['shape'])
+            )
+            return cls(
+                stored['ids'], matrix, {term: column for column, term in enumerate(stored['terms'].tolist())},
+                stored['idf'], stored['categories'],
+                datetime.datetime.fromtimestamp(float(stored['built_at']), tz=datetime.timezone.utc),
+            )
+
+
+def links(pet_ids, found, similarity, model):
+    """Строки SimilarPet: по рангу, без соседей с нулевой близостью"""
+    for pet_id, columns, scores in zip(pet_ids, found, similarity):
+        for rank, (column, score) in enumerate(zip(columns, scores)):
+            if score <= 0:
+                break
+            yield SimilarPet(pet_id=int(pet_id), neighbor_id=int(model.ids[column]), rank=rank, score=float(score))
+
+
+def write_links(objects, batch_size=5000):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            SimilarPet.objects.bulk_create(batch)
+            batch = []
+    SimilarPet.objects.bulk_create(batch)
+
+
+def rebuild():
+    """Полная пересборка модели и таблицы SimilarPet; возвращает число объявлений"""
+    config = get_config()
+    # момент до чтения: правки во время сборки подхватит следующий update()
+    built_at = timezone.now()
+    rows = list(source_rows())
+    model = Model.fit(rows, built_at)
+    found, similarity = model.neighbors(model.matrix, model.ids, config['K'], config['BLOCK_CELLS'])
+    with transaction.atomic():
+        SimilarPet.objects.all().delete()
+        write_links(links(model.ids, found, similarity, model))
+        transaction.on_commit(partial(response_cache.bump, 'similar'))
+    model.save(config['MODEL_PATH'])
+    return len(rows)
+
+
+def update():
+    """
+    Досчитать изменённые после сборки модели объявления; без модели — полная пересборка.
+    Возвращает число пересчитанных объявлений.
+    """
+    config = get_config()
+    model = Model.load(config['MODEL_PATH'])
+    if model is None:
+        return rebuild()
+    built_at = timezone.now()
+    active = np.array(Pet.objects.filter(is_active=True).values_list('id', flat=True), dtype=np.int64)
+    edited = Pet.objects.filter(is_active=True, updated_at__gt=model.built_at).values_list('id', flat=True)
+    changed = set(edited) | set(np.setdiff1d(active, model.ids).tolist())
+    hidden = np.setdiff1d(model.ids, active)
+    rows = list(source_rows().filter(id__in=changed)) if changed else []
+    model.replace(rows, hidden)
+    model.built_at = built_at
+    if not rows:
+        model.save(config['MODEL_PATH'])
+        return 0
+
+    changed_ids = np.array([row['id'] for row in rows], dtype=np.int64)
+    positions = np.searchsorted(model.ids, changed_ids)
+    found, similarity = model.neighbors(model.matrix[positions], changed_ids, config['K'], config['BLOCK_CELLS'])
+    own_links = list(links(changed_ids, found, similarity, model))
+
+    # изменённое объявление встаёт в списки своих соседей, если близко им не меньше прежних
+    offers = defaultdict(dict)
+    for link in own_links:
+        if link.neighbor_id not in changed:
+            offers[link.neighbor_id][link.pet_id] = link.score
+    lists = defaultdict(dict)
+    for pet_id, neighbor_id, score in SimilarPet.objects.filter(pet_id__in=offers).values_list(
+        'pet_id', 'neighbor_id', 'score'
+    ):
+        lists[pet_id][neighbor_id] = score
+    merged_links = []
+    for pet_id, offered in offers.items():
+        current = lists[pet_id]
+        merged = sorted({**current, **offered}.items(), key=lambda item: (-item[1], item[0]))[:config['K']]
+        if dict(merged) != current:
+            merged_links += [
+                SimilarPet(pet_id=pet_id, neighbor_id=neighbor_id, rank=rank, score=score)
+                for rank, (neighbor_id, score) in enumerate(merged)
+            ]
+
+    with transaction.atomic():
+        rewritten = {*changed_ids.tolist(), *(link.pet_id for link in merged_links)}
+        SimilarPet.objects.filter(pet_id__in=rewritten).delete()
+        write_links([*own_links, *merged_links])
+        transaction.on_commit(partial(response_cache.bump, 'similar'))
+    model.save(config['MODEL_PATH'])
+    return len(rows)
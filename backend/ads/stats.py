@@ -0,0 +1,110 @@
+"""
+Статистика профиля (/api/profile/stats/) из таблицы UserStats: эндпоинт только читает строку.
+Пересчёт пачкой пользователей — по одному GROUP BY на таблицу — делает фоновый
+rebuild_user_stats --stale: строки, помеченные dirty после коммита изменений, и строки старше
+USER_STATS_MAX_AGE (просмотры и непрочитанные меняются без сигналов). При чтении считается
+только отсутствующая строка.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from chat.models import Chat, ChatReadState
+from forum.models import ForumComment, ForumTopic
+from .models import Pet, UserStats
+
+STAT_FIELDS = [
+    'total_pets', 'active_pets', 'hidden_pets', 'total_views', 'avg_price',
+    'chats_count', 'unread_messages', 'forum_topics', 'forum_comments',
+]
+
+
+def compute_stats(user_ids):
+    """{user_id: UserStats} для пачки пользователей — по одному агрегирующему запросу на таблицу"""
+    now = timezone.now()
+    stats = {user_id: UserStats(user_id=user_id, computed_at=now) for user_id in user_ids}
+
+    pets = (
+        Pet.objects.filter(user_id__in=user_ids)
+        .values('user_id')
+        .annotate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            views=Sum('views_count'),
+            avg_price=Avg('price'),
+        )
+        .order_by()
+    )
+    for row in pets:
+        item = stats[row['user_id']]
+        item.total_pets = row['total']
+        item.active_pets = row['active']
+        item.hidden_pets = row['total'] - row['active']
+        item.total_views = row['views'] or 0
+        item.avg_price = Decimal(row['avg_price'] or 0).quantize(Decimal('0.01'))
+
+    counts = [
+        ('chats_count', Chat.users.through.objects, Count('id')),
+        ('unread_messages', ChatReadState.objects, Sum('unread_count')),
+        ('forum_topics', ForumTopic.objects, Count('id')),
+        ('forum_comments', ForumComment.objects, Count('id')),
+    ]
+    for field, manager, aggregate in counts:
+        user_field = 'author_id' if manager.model in (ForumTopic, ForumComment) else 'user_id'
+        rows = (
+            manager.filter(**{f'{user_field}__in': user_ids})
+            .values(user_field)
+            .annotate(total=aggregate)
+            .order_by()
+            .values_list(user_field, 'total')
+        )
+        for user_id, total in rows:
+            setattr(stats[user_id], field, total or 0)
+    return stats
+
+
+def save_stats(stats):
+    # dirty не перезаписываем: пометка, поставленная во время пересчёта, доживёт до следующего прохода
+    UserStats.objects.bulk_create(
+        list(stats.values()),
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=[*STAT_FIELDS, 'computed_at'],
+    )
+
+
+def refresh_stats(user_ids):
+    """Пересчёт пачки: пометки снимаются до агрегатов, поэтому изменения во время пересчёта не теряются"""
+    UserStats.objects.filter(user_id__in=user_ids, dirty=True).update(dirty=False)
+    save_stats(compute_stats(user_ids))
+
+
+def stale_user_ids(limit, before):
+    """
+    Пользователи с помеченной или устаревшей строкой, посчитанной раньше before (начала прохода:
+    пересчитанные в этом проходе не берутся повторно) — сначала давно посчитанные
+    """
+    max_age = timedelta(seconds=getattr(settings, 'USER_STATS_MAX_AGE', 60))
+    return list(
+        UserStats.objects.filter(Q(dirty=True) | Q(computed_at__lt=timezone.now() - max_age), computed_at__lt=before)
+        .order_by('computed_at')
+        .values_list('user_id', flat=True)[:limit]
+    )
+
+
+def get_stats(user):
+    """Строка статистики; считается на лету только для пользователя, у которого её ещё нет"""
+    row = UserStats.objects.filter(user=user).first()
+    if row is None:
+        stats = compute_stats([user.pk])
+        save_stats(stats)
+        row = stats[user.pk]
+    return row
+
+
+def mark_dirty(user_ids):
+    """Пометка для фонового пересчёта — один UPDATE, без агрегатов на пути записи. Вызывать после коммита"""
+    UserStats.objects.filter(user_id__in=user_ids, dirty=False).update(dirty=True)
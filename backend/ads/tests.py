@@ -0,0 +1,220 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import skipIf, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APITestCase
+
+try:
+    import fakeredis
+except ImportError:  # необязательная зависимость тестов Redis-буфера
+    fakeredis = None
+
+from . import catalog, counters, query_plans, response_cache, stats
+from .models import Category, Pet, SimilarPet, UserStats
+
+User = get_user_model()
+
+
+class CategoryCatalogQueryCountTests(APITestCase):
+    """pet_count категорий — один агрегат на весь список, а не COUNT на строку"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='seller', password='secret-pass')
+        cls.categories = [Category.objects.create(name=name) for name in ('Собаки', 'Кошки', 'Птицы')]
+        cls.add_pets(12)
+
+    @classmethod
+    def add_pets(cls, count):
+        Pet.objects.bulk_create([
+            Pet(user=cls.user, category=cls.categories[number % len(cls.categories)], name=f'Питомец {number}')
+            for number in range(count)
+        ])
+
+    def setUp(self):
+        response_cache.get_cache().clear()
+        catalog.invalidate()
+
+    def test_category_list_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(item['pet_count'] for item in response.json()), 12)
+
+        self.add_pets(12)
+        catalog.invalidate()
+        response_cache.bump('pets')
+        with self.assertNumQueries(1):
+            self.client.get('/api/categories/')
+
+    def test_pet_list_does_not_count_per_category(self):
+        catalog.get_categories()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/pets/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(row['category']['pet_count'] for row in response.json()['results']))
+
+        # 24 объявления: страница та же, запросов столько же
+        self.add_pets(12)
+        response_cache.bump('pets')
+        with self.assertNumQueries(1):
+            self.client.get('/api/pets/')
+
+    def test_toggle_active_invalidates_catalog(self):
+        pet = Pet.objects.filter(category=self.categories[0]).first()
+        before = catalog.get_category(self.categories[0].pk)['pet_count']
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/pets/{pet.pk}/toggle_active/')
+        self.assertEqual(catalog.get_category(self.categories[0].pk)['pet_count'], before - 1)
+
+
+class ViewDedupTests(APITestCase):
+    def test_seen_marks_are_bounded(self):
+        backend = counters.LocalViewCounterBackend(max_seen=3)
+        for viewer in range(10):
+            self.assertFalse(backend.seen(1, f'ip{viewer}', 60))
+        self.assertEqual(len(backend._seen), 3)
+        self.assertTrue(backend.seen(1, 'ip9', 60))
+
+    def test_viewer_key_ignores_client_forwarded_for(self):
+        user = User.objects.create_user(username='seller', password='secret-pass')
+        pet = Pet.objects.create(user=user, name='Барсик')
+        counters.get_backend().drain()
+        for spoofed in ('1.1.1.1', '2.2.2.2'):
+            self.client.post(
+                f'/api/pets/{pet.pk}/increment_views/',
+                HTTP_X_FORWARDED_FOR=f'{spoofed}, 10.0.0.5',
+            )
+        self.assertEqual(counters.get_backend().pending(pet.pk), 1)
+
+
+@skipIf(fakeredis is None, 'нужен fakeredis (с lupa для Lua)')
+class RedisViewCounterTests(APITestCase):
+    def setUp(self):
+        self.backend = counters.RedisViewCounterBackend(client=fakeredis.FakeRedis())
+        user = User.objects.create_user(username='seller', password='secret-pass')
+        self.pet = Pet.objects.create(user=user, name='Барсик')
+
+    def test_concurrent_drain_gets_empty_batch(self):
+        self.backend.incr(self.pet.pk, 3)
+        batch, deltas = self.backend.drain()
+        self.assertEqual(deltas, {self.pet.pk: 3})
+        self.assertEqual(self.backend.drain(), (None, {}))
+        self.backend.ack(batch)
+
+    def test_batch_of_crashed_flush_is_recovered(self):
+        self.backend.incr(self.pet.pk, 2)
+        self.backend.drain()  # упали до UPDATE: партия осталась в Redis
+        self.backend.incr(self.pet.pk, 1)
+        self.backend.orphan_after = 0
+        self.assertEqual(self.backend.drain()[1], {self.pet.pk: 3})
+
+    def test_batch_is_deleted_after_commit(self):
+        self.backend.incr(self.pet.pk, 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            counters.flush_views(self.backend)
+        self.pet.refresh_from_db()
+        self.assertEqual(self.pet.views_count, 4)
+        self.assertEqual(list(self.backend.client.scan_iter(match='ads:views:*')), [])
+
+
+class SimilarPetsTests(APITestCase):
+    def test_similar_is_one_query(self):
+        user = User.objects.create_user(username='seller', password='secret-pass')
+        pet, *neighbors = Pet.objects.bulk_create([Pet(user=user, name=f'Питомец {n}') for n in range(4)])
+        SimilarPet.objects.bulk_create([
+            SimilarPet(pet=pet, neighbor=neighbor, rank=rank, score=1 - rank / 10)
+            for rank, neighbor in enumerate(neighbors)
+        ])
+        catalog.get_categories()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/pets/{pet.pk}/similar/')
+        self.assertEqual([row['id'] for row in response.json()], [neighbor.pk for neighbor in neighbors])
+
+    def test_non_numeric_id_is_404(self):
+        for url in ('/api/pets/abc/', '/api/pets/abc/similar/', '/api/pets/abc/increment_views/'):
+            method = self.client.post if url.endswith('increment_views/') else self.client.get
+            self.assertEqual(method(url).status_code, 404, url)
+
+
+class UserStatsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+        self.client.force_authenticate(self.user)
+
+    def test_missing_row_is_computed_once(self):
+        Pet.objects.create(user=self.user, name='Барсик')
+        self.assertEqual(self.client.get('/api/profile/stats/').json()['total_pets'], 1)
+        self.assertTrue(UserStats.objects.filter(user=self.user).exists())
+
+    def test_dirty_row_is_read_without_aggregates(self):
+        stats.refresh_stats([self.user.pk])
+        UserStats.objects.filter(user=self.user).update(dirty=True)
+        with self.assertNumQueries(1):
+            self.client.get('/api/profile/stats/')
+
+    def test_dirty_mark_waits_for_commit(self):
+        stats.refresh_stats([self.user.pk])
+        with self.captureOnCommitCallbacks() as callbacks:
+            Pet.objects.create(user=self.user, name='Барсик')
+        self.assertFalse(UserStats.objects.get(user=self.user).dirty)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(UserStats.objects.get(user=self.user).dirty)
+
+    def test_stale_pass_refreshes_marked_rows(self):
+        stats.refresh_stats([self.user.pk])
+        Pet.objects.create(user=self.user, name='Барсик')
+        stats.mark_dirty([self.user.pk])
+        call_command('rebuild_user_stats', '--stale', stdout=StringIO())
+        row = UserStats.objects.get(user=self.user)
+        self.assertEqual((row.total_pets, row.dirty), (1, False))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'планы запросов проверяются только на PostgreSQL')
+class QueryPlanTests(TestCase):
+    """Ни одна комбинация фильтров и сортировок ленты не читает ads_pet целиком (Seq Scan)"""
+    # на маленькой таблице Seq Scan дешевле любого индекса — нужен объём
+    seed_size = 20_000
+
+    @classmethod
+    def setUpTestData(cls):
+        query_plans.seed_pets(cls.seed_size)
+
+    def test_feed_plans_use_indexes(self):
+        for label, plan, seq_scan in query_plans.check_feed_plans():
+            with self.subTest(label.strip()):
+                self.assertFalse(seq_scan, query_plans.pet_seq_scans(plan))
+
+
+class ImportCategoriesTests(APITestCase):
+    def test_init_categories_is_idempotent(self):
+        for _ in range(2):
+            call_command('init_categories', stdout=StringIO())
+        self.assertEqual(Category.objects.count(), 7)
+        self.assertTrue(Category.objects.filter(slug='собаки').exists())
+
+    def test_unknown_category_skips_record(self):
+        User.objects.create_user(username='seller', password='secret-pass')
+        Category.objects.create(name='Кошки')
+        records = [
+            {'external_id': 'a', 'user': 'seller', 'category': 'кошки', 'name': 'Мурка'},
+            {'external_id': 'b', 'user': 'seller', 'category': 'драконы', 'name': 'Смауг'},
+            {'external_id': 'c', 'user': 'seller', 'name': 'Без категории'},
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', encoding='utf-8', delete=False) as file:
+            file.write('\n'.join(json.dumps(record, ensure_ascii=False) for record in records))
+        self.addCleanup(os.remove, file.name)
+        stderr = StringIO()
+        call_command('import_pets', file.name, stdout=StringIO(), stderr=stderr)
+        self.assertEqual(
+            dict(Pet.objects.values_list('external_id', 'category__slug')), {'a': 'кошки', 'c': None}
+        )
+        self.assertIn('драконы', stderr.getvalue())
@@ -1,8 +1,16 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import PetViewSet, CategoryViewSet
+from .views import PetViewSet, CategoryViewSet, NotificationViewSet
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'pets', PetViewSet, basename='pets')
 router.register(r'categories', CategoryViewSet, basename='categories')
+router.register(r'notifications', NotificationViewSet, basename='notifications')
 
-urlpatterns = router.urls
+# горячие GET — async-вьюхи (ads.async_views); остальные методы они передают вьюсетам
+urlpatterns = [
+    path('pets/', async_views.pet_list, name='pets-list'),
+    path('pets/<int:pk>/', async_views.pet_detail, name='pets-detail'),
+    path('categories/', async_views.category_list, name='categories-list'),
+] + router.urls
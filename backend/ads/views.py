@@ -1,34 +1,55 @@
-from rest_framework import viewsets, permissions, filters, status
+from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.throttling import BaseThrottle
 
-from .models import Pet, Category
-from .serializers import PetSerializer, CategorySerializer
-from .filters import PetFilter
-from .pagination import StandardResultsSetPagination
+from .models import Pet, Notification
+from .serializers import (
+    PetSerializer, PetReadSerializer, CategorySerializer, NotificationSerializer, UserStatsSerializer,
+)
+from .renderers import ORJSONRenderer
+from .filters import PetFilter, PetOrderingFilter
+from .search import FullTextSearchFilter
+from .pagination import KeysetPagination, PetPagination
+from .response_cache import ResponseCacheMixin
+from . import catalog, counters, notifications, stats
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(ResponseCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Категории животных (как на Авито — просто список)"""
-    queryset = Category.objects.all().order_by('name')
+    queryset = catalog.annotated_categories()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    # pet_count зависит от объявлений
+    cache_scopes = ['categories', 'pets']
 
+    def list(self, request, *args, **kwargs):
+        cached = self.cached_response(request)
+        if cached is not None:
+            return cached
+        # список целиком отдаём из каталога (он уже посчитан одним агрегатом)
+        return Response(list(catalog.get_categories().values()))
 
-class PetViewSet(viewsets.ModelViewSet):
+
+class PetViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     """CRUD для объявлений животных (аналог Авито)"""
     queryset = Pet.objects.all().select_related('category', 'user')
     serializer_class = PetSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
 
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, PetOrderingFilter]
     filterset_class = PetFilter
     search_fields = ['name', 'breed', 'description']
     ordering_fields = ['created_at', 'price', 'views_count']
-    pagination_class = StandardResultsSetPagination
+    pagination_class = PetPagination
+    cached_actions = ('list', 'retrieve', 'similar')
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -37,26 +58,84 @@ class PetViewSet(viewsets.ModelViewSet):
             return qs.filter(is_active=True)
         return qs
 
+    def get_cache_scopes(self):
+        if self.action == 'retrieve':
+            return [f"pet:{self.kwargs['pk']}", 'categories']
+        if self.action == 'similar':
+            # соседи — другие объявления; списки меняет пересборка (ads.similar)
+            return ['pets', 'categories', 'similar']
+        return ['pets', 'categories']
+
+    def list(self, request, *args, **kwargs):
+        cached = self.cached_response(request)
+        if cached is not None:
+            return cached
+        return self.read_response(self.filter_queryset(self.get_queryset()))
+
+    def retrieve(self, request, *args, **kwargs):
+        cached = self.cached_response(request)
+        if cached is not None:
+            return cached
+        row = PetReadSerializer.values(self.filter_queryset(self.get_queryset())).filter(pk=self.get_pet_id()).first()
+        if row is None:
+            raise NotFound()
+        return Response(PetReadSerializer(row, context=self.get_serializer_context()).data)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Похожие объявления: готовый список соседей (SimilarPet), один запрос по индексу"""
+        cached = self.cached_response(request)
+        if cached is not None:
+            return cached
+        pet_id = self.get_pet_id()
+        queryset = Pet.objects.filter(similar_to__pet_id=pet_id, is_active=True)
+        rows = list(PetReadSerializer.values(queryset.order_by('similar_to__rank')))
+        # пустой список — ещё не посчитан или объявления нет; второй запрос только в этом случае
+        if not rows and not self.get_queryset().filter(pk=pet_id).exists():
+            raise NotFound()
+        return Response(PetReadSerializer(rows, many=True, context=self.get_serializer_context()).data)
+
+    def get_pet_id(self):
+        """pk из URL числом: нечисловой — 404, как в get_object(), а не ValueError в filter()"""
+        try:
+            return int(self.kwargs['pk'])
+        except ValueError:
+            raise NotFound()
+
+    def read_response(self, queryset):
+        """Чтение через PetReadSerializer (строки .values()); запись остаётся на PetSerializer"""
+        queryset = PetReadSerializer.values(queryset)
+        context = self.get_serializer_context()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(PetReadSerializer(page, many=True, context=context).data)
+        return Response(PetReadSerializer(queryset, many=True, context=context).data)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.AllowAny])
     def increment_views(self, request, pk=None):
-        """Инкремент просмотров"""
-        pet = self.get_object()
-        pet.increment_views()
-        return Response({'id': pet.id, 'views_count': pet.views_count})
+        """Инкремент просмотров (через буфер, без UPDATE строки)"""
+        row = self.get_queryset().filter(pk=self.get_pet_id()).values_list('id', 'views_count').first()
+        if row is None:
+            raise NotFound()
+        pet_id, views_count = row
+        views_count = counters.record_view(pet_id, views_count, self.get_viewer_key(request))
+        return Response({'id': pet_id, 'views_count': views_count})
+
+    def get_viewer_key(self, request):
+        """Ключ клиента для отсечения повторных просмотров"""
+        if request.user.is_authenticated:
+            return f'u{request.user.id}'
+        # адрес, который добавил наш прокси (NUM_PROXIES), а не присланный клиентом X-Forwarded-For
+        ip = BaseThrottle().get_ident(request)
+        return f'ip{ip}' if ip else None
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def my_pets(self, request):
         """Мои объявления"""
-        qs = self.get_queryset().filter(user=request.user)
-        page = self.paginate_queryset(qs)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(qs, many=True)
-        return Response(serializer.data)
+        return self.read_response(self.get_queryset().filter(user=request.user))
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def toggle_active(self, request, pk=None):
@@ -71,3 +150,34 @@ class PetViewSet(viewsets.ModelViewSet):
             'is_active': pet.is_active,
             'message': 'Объявление активировано' if pet.is_active else 'Объявление скрыто'
         })
+
+
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """Уведомления текущего пользователя; число непрочитанных — из счётчика, без COUNT(*)"""
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return Notification.objects.filter(user=self.request.user)
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread': notifications.unread_count(request.user)})
+
+    @action(detail=False, methods=['post'])
+    def read(self, request):
+        """Прочитано всё или до up_to (id уведомления) включительно"""
+        up_to = request.data.get('up_to')
+        if up_to is not None and not str(up_to).isdigit():
+            return Response({'detail': 'up_to должен быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+        updated = notifications.mark_read(request.user, None if up_to is None else int(up_to))
+        return Response({'updated': updated, 'unread': notifications.unread_count(request.user)})
+
+
+class ProfileStatsView(APIView):
+    """Статистика профиля из UserStats: одна строка, на лету считается только отсутствующая"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(UserStatsSerializer(stats.get_stats(request.user)).data)
@@ -0,0 +1,31 @@
+"""
+Async-чтение диалогов под ASGI (см. ads.async_views): список диалогов и история.
+Отправка и отметка прочитанного остаются на ChatViewSet.
+"""
+from rest_framework.exceptions import NotFound
+
+from ads.async_views import async_read, json_response, viewset_for
+from .serializers import ChatSerializer, MessageSerializer
+from .services import amessage_page
+from .views import ChatViewSet
+
+
+@async_read(ChatViewSet.as_view({"get": "list", "post": "create"}, basename="chat"))
+async def chat_list(request):
+    view = viewset_for(ChatViewSet, request, "list", "chat")
+    # prefetch_related("users") выполняется вместе с выборкой
+    chats = [chat async for chat in view.get_queryset()]
+    return json_response(ChatSerializer(chats, many=True, context=view.get_serializer_context()).data)
+
+
+@async_read(ChatViewSet.as_view({"get": "messages"}, basename="chat"))
+async def chat_messages(request, pk):
+    view = viewset_for(ChatViewSet, request, "messages", "chat", pk=pk)
+    # get_queryset — только диалоги пользователя, как get_object() во вьюсете
+    if not await view.get_queryset().filter(pk=pk).aexists():
+        raise NotFound()
+    messages, has_more = await amessage_page(pk, **view.history_params())
+    return json_response({
+        "results": MessageSerializer(messages, many=True).data,
+        "has_more": has_more,
+    })
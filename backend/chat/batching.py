@@ -0,0 +1,74 @@
+import asyncio
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .realtime import broadcast
+from .serializers import message_payload
+from .services import create_messages_bulk
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBatcher:
+    """
+    Микробатчинг входящих сообщений: всё, что пришло за window_ms, пишется одним
+    bulk_create и рассылается участникам в порядке поступления.
+    """
+
+    def __init__(self, window_ms, max_batch=200):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.loop = asyncio.get_running_loop()
+        self._pending = []
+        self._timer = None
+        self._flush_lock = asyncio.Lock()  # пакеты пишутся строго по очереди
+
+    def submit(self, chat_id, sender, text, sender_data, member_ids):
+        """Ставит сообщение в очередь; future завершится сохранённым Message"""
+        future = self.loop.create_future()
+        self._pending.append((chat_id, sender, text, sender_data, member_ids, future))
+        if len(self._pending) >= self.max_batch:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = self.loop.call_later(self.window, self._schedule_flush)
+        return future
+
+    def _schedule_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self.loop.create_task(self._flush(batch))
+
+    async def _flush(self, batch):
+        async with self._flush_lock:
+            try:
+                messages = await database_sync_to_async(create_messages_bulk)(
+                    [(chat_id, sender, text) for chat_id, sender, text, *_ in batch]
+                )
+            except Exception as exc:
+                logger.exception("Не удалось записать пакет из %s сообщений", len(batch))
+                for *_, future in batch:
+                    future.set_exception(exc)
+                return
+
+            for (chat_id, _, _, sender_data, member_ids, future), message in zip(batch, messages):
+                await broadcast(member_ids, chat_id, "message", message=message_payload(message, sender_data))
+                future.set_result(message)
+
+
+_batcher = None
+
+
+def get_batcher():
+    """Общий батчер процесса или None, если CHAT_BATCH_WINDOW_MS не задан"""
+    global _batcher
+    window_ms = getattr(settings, "CHAT_BATCH_WINDOW_MS", 0)
+    if not window_ms:
+        return None
+    if _batcher is None or _batcher.loop is not asyncio.get_running_loop():
+        _batcher = MessageBatcher(window_ms)
+    return _batcher
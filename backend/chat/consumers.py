@@ -1,77 +1,263 @@
+import asyncio
 import json
+import time
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
-from .models import Chat, Message
-from .serializers import MessageSerializer
-from rest_framework_simplejwt.tokens import AccessToken
+from pet_project.db_routing import apin_primary, get_config
+from .models import Chat
+from .batching import get_batcher
+from .realtime import broadcast, user_group
+from .serializers import MessageSerializer, SimpleUserSerializer, message_payload
+from .services import create_message, mark_read, message_page
 
 User = get_user_model()
 
+RESUME_MAX_MESSAGES = 200
 
-class ChatConsumer(AsyncWebsocketConsumer):
-    """Реальное общение в чате (аналог диалогов Авито)"""
+
+def get_query_param(scope, name):
+    values = parse_qs(scope["query_string"].decode()).get(name)
+    return values[0] if values else None
+
+
+def parse_frame(text_data):
+    """JSON-объект кадра клиента; None для битого JSON, бинарного кадра или не-объекта"""
+    try:
+        data = json.loads(text_data)
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def scope_user(scope):
+    """Пользователь соединения: JWTAuthMiddleware (?token=...) или сессия; None для анонима"""
+    user = scope.get("user")
+    return user if user is not None and user.is_authenticated else None
+
+
+class ChatEventsMixin:
+    """Общее для сокетов чата: отправка сообщений, досылка пропущенного, события группы пользователя"""
+
+    async def join_user_group(self):
+        self.sender_data = SimpleUserSerializer(self.user).data
+        self.group_name = user_group(self.user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def pin_after_write(self):
+        """
+        Сокет идёт мимо ReplicaRoutingMiddleware: после записи закрепляем отправителя за primary
+        (read-your-writes для его REST-запросов). Метку в общем кэше обновляем не чаще раза
+        в полпериода STICKY_SECONDS за соединение, а не на каждый кадр.
+        """
+        now = time.monotonic()
+        if now < getattr(self, "pinned_until", 0):
+            return
+        self.pinned_until = now + get_config()["STICKY_SECONDS"] / 2
+        await apin_primary(self.user.id)
+
+    async def post_message(self, chat_id, text, member_ids):
+        batcher = get_batcher()
+        if batcher is not None:
+            # запись и рассылку сделает батчер; сокет не ждёт БД
+            batcher.submit(chat_id, self.user, text, self.sender_data, member_ids).add_done_callback(
+                self.batch_write_done
+            )
+            return
+
+        message = await database_sync_to_async(create_message)(chat_id, self.user, text)
+        await self.pin_after_write()
+        await broadcast(member_ids, chat_id, "message", message=message_payload(message, self.sender_data))
+
+    async def post_read(self, chat_id, up_to, member_ids):
+        """Прочитано до up_to — участникам уходит компактная квитанция, а не сами сообщения"""
+        # bool — подкласс int: {"up_to": true} не должен превращаться в id 1
+        if up_to is not None and (not isinstance(up_to, int) or isinstance(up_to, bool)):
+            await self.send_json({"type": "error", "detail": "up_to должен быть числом"})
+            return
+        updated, up_to = await database_sync_to_async(mark_read)(chat_id, self.user, up_to)
+        if updated:
+            await self.pin_after_write()
+            await broadcast(member_ids, chat_id, "read", reader_id=self.user.id, up_to=up_to)
+
+    def batch_write_done(self, future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            asyncio.ensure_future(self.send_json({"type": "error", "detail": "Сообщение не отправлено"}))
+        else:
+            asyncio.ensure_future(self.pin_after_write())
+
+    async def replay_missed(self, chat_id, last_id):
+        """Досылает сообщения после last_id; подписка уже есть, дубли клиент отсекает по id"""
+        messages, has_more = await self.get_missed_messages(chat_id, last_id)
+        for message in messages:
+            await self.send_json({"type": "message", "chat_id": chat_id, "message": message})
+        if has_more:
+            # пропущено слишком много — клиент догружает остальное через REST (?after=)
+            await self.send_json({"type": "resync", "chat_id": chat_id, "after": messages[-1]["id"]})
+
+    async def notification_event(self, event):
+        """Уведомления (ads.notifications) приходят в группу пользователя; показывает их ws/stream/"""
+
+    async def send_json(self, content):
+        await self.send(text_data=json.dumps(content))
+
+    @database_sync_to_async
+    def get_missed_messages(self, chat_id, last_id):
+        messages, has_more = message_page(chat_id, after=last_id, limit=RESUME_MAX_MESSAGES)
+        return MessageSerializer(messages, many=True).data, has_more
+
+
+class ChatConsumer(ChatEventsMixin, AsyncWebsocketConsumer):
+    """Реальное общение в чате (аналог диалогов Авито): одно соединение на диалог"""
 
     async def connect(self):
-        self.chat_id = self.scope["url_route"]["kwargs"]["chat_id"]
-        self.user = await self.get_user_from_token()
+        self.chat_id = int(self.scope["url_route"]["kwargs"]["chat_id"])
+        self.user = scope_user(self.scope)
 
-        if not self.user or not await self.user_in_chat(self.chat_id):
+        # участники кэшируются на всё время соединения
+        if not self.user or not await self.load_members():
             await self.close()
             return
 
-        self.room_group_name = f"chat_{self.chat_id}"
-        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        await self.join_user_group()
         await self.accept()
 
-    async def disconnect(self, close_code):
-        if hasattr(self, "room_group_name"):
-            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        # ?resume=<id последнего полученного сообщения> — досылаем пропущенное
+        resume_id = get_query_param(self.scope, "resume")
+        if resume_id and resume_id.isdigit():
+            await self.replay_missed(self.chat_id, int(resume_id))
 
     async def receive(self, text_data):
-        """Принимаем сообщение и рассылаем всем в чате"""
-        data = json.loads(text_data)
-        text = data.get("text", "").strip()
+        """Принимаем сообщение (или отметку о прочтении) и рассылаем всем в чате"""
+        data = parse_frame(text_data)
+        if data is None:
+            await self.send_json({"type": "error", "detail": "Неизвестный кадр"})
+            return
+        if data.get("type") == "read":
+            await self.post_read(self.chat_id, data.get("up_to"), self.member_ids)
+            return
+        text = str(data.get("text", "")).strip()
         if not text:
             return
+        await self.post_message(self.chat_id, text, self.member_ids)
 
-        message = await self.create_message(text)
-        serialized = MessageSerializer(message).data
+    async def chat_event(self, event):
+        """События группы пользователя — пропускаем только свой диалог"""
+        if event["chat_id"] != self.chat_id:
+            return
+        payload = {key: value for key, value in event.items() if key not in ("type", "kind")}
+        await self.send_json({"type": event["kind"], **payload})
 
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {"type": "chat_message", "message": serialized},
+    @database_sync_to_async
+    def load_members(self):
+        """Проверяет участие в диалоге одним запросом"""
+        self.member_ids = set(
+            Chat.users.through.objects.filter(chat_id=self.chat_id).values_list("user_id", flat=True)
         )
+        return self.user.id in self.member_ids
 
-    async def chat_message(self, event):
-        """Отправка данных клиенту"""
-        await self.send(text_data=json.dumps({
-            "type": "message",
-            "message": event["message"]
-        }))
 
-    @database_sync_to_async
-    def get_user_from_token(self):
-        """Извлекаем пользователя из JWT токена"""
-        query = self.scope["query_string"].decode()
-        token_param = query.replace("token=", "")
-        if not token_param:
-            return None
-        try:
-            access_token = AccessToken(token_param)
-            return User.objects.get(id=access_token["user_id"])
-        except Exception:
-            return None
+class StreamConsumer(ChatEventsMixin, AsyncWebsocketConsumer):
+    """
+    Одно соединение на пользователя (ws/stream/): события всех его диалогов.
+    Кадры клиента:
+      {"type": "subscribe", "chat_id": 1, "after": 10} — открыть диалог (after — досылка пропущенного)
+      {"type": "unsubscribe", "chat_id": 1}
+      {"type": "message", "chat_id": 1, "text": "..."}
+      {"type": "read", "chat_id": 1, "up_to": 15} — прочитано до сообщения 15 (без up_to — всё)
+    По диалогам без подписки приходят только компактные обновления списка ("inbox").
+    """
 
-    @database_sync_to_async
-    def user_in_chat(self, chat_id):
+    async def connect(self):
+        self.user = scope_user(self.scope)
+        if not self.user:
+            await self.close()
+            return
+
+        self.chat_members = await self.load_chats()
+        self.subscriptions = set()
+        await self.join_user_group()
+        await self.accept()
+
+    async def receive(self, text_data):
+        data = parse_frame(text_data)
         try:
-            chat = Chat.objects.get(id=chat_id)
-            return chat.users.filter(id=self.user.id).exists()
-        except Chat.DoesNotExist:
-            return False
+            handler = self.frame_handlers[data["type"]]
+        except (KeyError, TypeError):
+            await self.send_json({"type": "error", "detail": "Неизвестный кадр"})
+            return
+        await handler(self, data)
+
+    async def on_subscribe(self, data):
+        chat_id = await self.resolve_chat(data.get("chat_id"))
+        if chat_id is None:
+            await self.send_json({"type": "error", "detail": "Нет доступа к диалогу"})
+            return
+        self.subscriptions.add(chat_id)
+        await self.send_json({"type": "subscribed", "chat_id": chat_id})
+        after = data.get("after")
+        if isinstance(after, int) and not isinstance(after, bool):
+            await self.replay_missed(chat_id, after)
+
+    async def on_unsubscribe(self, data):
+        self.subscriptions.discard(data.get("chat_id"))
+
+    async def on_message(self, data):
+        chat_id = await self.resolve_chat(data.get("chat_id"))
+        text = str(data.get("text", "")).strip()
+        if chat_id is None or not text:
+            await self.send_json({"type": "error", "detail": "Сообщение не отправлено"})
+            return
+        await self.post_message(chat_id, text, self.chat_members[chat_id])
+
+    async def on_read(self, data):
+        chat_id = await self.resolve_chat(data.get("chat_id"))
+        if chat_id is None:
+            await self.send_json({"type": "error", "detail": "Нет доступа к диалогу"})
+            return
+        await self.post_read(chat_id, data.get("up_to"), self.chat_members[chat_id])
+
+    frame_handlers = {
+        "subscribe": on_subscribe,
+        "unsubscribe": on_unsubscribe,
+        "message": on_message,
+        "read": on_read,
+    }
+
+    async def chat_event(self, event):
+        chat_id = event["chat_id"]
+        if event["kind"] == "message" and chat_id not in self.subscriptions:
+            await self.send_json({"type": "inbox", "chat_id": chat_id, "last_message": event["message"]})
+            return
+        payload = {key: value for key, value in event.items() if key not in ("type", "kind")}
+        await self.send_json({"type": event["kind"], **payload})
+
+    async def notification_event(self, event):
+        await self.send_json({"type": "notification", "notification": event["notification"]})
+
+    async def resolve_chat(self, chat_id):
+        """id диалога, если пользователь в нём состоит (новые диалоги подгружаются по требованию)"""
+        if not isinstance(chat_id, int) or isinstance(chat_id, bool):
+            return None
+        if chat_id not in self.chat_members:
+            self.chat_members = await self.load_chats()
+        return chat_id if chat_id in self.chat_members else None
 
     @database_sync_to_async
-    def create_message(self, text):
-        chat = Chat.objects.get(id=self.chat_id)
-        return Message.objects.create(chat=chat, sender=self.user, text=text)
+    def load_chats(self):
+        """{chat_id: {участники}} для всех диалогов пользователя — один запрос"""
+        through = Chat.users.through
+        rows = through.objects.filter(
+            chat_id__in=through.objects.filter(user_id=self.user.id).values("chat_id")
+        ).values_list("chat_id", "user_id")
+        chats = {}
+        for chat_id, user_id in rows:
+            chats.setdefault(chat_id, set()).add(user_id)
+        return chats
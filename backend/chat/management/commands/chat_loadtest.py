@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.models import Chat
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Нагрузочный прогон ChatConsumer в процессе (InMemoryChannelLayer + WebsocketCommunicator)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chats", type=int, default=20, help="Число диалогов (по 2 участника)")
+        parser.add_argument("--messages", type=int, default=50, help="Сообщений от каждого участника")
+        parser.add_argument("--batch-window", type=int, default=0, help="CHAT_BATCH_WINDOW_MS для прогона")
+        parser.add_argument("--keep", action="store_true", help="Не удалять созданные данные")
+
+    def handle(self, *args, **options):
+        users, chats = self.create_fixtures(options["chats"])
+        layers = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+        try:
+            with override_settings(CHANNEL_LAYERS=layers, CHAT_BATCH_WINDOW_MS=options["batch_window"]):
+                latencies, elapsed = asyncio.run(self.run_load(chats, options["messages"]))
+        finally:
+            if not options["keep"]:
+                User.objects.filter(pk__in=[u.pk for u in users]).delete()
+
+        total = len(latencies)
+        latencies.sort()
+        self.stdout.write(
+            f"Сообщений: {total} за {elapsed:.2f}с ({total / elapsed:.0f} msg/s), "
+            f"окно батча {options['batch_window']}мс\n"
+            f"Задержка доставки: p50={latencies[total // 2]:.1f}мс "
+            f"p95={latencies[int(total * 0.95) - 1]:.1f}мс max={latencies[-1]:.1f}мс"
+        )
+
+    def create_fixtures(self, count):
+        stamp = time.time_ns()
+        users = User.objects.bulk_create(
+            [User(username=f"loadtest_{stamp}_{i}") for i in range(count * 2)]
+        )
+        chats = []
+        for i in range(count):
+            chat = Chat.objects.create()
+            pair = users[i * 2:i * 2 + 2]
+            chat.users.add(*pair)
+            chats.append((chat.pk, [str(AccessToken.for_user(u)) for u in pair]))
+        return users, chats
+
+    async def run_load(self, chats, per_client):
+        # channels.testing тянет daphne, поэтому импортируем только здесь
+        from channels.testing import WebsocketCommunicator
+        from pet_project.asgi import application
+
+        pairs = []
+        for chat_id, tokens in chats:
+            pair = [WebsocketCommunicator(application, f"/ws/chat/{chat_id}/?token={t}") for t in tokens]
+            for communicator in pair:
+                connected, _ = await communicator.connect()
+                if not connected:
+                    raise RuntimeError(f"Не удалось подключиться к чату {chat_id}")
+            pairs.append(pair)
+
+        latencies = []
+
+        async def talk(sender):
+            for i in range(per_client):
+                await sender.send_json_to({"text": f"{time.perf_counter_ns()} #{i}"})
+
+        async def listen(receiver, expected):
+            for _ in range(expected):
+                event = await receiver.receive_json_from(timeout=30)
+                sent_at = int(event["message"]["text"].split()[0])
+                latencies.append((time.perf_counter_ns() - sent_at) / 1e6)
+
+        started = time.perf_counter()
+        tasks = []
+        for a, b in pairs:
+            # каждый участник получает и свои, и чужие сообщения диалога
+            tasks += [talk(a), talk(b), listen(a, per_client * 2), listen(b, per_client * 2)]
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+        for pair in pairs:
+            for communicator in pair:
+                await communicator.disconnect()
+        return latencies, elapsed
@@ -0,0 +1,44 @@
+from collections import defaultdict
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from chat.models import Chat, Message
+
+
+class Command(BaseCommand):
+    help = "Заполняет ключ пары (user_low, user_high) у диалогов и сливает дубли одной пары в самый старый"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Только показать, что будет сделано")
+
+    def handle(self, *args, **options):
+        members = defaultdict(set)
+        for chat_id, user_id in Chat.users.through.objects.values_list("chat_id", "user_id").iterator():
+            members[chat_id].add(user_id)
+
+        pairs = defaultdict(list)
+        for chat_id, user_ids in members.items():
+            if len(user_ids) == 2:
+                pairs[tuple(sorted(user_ids))].append(chat_id)
+
+        merged = 0
+        with transaction.atomic():
+            for (low, high), chat_ids in pairs.items():
+                keep, *duplicates = sorted(chat_ids)
+                if duplicates:
+                    merged += len(duplicates)
+                    self.stdout.write(f"Пара {low}/{high}: диалоги {duplicates} → {keep}")
+                    if not options["dry_run"]:
+                        Message.objects.filter(chat_id__in=duplicates).update(chat_id=keep)
+                        # дубль мог уже нести ключ пары — удаляем его до записи ключа в сохраняемый диалог
+                        Chat.objects.filter(pk__in=duplicates).delete()
+                if not options["dry_run"]:
+                    Chat.objects.filter(pk=keep).update(user_low_id=low, user_high_id=high)
+
+            if merged and not options["dry_run"]:
+                # last_message и счётчики непрочитанных у сохранённых диалогов теперь неверны
+                call_command("rebuild_chat_state", stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Пар: {len(pairs)}, слито дублей: {merged}"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from chat.models import Chat, ChatReadState, Message
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает last_message и счётчики непрочитанных для всех диалогов"
+
+    def handle(self, *args, **options):
+        last = Message.objects.filter(chat=OuterRef("pk")).order_by("-created_at", "-id")
+        with transaction.atomic():
+            updated = Chat.objects.update(last_message=Subquery(last.values("pk")[:1]))
+
+            through = Chat.users.through
+            ChatReadState.objects.bulk_create(
+                [
+                    ChatReadState(chat_id=chat_id, user_id=user_id)
+                    for chat_id, user_id in through.objects.values_list("chat_id", "user_id").iterator()
+                ],
+                batch_size=1000,
+                ignore_conflicts=True,
+            )
+
+            unread = (
+                Message.objects.filter(chat=OuterRef("chat"), is_read=False)
+                .exclude(sender=OuterRef("user"))
+                .order_by()
+                .values("chat")
+                .annotate(total=Count("pk"))
+                .values("total")
+            )
+            ChatReadState.objects.update(unread_count=Coalesce(Subquery(unread), 0))
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Обновлено диалогов: {updated}"))
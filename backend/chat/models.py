@@ -6,11 +6,21 @@ User = settings.AUTH_USER_MODEL
 class Chat(models.Model):
     # chat between two users (for Avito-like behavior) — unique pair (min, max) to avoid duplicates
     users = models.ManyToManyField(User, related_name="chats")
+    # канонический ключ пары: user_low.id < user_high.id (см. chat.services.get_or_create_dialog)
+    user_low = models.ForeignKey(User, related_name="+", on_delete=models.SET_NULL, null=True, blank=True)
+    user_high = models.ForeignKey(User, related_name="+", on_delete=models.SET_NULL, null=True, blank=True)
+    # денормализовано: обновляется в chat.services.create_message
+    last_message = models.ForeignKey(
+        "Message", related_name="+", on_delete=models.SET_NULL, null=True, blank=True
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-updated_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["user_low", "user_high"], name="chat_unique_pair"),
+        ]
 
     def __str__(self):
         return f"Chat {self.id} ({', '.join([u.username for u in self.users.all()])})"
@@ -25,6 +35,27 @@ class Message(models.Model):
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            # история диалога: keyset-курсоры before/after (см. chat.services.message_page)
+            models.Index(fields=["chat", "created_at", "id"], name="message_chat_created"),
+            # отметка прочитанного диапазоном (см. chat.services.mark_read)
+            models.Index(fields=["chat", "is_read", "created_at"], name="message_chat_unread"),
+        ]
 
     def __str__(self):
         return f"Msg {self.pk} from {self.sender}"
+
+
+class ChatReadState(models.Model):
+    """Состояние диалога для участника: счётчик непрочитанных"""
+    chat = models.ForeignKey(Chat, related_name="read_states", on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name="chat_read_states", on_delete=models.CASCADE)
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["chat", "user"], name="chat_read_state_unique"),
+        ]
+
+    def __str__(self):
+        return f"Chat {self.chat_id} / user {self.user_id}: {self.unread_count}"
@@ -0,0 +1,27 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+
+def user_group(user_id):
+    """Группа всех соединений пользователя (ws/stream/ и ws/chat/<id>/)"""
+    return f"user_{user_id}"
+
+
+async def broadcast(member_ids, chat_id, kind, **data):
+    """Событие диалога — по одному group_send на участника"""
+    channel_layer = get_channel_layer()
+    event = {"type": "chat.event", "kind": kind, "chat_id": chat_id, **data}
+    for user_id in member_ids:
+        await channel_layer.group_send(user_group(user_id), event)
+
+
+def broadcast_from_sync(member_ids, chat_id, kind, **data):
+    """Для REST-вьюх: сбой channel layer не должен ломать запись"""
+    try:
+        async_to_sync(broadcast)(member_ids, chat_id, kind, **data)
+    except Exception:
+        logger.exception("Не удалось разослать событие %s диалога %s", kind, chat_id)
@@ -3,4 +3,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r"^ws/chat/(?P<chat_id>\d+)/$", consumers.ChatConsumer.as_asgi()),
+    re_path(r"^ws/stream/$", consumers.StreamConsumer.as_asgi()),
 ]
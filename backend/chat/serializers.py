@@ -17,14 +17,36 @@ class MessageSerializer(serializers.ModelSerializer):
         fields = ("id", "chat", "sender", "text", "created_at", "is_read")
         read_only_fields = ("id", "sender", "created_at", "is_read")
 
+_datetime_field = serializers.DateTimeField()
+
+
+def message_payload(message, sender_data):
+    """То же, что MessageSerializer(message).data, но с готовыми данными отправителя — без запросов"""
+    return {
+        "id": message.id,
+        "chat": message.chat_id,
+        "sender": sender_data,
+        "text": message.text,
+        "created_at": _datetime_field.to_representation(message.created_at),
+        "is_read": message.is_read,
+    }
+
+
 class ChatSerializer(serializers.ModelSerializer):
     users = SimpleUserSerializer(many=True, read_only=True)
-    last_message = serializers.SerializerMethodField()
+    last_message = MessageSerializer(read_only=True)
+    unread_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Chat
-        fields = ("id", "users", "created_at", "updated_at", "last_message")
+        fields = ("id", "users", "created_at", "updated_at", "last_message", "unread_count")
 
-    def get_last_message(self, obj):
-        msg = obj.messages.order_by("-created_at").first()
-        return MessageSerializer(msg).data if msg else None
+    def get_unread_count(self, obj):
+        # в списке диалогов приходит из annotate() (ChatViewSet.get_queryset)
+        if hasattr(obj, "unread_count"):
+            return obj.unread_count or 0
+        request = self.context.get("request")
+        if not request or not request.user.is_authenticated:
+            return 0
+        state = obj.read_states.filter(user=request.user).values_list("unread_count", flat=True).first()
+        return state or 0
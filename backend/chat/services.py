@@ -0,0 +1,167 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Q, Subquery, Value, When
+from django.db.models.functions import Greatest
+
+from .models import Chat, ChatReadState, Message
+
+
+def get_or_create_dialog(user, other):
+    """
+    Диалог пары пользователей по уникальному ключу (min id, max id): один индексный поиск,
+    а при гонке двух запросов уникальный индекс не даст создать дубликат.
+    """
+    low, high = sorted((user.pk, other.pk))
+    chat = Chat.objects.filter(user_low_id=low, user_high_id=high).first()
+    if chat:
+        return chat, False
+    chat = legacy_dialog(low, high)
+    if chat:
+        return chat, False
+    try:
+        with transaction.atomic():
+            chat = Chat.objects.create(user_low_id=low, user_high_id=high)
+            chat.users.add(low, high)
+    except IntegrityError:
+        # параллельный запрос успел создать диалог первым
+        return Chat.objects.get(user_low_id=low, user_high_id=high), False
+    return chat, True
+
+
+def legacy_dialog(low, high):
+    """
+    Диалог, созданный до ключа пары (user_low пуст, merge_duplicate_chats ещё не запускался):
+    ищется по участникам, как раньше, и сразу получает ключ — следующий поиск уже индексный.
+    """
+    chat = (
+        Chat.objects.filter(user_low__isnull=True, users=low).filter(users=high)
+        .order_by("pk").first()
+    )
+    if chat is None:
+        return None
+    try:
+        with transaction.atomic():
+            Chat.objects.filter(pk=chat.pk, user_low__isnull=True).update(user_low_id=low, user_high_id=high)
+    except IntegrityError:
+        # ключ уже у другого диалога пары (параллельный запрос) — отдаём его
+        return Chat.objects.get(user_low_id=low, user_high_id=high)
+    chat.user_low_id, chat.user_high_id = low, high
+    return chat
+
+
+def create_message(chat_id, sender, text):
+    """
+    Создаёт сообщение и в той же транзакции обновляет состояние диалога:
+    указатель на последнее сообщение и счётчики непрочитанных у остальных участников.
+    """
+    with transaction.atomic():
+        message = Message.objects.create(chat_id=chat_id, sender=sender, text=text)
+        Chat.objects.filter(pk=chat_id).update(last_message=message, updated_at=message.created_at)
+        ChatReadState.objects.filter(chat_id=chat_id).exclude(user=sender).update(
+            unread_count=F("unread_count") + 1
+        )
+    return message
+
+
+def mark_read(chat_id, reader, up_to_id=None):
+    """
+    Отмечает прочитанными все чужие сообщения диалога до up_to_id включительно
+    (по умолчанию — до последнего) одним UPDATE. Возвращает (число отмеченных, id границы).
+    """
+    if up_to_id is None:
+        up_to_id = Chat.objects.filter(pk=chat_id).values_list("last_message_id", flat=True).first()
+        if up_to_id is None:
+            return 0, None
+
+    bound_ts = Subquery(Message.objects.filter(pk=up_to_id, chat_id=chat_id).values("created_at"))
+    with transaction.atomic():
+        updated = (
+            Message.objects.filter(chat_id=chat_id, is_read=False)
+            .filter(Q(created_at__lt=bound_ts) | Q(created_at=bound_ts, id__lte=up_to_id))
+            .exclude(sender=reader)
+            .update(is_read=True)
+        )
+        if updated:
+            ChatReadState.objects.filter(chat_id=chat_id, user=reader).update(
+                unread_count=Greatest(F("unread_count") - updated, 0)
+            )
+    return updated, up_to_id
+
+
+def create_messages_bulk(items):
+    """
+    Пакетная запись [(chat_id, sender, text), ...] в порядке поступления:
+    один bulk_create и по одному UPDATE на диалоги и на счётчики непрочитанных.
+    """
+    with transaction.atomic():
+        messages = Message.objects.bulk_create(
+            [Message(chat_id=chat_id, sender=sender, text=text) for chat_id, sender, text in items]
+        )
+        last = {}
+        totals = Counter()
+        by_sender = Counter()
+        for message in messages:
+            last[message.chat_id] = message
+            totals[message.chat_id] += 1
+            by_sender[message.chat_id, message.sender_id] += 1
+
+        Chat.objects.filter(pk__in=last).update(
+            last_message=Case(*[When(pk=chat_id, then=Value(m.pk)) for chat_id, m in last.items()]),
+            updated_at=Case(*[When(pk=chat_id, then=Value(m.created_at)) for chat_id, m in last.items()]),
+        )
+        # каждому участнику — сообщения диалога, кроме его собственных
+        ChatReadState.objects.filter(chat_id__in=totals).update(
+            unread_count=F("unread_count") + Case(
+                *[
+                    When(chat_id=chat_id, user_id=sender_id, then=Value(totals[chat_id] - count))
+                    for (chat_id, sender_id), count in by_sender.items()
+                ],
+                *[When(chat_id=chat_id, then=Value(total)) for chat_id, total in totals.items()],
+                output_field=IntegerField(),
+            )
+        )
+    return messages
+
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+
+def message_page(chat_id, before=None, after=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Страница истории по индексу (chat, created_at, id), сообщения в хронологическом порядке.
+    before — более старые, чем сообщение before; after — более новые (догрузка пропущенного);
+    без курсоров — последние limit сообщений. Возвращает (messages, has_more).
+    """
+    query, ascending = message_page_query(chat_id, before, after, limit)
+    return page_result(list(query), limit, ascending)
+
+
+async def amessage_page(chat_id, before=None, after=None, limit=HISTORY_PAGE_SIZE):
+    """message_page для async-вьюх (chat.async_views)"""
+    query, ascending = message_page_query(chat_id, before, after, limit)
+    return page_result([message async for message in query.aiterator()], limit, ascending)
+
+
+def message_page_query(chat_id, before, after, limit):
+    """Запрос limit + 1 сообщений (лишнее — признак продолжения) и направление выборки"""
+    qs = Message.objects.filter(chat_id=chat_id).select_related("sender")
+    ascending = after is not None
+    cursor_id = after if ascending else before
+    if cursor_id:  # after=0 — с самого начала
+        cursor_ts = Subquery(Message.objects.filter(pk=cursor_id, chat_id=chat_id).values("created_at"))
+        if ascending:
+            qs = qs.filter(Q(created_at__gt=cursor_ts) | Q(created_at=cursor_ts, id__gt=cursor_id))
+        else:
+            qs = qs.filter(Q(created_at__lt=cursor_ts) | Q(created_at=cursor_ts, id__lt=cursor_id))
+    order = ("created_at", "id") if ascending else ("-created_at", "-id")
+    return qs.order_by(*order)[:limit + 1], ascending
+
+
+def page_result(messages, limit, ascending):
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if not ascending:
+        messages.reverse()
+    return messages, has_more
@@ -0,0 +1,22 @@
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from .models import Chat, ChatReadState
+
+
+@receiver(m2m_changed, sender=Chat.users.through)
+def sync_read_states(sender, instance, action, reverse, pk_set, **kwargs):
+    """У каждого участника диалога есть строка ChatReadState"""
+    if action not in ("post_add", "post_remove") or not pk_set:
+        return
+    # reverse=True — изменение пришло со стороны пользователя (user.chats.add(...))
+    pairs = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]
+    if action == "post_add":
+        ChatReadState.objects.bulk_create(
+            [ChatReadState(chat_id=chat_id, user_id=user_id) for chat_id, user_id in pairs],
+            ignore_conflicts=True,
+        )
+    elif reverse:
+        ChatReadState.objects.filter(user=instance, chat_id__in=pk_set).delete()
+    else:
+        ChatReadState.objects.filter(chat=instance, user_id__in=pk_set).delete()
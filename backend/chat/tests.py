@@ -0,0 +1,89 @@
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+
+from .consumers import ChatConsumer, StreamConsumer
+from .models import Chat, Message
+from .services import get_or_create_dialog
+
+User = get_user_model()
+
+
+class DialogPairKeyTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", password="secret-pass")
+        self.bob = User.objects.create_user(username="bob", password="secret-pass")
+
+    def test_legacy_dialog_is_reused_and_keyed(self):
+        # диалог до ключа пары: только участники M2M
+        legacy = Chat.objects.create()
+        legacy.users.add(self.alice, self.bob)
+
+        chat, created = get_or_create_dialog(self.bob, self.alice)
+        self.assertEqual((chat.pk, created), (legacy.pk, False))
+        legacy.refresh_from_db()
+        self.assertEqual((legacy.user_low_id, legacy.user_high_id), tuple(sorted((self.alice.pk, self.bob.pk))))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_or_create_dialog(self.alice, self.bob), (legacy, False))
+        self.assertEqual(Chat.objects.count(), 1)
+
+    def test_new_pair_creates_one_dialog(self):
+        chat, created = get_or_create_dialog(self.alice, self.bob)
+        self.assertTrue(created)
+        self.assertEqual(get_or_create_dialog(self.bob, self.alice), (chat, False))
+
+
+class ConsumerFrameTests(TransactionTestCase):
+    """Кадры сокета: битый ввод — ответ с ошибкой, закрепление за primary — не на каждый кадр"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", password="secret-pass")
+        self.bob = User.objects.create_user(username="bob", password="secret-pass")
+        self.chat, _ = get_or_create_dialog(self.alice, self.bob)
+
+    async def open_socket(self, consumer, path, **kwargs):
+        communicator = WebsocketCommunicator(consumer.as_asgi(), path)
+        communicator.scope["user"] = self.alice
+        communicator.scope["url_route"] = {"kwargs": kwargs}
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def assert_error(self, communicator, payload):
+        await communicator.send_to(text_data=payload)
+        self.assertEqual((await communicator.receive_json_from())["type"], "error")
+
+    def test_malformed_frames_get_error_reply(self):
+        @async_to_sync
+        async def run():
+            for consumer, path, kwargs in (
+                (ChatConsumer, f"/ws/chat/{self.chat.pk}/", {"chat_id": str(self.chat.pk)}),
+                (StreamConsumer, "/ws/stream/", {}),
+            ):
+                communicator = await self.open_socket(consumer, path, **kwargs)
+                for payload in ("{не json", "[1, 2]", '"text"'):
+                    await self.assert_error(communicator, payload)
+                # соединение живо после ошибок
+                await self.assert_error(communicator, json.dumps({"type": "read", "chat_id": self.chat.pk, "up_to": True}))
+                await communicator.disconnect()
+
+        run()
+
+    def test_sender_is_pinned_once_per_window(self):
+        @async_to_sync
+        async def run():
+            communicator = await self.open_socket(ChatConsumer, f"/ws/chat/{self.chat.pk}/", chat_id=str(self.chat.pk))
+            for n in range(3):
+                await communicator.send_to(text_data=json.dumps({"text": f"привет {n}"}))
+                self.assertEqual((await communicator.receive_json_from())["type"], "message")
+            await communicator.disconnect()
+
+        with mock.patch("chat.consumers.apin_primary") as apin_primary:
+            run()
+        apin_primary.assert_awaited_once_with(self.alice.pk)
+        self.assertEqual(Message.objects.filter(chat=self.chat).count(), 3)
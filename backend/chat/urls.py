@@ -1,11 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import ChatViewSet, SendMessageView
+from . import async_views
 
 router = DefaultRouter()
 router.register("chats", ChatViewSet, basename="chat")
 
 urlpatterns = [
+    # горячие GET — async-вьюхи (chat.async_views), остальное — роутер
+    path("chats/", async_views.chat_list, name="chat-list"),
+    path("chats/<int:pk>/messages/", async_views.chat_messages, name="chat-messages"),
     path("", include(router.urls)),
     path("chats/<int:chat_id>/messages/send/", SendMessageView.as_view(), name="chat-send"),
 ]
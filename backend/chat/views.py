@@ -1,11 +1,15 @@
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
-from .models import Chat, Message
+from django.db.models import OuterRef, Subquery
+from .models import Chat, ChatReadState
 from .serializers import ChatSerializer, MessageSerializer
+from .realtime import broadcast_from_sync
+from .services import HISTORY_MAX_PAGE_SIZE, HISTORY_PAGE_SIZE, create_message, get_or_create_dialog, mark_read, message_page
 
 User = get_user_model()
 
@@ -17,7 +21,13 @@ class ChatViewSet(viewsets.ModelViewSet):
     queryset = Chat.objects.all()
 
     def get_queryset(self):
-        return Chat.objects.filter(users=self.request.user).prefetch_related("users", "messages")
+        unread = ChatReadState.objects.filter(chat=OuterRef("pk"), user=self.request.user)
+        return (
+            Chat.objects.filter(users=self.request.user)
+            .select_related("last_message__sender")
+            .prefetch_related("users")
+            .annotate(unread_count=Subquery(unread.values("unread_count")[:1]))
+        )
 
     def create(self, request, *args, **kwargs):
         """
@@ -31,22 +41,66 @@ class ChatViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Нельзя создать чат с самим собой"}, status=status.HTTP_400_BAD_REQUEST)
 
         receiver = get_object_or_404(User, id=receiver_id)
-        chat = Chat.objects.filter(users=request.user).filter(users=receiver).first()
-        if chat:
-            return Response(ChatSerializer(chat, context={"request": request}).data)
-
-        chat = Chat.objects.create()
-        chat.users.add(request.user, receiver)
-        return Response(ChatSerializer(chat, context={"request": request}).data, status=status.HTTP_201_CREATED)
+        chat, created = get_or_create_dialog(request.user, receiver)
+        return Response(
+            ChatSerializer(chat, context={"request": request}).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
 
     @action(detail=True, methods=["get"])
     def messages(self, request, pk=None):
-        """Сообщения в чате"""
+        """
+        История сообщений порциями:
+        ?before=<id> — более старые, ?after=<id> (или ?since=<id>) — пропущенные новые,
+        ?limit= — размер порции (по умолчанию 50, не больше 200).
+        """
         chat = self.get_object()
         if request.user not in chat.users.all():
             return Response({"detail": "Нет доступа"}, status=status.HTTP_403_FORBIDDEN)
-        messages = chat.messages.order_by("created_at")
-        return Response(MessageSerializer(messages, many=True).data)
+
+        messages, has_more = message_page(chat.pk, **self.history_params())
+        return Response({
+            "results": MessageSerializer(messages, many=True).data,
+            "has_more": has_more,
+        })
+
+    def history_params(self):
+        """before/after/limit истории из запроса (общие с chat.async_views)"""
+        try:
+            before = self._int_param("before")
+            after = self._int_param("after")
+            if after is None:
+                after = self._int_param("since")
+            limit = self._int_param("limit") or HISTORY_PAGE_SIZE
+        except ValueError:
+            raise ParseError("Курсор и limit должны быть числами")
+        if before is not None and after is not None:
+            raise ParseError("Укажите только before или after")
+        return {"before": before, "after": after, "limit": max(1, min(limit, HISTORY_MAX_PAGE_SIZE))}
+
+    def _int_param(self, name):
+        value = self.request.query_params.get(name)
+        return int(value) if value not in (None, "") else None
+
+    @action(detail=True, methods=["post"])
+    def read(self, request, pk=None):
+        """
+        POST /api/chats/<id>/read/ с {"up_to": <message_id>}
+        Отмечает прочитанным всё до up_to включительно (без up_to — до последнего сообщения).
+        """
+        chat = self.get_object()
+        up_to = request.data.get("up_to")
+        try:
+            up_to = int(up_to) if up_to not in (None, "") else None
+        except (TypeError, ValueError):
+            return Response({"detail": "up_to должен быть числом"}, status=status.HTTP_400_BAD_REQUEST)
+
+        updated, up_to = mark_read(chat.pk, request.user, up_to)
+        if updated:
+            broadcast_from_sync(
+                [user.id for user in chat.users.all()], chat.pk, "read", reader_id=request.user.id, up_to=up_to
+            )
+        return Response({"updated": updated, "up_to": up_to})
 
     @action(detail=True, methods=["post"])
     def send(self, request, pk=None):
@@ -59,8 +113,10 @@ class ChatViewSet(viewsets.ModelViewSet):
         if not text:
             return Response({"detail": "Текст обязателен"}, status=status.HTTP_400_BAD_REQUEST)
 
-        message = Message.objects.create(chat=chat, sender=request.user, text=text)
-        return Response(MessageSerializer(message).data, status=status.HTTP_201_CREATED)
+        message = create_message(chat.pk, request.user, text)
+        data = MessageSerializer(message).data
+        broadcast_from_sync([user.id for user in chat.users.all()], chat.pk, "message", message=data)
+        return Response(data, status=status.HTTP_201_CREATED)
 
 
 class SendMessageView(generics.CreateAPIView):
@@ -70,7 +126,7 @@ class SendMessageView(generics.CreateAPIView):
 
     def create(self, request, *args, **kwargs):
         chat_id = kwargs.get("chat_id")
-        chat = get_object_or_404(Chat, pk=chat_id)
+        chat = get_object_or_404(Chat.objects.prefetch_related("users"), pk=chat_id)
 
         if request.user not in chat.users.all():
             return Response({"detail": "Нет доступа"}, status=status.HTTP_403_FORBIDDEN)
@@ -79,5 +135,7 @@ class SendMessageView(generics.CreateAPIView):
         if not text:
             return Response({"detail": "Текст обязателен"}, status=status.HTTP_400_BAD_REQUEST)
 
-        message = Message.objects.create(chat=chat, sender=request.user, text=text)
-        return Response(MessageSerializer(message).data, status=status.HTTP_201_CREATED)
+        message = create_message(chat.pk, request.user, text)
+        data = MessageSerializer(message).data
+        broadcast_from_sync([user.id for user in chat.users.all()], chat.pk, "message", message=data)
+        return Response(data, status=status.HTTP_201_CREATED)
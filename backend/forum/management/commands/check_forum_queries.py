@@ -0,0 +1,71 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.text import slugify
+
+from forum.models import ForumCategory, ForumComment, ForumTopic
+from forum.querysets import annotated_categories, annotated_comments, annotated_topics
+from forum.serializers import ForumCategorySerializer, ForumCommentSerializer, ForumTopicSerializer
+
+User = get_user_model()
+
+# запросов на страницу списка, независимо от её размера
+QUERY_BUDGET = {
+    "topics": 2,  # темы со счётчиками + снимок категорий
+    "categories": 1,
+    "comments": 1,
+}
+PAGE_SIZES = [1, 10, 50]
+
+
+class Command(BaseCommand):
+    help = "Проверяет, что списки форума укладываются в фиксированное число запросов при любом размере страницы"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N тем с комментариями и лайками")
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.seed(options["seed"])
+
+        lists = {
+            "topics": (annotated_topics().order_by("-created_at"), ForumTopicSerializer),
+            "categories": (annotated_categories().order_by("name"), ForumCategorySerializer),
+            "comments": (annotated_comments().order_by("-created_at"), ForumCommentSerializer),
+        }
+        failures = []
+        for name, (queryset, serializer_class) in lists.items():
+            for size in PAGE_SIZES:
+                with CaptureQueriesContext(connection) as queries:
+                    serializer_class(list(queryset[:size]), many=True).data
+                label = f"{name:<11} page_size={size:<3} запросов: {len(queries)} (бюджет {QUERY_BUDGET[name]})"
+                if len(queries) > QUERY_BUDGET[name]:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(f"✗ {label}"))
+                else:
+                    self.stdout.write(f"✓ {label}")
+
+        if failures:
+            raise CommandError(f"Превышен бюджет запросов в {len(failures)} проверках")
+        self.stdout.write(self.style.SUCCESS("✅ Списки форума укладываются в бюджет запросов"))
+
+    def seed(self, count):
+        users = [User.objects.get_or_create(username=f"forum_bench_{i}")[0] for i in range(5)]
+        categories = [
+            ForumCategory.objects.get_or_create(slug=slugify(name), defaults={"name": name})[0]
+            for name in ("general", "dogs", "cats")
+        ]
+        for i in range(count):
+            topic = ForumTopic.objects.create(
+                title=f"Тема {i}", content="...", author=random.choice(users), category=random.choice(categories)
+            )
+            topic.likes.add(*random.sample(users, random.randint(0, len(users))))
+            comments = ForumComment.objects.bulk_create(
+                [ForumComment(topic=topic, author=random.choice(users), text="...") for _ in range(random.randint(0, 5))]
+            )
+            for comment in comments:
+                comment.likes.add(*random.sample(users, random.randint(0, len(users))))
+        self.stdout.write(self.style.SUCCESS(f"✅ Добавлено {count} тем"))
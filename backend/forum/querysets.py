@@ -0,0 +1,53 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import ForumCategory, ForumComment, ForumTopic
+
+
+def related_count(model, name):
+    """
+    COUNT(*) связанных строк (обратный ForeignKey или ManyToMany) подзапросом для annotate():
+    без JOIN-ов, которые перемножают строки, когда у темы считаются и комментарии, и лайки.
+    """
+    field = model._meta.get_field(name)
+    if field.many_to_many:
+        rows, column = field.remote_field.through.objects.all(), field.m2m_field_name()
+    else:
+        rows, column = field.related_model.objects.all(), field.field.name
+    counts = (
+        rows.filter(**{column: OuterRef('pk')})
+        .order_by()
+        .values(column)
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def annotated_categories(queryset=None):
+    queryset = ForumCategory.objects.all() if queryset is None else queryset
+    return queryset.annotate(topics_count=related_count(ForumCategory, 'topics'))
+
+
+def annotated_topics(queryset=None):
+    """Темы с автором, категорией и счётчиками — один запрос на страницу"""
+    queryset = ForumTopic.objects.all() if queryset is None else queryset
+    return queryset.select_related('author', 'category').annotate(
+        comments_count=related_count(ForumTopic, 'comments'),
+        likes_count=related_count(ForumTopic, 'likes'),
+    )
+
+
+def annotated_comments(queryset=None):
+    queryset = ForumComment.objects.all() if queryset is None else queryset
+    return queryset.select_related('author').annotate(likes_count=related_count(ForumComment, 'likes'))
+
+
+def liked_ids(model, name, user, ids):
+    """id объектов из ids, которые лайкнул user (ManyToMany name) — один запрос на страницу"""
+    field = model._meta.get_field(name)
+    return set(
+        field.remote_field.through.objects.filter(
+            **{f'{field.m2m_field_name()}__in': ids, field.m2m_reverse_field_name(): user}
+        ).values_list(field.m2m_field_name(), flat=True)
+    )
@@ -1,8 +1,12 @@
+import logging
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import ForumCategory, ForumTopic, ForumComment
+from .querysets import annotated_categories
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 class UserShortSerializer(serializers.ModelSerializer):
@@ -11,26 +15,86 @@ class UserShortSerializer(serializers.ModelSerializer):
         fields = ["id", "username", "avatar"]
 
 
+def annotated_count(serializer, obj, name, relation):
+    """
+    Счётчик из annotate() (см. forum.querysets). Без аннотации — отдельный COUNT: у одного
+    объекта (только что созданного) это один запрос, в списке — N+1, о котором пишем в лог
+    """
+    value = getattr(obj, name, None)
+    if value is not None:
+        return value
+    if isinstance(serializer.parent, serializers.ListSerializer):
+        logger.warning(
+            "%s.%s без annotate(): список не из forum.querysets, COUNT на каждую строку",
+            type(obj).__name__, name,
+        )
+    return getattr(obj, relation).count()
+
+
 class ForumCategorySerializer(serializers.ModelSerializer):
-    topics_count = serializers.IntegerField(source="topics.count", read_only=True)
+    topics_count = serializers.SerializerMethodField()
 
     class Meta:
         model = ForumCategory
         fields = ["id", "name", "slug", "description", "topics_count"]
 
+    def get_topics_count(self, obj):
+        return annotated_count(self, obj, "topics_count", "topics")
+
+
+class CategoriesSnapshotField(serializers.Field):
+    """
+    Вложенная категория темы. В списке (many=True) все категории с topics_count считаются
+    одним запросом на ответ; у одной темы (retrieve, create) — только её категория, одной строкой.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        kwargs.setdefault("source", "category_id")
+        super().__init__(**kwargs)
+        self._categories = None
+
+    def to_representation(self, value):
+        if value is None:
+            return None
+        if not isinstance(getattr(self.parent, "parent", None), serializers.ListSerializer):
+            category = annotated_categories(ForumCategory.objects.filter(pk=value)).first()
+            return ForumCategorySerializer(category).data if category is not None else None
+        if self._categories is None:
+            self._categories = {
+                category.id: ForumCategorySerializer(category).data
+                for category in annotated_categories()
+            }
+        return self._categories.get(value)
+
 
 class ForumCommentSerializer(serializers.ModelSerializer):
     author = UserShortSerializer(read_only=True)
-    likes_count = serializers.IntegerField(source="likes.count", read_only=True)
+    likes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = ForumComment
         fields = ["id", "author", "text", "likes_count", "created_at"]
 
+    def get_likes_count(self, obj):
+        return annotated_count(self, obj, "likes_count", "likes")
+
+
+class ForumCommentStreamSerializer(ForumCommentSerializer):
+    """Комментарий ленты темы; liked_by_me — из набора liked_ids в контексте (None для анонимов)"""
+    liked_by_me = serializers.SerializerMethodField()
+
+    class Meta(ForumCommentSerializer.Meta):
+        fields = ForumCommentSerializer.Meta.fields + ["liked_by_me"]
+
+    def get_liked_by_me(self, obj):
+        liked = self.context.get("liked_ids")
+        return None if liked is None else obj.id in liked
+
 
 class ForumTopicSerializer(serializers.ModelSerializer):
     author = UserShortSerializer(read_only=True)
-    category = ForumCategorySerializer(read_only=True)
+    category = CategoriesSnapshotField()
     category_id = serializers.PrimaryKeyRelatedField(
         source="category",
         queryset=ForumCategory.objects.all(),
@@ -38,8 +102,8 @@ class ForumTopicSerializer(serializers.ModelSerializer):
         required=False,
         allow_null=True,
     )
-    comments_count = serializers.IntegerField(source="comments.count", read_only=True)
-    likes_count = serializers.IntegerField(source="likes.count", read_only=True)
+    comments_count = serializers.SerializerMethodField()
+    likes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = ForumTopic
@@ -55,3 +119,9 @@ class ForumTopicSerializer(serializers.ModelSerializer):
             "comments_count",
             "created_at",
         ]
+
+    def get_comments_count(self, obj):
+        return annotated_count(self, obj, "comments_count", "comments")
+
+    def get_likes_count(self, obj):
+        return annotated_count(self, obj, "likes_count", "likes")
@@ -0,0 +1,50 @@
+from django.db.models import Q, Subquery
+from rest_framework import generics, permissions
+from rest_framework.exceptions import NotFound, ValidationError
+
+from ads.pagination import KeysetPagination
+from .models import ForumComment, ForumTopic
+from .querysets import annotated_comments, liked_ids
+from .serializers import ForumCommentStreamSerializer
+
+
+class CommentStreamPagination(KeysetPagination):
+    """Комментарии темы по порядку написания, курсор по (created_at, id)"""
+    page_size = 30
+    default_ordering = 'created_at'
+    cursor_salt = 'forum.comment_stream'
+
+
+class ForumCommentStreamView(generics.ListAPIView):
+    """
+    Лента комментариев темы: GET /api/forum/<topic_id>/comment-stream/
+      ?cursor=... — следующая страница (ссылки next/previous в ответе)
+      ?after=<id> — только новые после комментария id (дешёвый опрос открытой темы)
+    """
+    serializer_class = ForumCommentStreamSerializer
+    pagination_class = CommentStreamPagination
+    permission_classes = [permissions.AllowAny]
+
+    def get_queryset(self):
+        topic_id = self.kwargs['topic_id']
+        queryset = annotated_comments(ForumComment.objects.filter(topic_id=topic_id))
+        after = self.request.query_params.get('after')
+        if after:
+            if not after.isdigit():
+                raise ValidationError({'after': 'Ожидается id комментария'})
+            anchor = Subquery(ForumComment.objects.filter(pk=after, topic_id=topic_id).values('created_at'))
+            queryset = queryset.filter(Q(created_at__gt=anchor) | Q(created_at=anchor, id__gt=after))
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        # наличие темы проверяем только для пустой первой загрузки — опрос ?after= остаётся одним запросом
+        first_load = 'after' not in request.query_params
+        if not page and first_load and not ForumTopic.objects.filter(pk=self.kwargs['topic_id']).exists():
+            raise NotFound('Тема не найдена')
+
+        context = self.get_serializer_context()
+        if request.user.is_authenticated:
+            context['liked_ids'] = liked_ids(ForumComment, 'likes', request.user, [c.id for c in page])
+        serializer = self.get_serializer_class()(page, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
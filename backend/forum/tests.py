@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+
+from .models import ForumCategory, ForumComment, ForumTopic
+from .querysets import annotated_topics
+from .serializers import ForumTopicSerializer
+
+User = get_user_model()
+
+
+class ForumQueryBudgetTests(APITestCase):
+    """Списки форума — фиксированное число запросов при любом числе строк"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f"member{n}", password="secret-pass") for n in range(3)]
+        cls.category = ForumCategory.objects.create(name="Общее", slug="general")
+        cls.topic = cls.add_topics(1)[0]
+
+    @classmethod
+    def add_topics(cls, count):
+        topics = []
+        for n in range(count):
+            topic = ForumTopic.objects.create(title=f"Тема {n}", content="...", author=cls.users[0], category=cls.category)
+            topic.likes.add(*cls.users)
+            comment = ForumComment.objects.create(topic=topic, author=cls.users[1], text="...")
+            comment.likes.add(cls.users[2])
+            topics.append(topic)
+        return topics
+
+    def serialize_topics(self):
+        return ForumTopicSerializer(list(annotated_topics().order_by("-created_at")), many=True).data
+
+    def test_topic_list_budget_does_not_grow(self):
+        # темы со счётчиками + снимок категорий
+        for extra in (0, 20):
+            self.add_topics(extra)
+            with self.assertNoLogs("forum.serializers", "WARNING"), self.assertNumQueries(2):
+                data = self.serialize_topics()
+        self.assertEqual((data[0]["likes_count"], data[0]["comments_count"]), (3, 1))
+        self.assertEqual(data[0]["category"]["topics_count"], 21)
+
+    def test_unannotated_list_is_reported(self):
+        with self.assertLogs("forum.serializers", "WARNING"):
+            ForumTopicSerializer(list(ForumTopic.objects.all()), many=True).data
+
+    def test_comment_stream_is_one_query(self):
+        url = f"/api/forum/{self.topic.pk}/comment-stream/"
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.json()["results"][0]["likes_count"], 1)
+
+        # с пользователем — ещё один запрос на liked_by_me всей страницы
+        self.client.force_authenticate(self.users[2])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertTrue(response.json()["results"][0]["liked_by_me"])
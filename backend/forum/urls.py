@@ -1,8 +1,12 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from .views import ForumTopicViewSet, ForumCategoryViewSet
+from .streams import ForumCommentStreamView
 
 router = DefaultRouter()
 router.register("forum", ForumTopicViewSet, basename="forum")
 router.register("forum-categories", ForumCategoryViewSet, basename="forum-category")
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path("forum/<int:topic_id>/comment-stream/", ForumCommentStreamView.as_view(), name="forum-comment-stream"),
+]
@@ -0,0 +1,262 @@
+"""
+Чтение с реплик для публичных разделов: объявления, категории, форум.
+
+ReplicaRoutingMiddleware кладёт запрос в contextvar, ReplicaRouter по нему выбирает базу.
+На реплику уходят только чтения в GET/HEAD/OPTIONS к вьюхам из DATABASE_REPLICA["VIEWS"]
+и только моделей вне PRIMARY_APPS. Запись, транзакции, команды, сокеты и фоновые
+потоки работают с default. Весь запрос читает с одной реплики.
+
+Read-your-writes: запрос, который писал в БД, закрепляет пользователя за default
+на STICKY_SECONDS. Метка лежит в кэше DATABASE_REPLICA["CACHE"], он должен быть общим
+для воркеров. Реплика, отстающая больше MAX_LAG секунд или недоступная, пропускается.
+Отставание раз в LAG_CHECK_INTERVAL секунд замеряет фоновый поток процесса; роутер его не ждёт.
+Метки закрепления обязаны быть общими: с несколькими воркерами кэш в памяти процесса не годится.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+DEFAULT_DATABASE_REPLICA = {
+    "ALIASES": [],
+    "VIEWS": [],  # "модуль.Класс" вьюхи или префикс модуля ("forum")
+    "STICKY_SECONDS": 15,
+    "MAX_LAG": 5.0,
+    "LAG_CHECK_INTERVAL": 5,
+    "CACHE": "default",
+}
+# учётные записи и сессии — всегда с primary: вход сразу после регистрации или смены пароля
+PRIMARY_APPS = {"admin", "auth", "contenttypes", "sessions", "token_blacklist", "users"}
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+PIN_PREFIX = "db:pin:"
+
+# на простаивающем primary replay_timestamp стареет, поэтому совпадение LSN — нулевое отставание
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+logger = logging.getLogger(__name__)
+
+current = contextvars.ContextVar("db_routing_request", default=None)
+_health = {}  # alias -> (момент проверки, годна ли)
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULT_DATABASE_REPLICA, **getattr(settings, "DATABASE_REPLICA", {})}
+
+
+class RequestState:
+    """Маршрут чтения одного запроса: выбирается при первом чтении и дальше не меняется"""
+
+    __slots__ = ("request", "target", "wrote")
+
+    def __init__(self, request):
+        self.request = request
+        self.target = None
+        self.wrote = False
+
+
+def view_path(func):
+    # DRF as_view и async-вьюхи ads/chat хранят класс вьюсета в .cls
+    view = getattr(func, "cls", None) or func
+    return f"{view.__module__}.{view.__qualname__}"
+
+
+def view_allowed(request, config):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return False
+    path = view_path(match.func)
+    return any(path == entry or path.startswith(entry + ".") for entry in config["VIEWS"])
+
+
+def request_user_id(request):
+    # DRF кладёт пользователя и в исходный HttpRequest
+    user = getattr(request, "user", None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def pin_key(user_id):
+    return f"{PIN_PREFIX}{user_id}"
+
+
+def pin_primary(user_id):
+    """Читать пользователю с primary ближайшие STICKY_SECONDS"""
+    config = get_config()
+    if config["ALIASES"]:
+        caches[config["CACHE"]].set(pin_key(user_id), 1, config["STICKY_SECONDS"])
+
+
+async def apin_primary(user_id):
+    config = get_config()
+    if config["ALIASES"]:
+        await caches[config["CACHE"]].aset(pin_key(user_id), 1, config["STICKY_SECONDS"])
+
+
+def is_pinned(user_id, config):
+    return caches[config["CACHE"]].get(pin_key(user_id)) is not None
+
+
+def replica_lag(alias):
+    """Отставание реплики в секундах; не-Postgres (локальная подмена реплики) — всегда 0"""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        return float(cursor.fetchone()[0] or 0)
+
+
+def check_health(alias, config):
+    try:
+        lag = replica_lag(alias)
+    except DatabaseError:
+        logger.warning("Реплика %s недоступна — чтение с %s", alias, DEFAULT_DB_ALIAS, exc_info=True)
+        return False
+    if lag > config["MAX_LAG"]:
+        logger.warning("Реплика %s отстаёт на %.1f с — чтение с %s", alias, lag, DEFAULT_DB_ALIAS)
+        return False
+    return True
+
+
+def refresh_health():
+    """Замер всех реплик синхронно: фоновый поток и команды (check_replica_routing)"""
+    config = get_config()
+    for alias in config["ALIASES"]:
+        _health[alias] = (time.monotonic(), check_health(alias, config))
+
+
+def monitor_health():
+    """
+    Фоновый поток процесса: отставание реплик раз в LAG_CHECK_INTERVAL. Роутер читает
+    только результат, поэтому запрос (и цикл событий async-вьюх) замера не ждёт
+    """
+    while True:
+        try:
+            refresh_health()
+        except Exception:
+            logger.exception("Не удалось проверить реплики")
+        finally:
+            # соединения потока не держим между замерами (место в пуле)
+            for alias in get_config()["ALIASES"]:
+                connections[alias].close()
+        time.sleep(get_config()["LAG_CHECK_INTERVAL"])
+
+
+def start_monitor():
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = threading.Thread(target=monitor_health, name="replica-health", daemon=True)
+                _monitor.start()
+
+
+def is_healthy(alias, config):
+    """Последний замер фонового потока; пока замера нет или он устарел — реплика не используется"""
+    start_monitor()
+    checked = _health.get(alias)
+    if checked is None or time.monotonic() - checked[0] > 3 * config["LAG_CHECK_INTERVAL"]:
+        return False
+    return checked[1]
+
+
+def reset_health():
+    _health.clear()
+    refresh_health()
+
+
+def read_target(request, config):
+    if not config["ALIASES"] or request.method not in SAFE_METHODS or not view_allowed(request, config):
+        return DEFAULT_DB_ALIAS
+    user_id = request_user_id(request)
+    if user_id is not None and is_pinned(user_id, config):
+        return DEFAULT_DB_ALIAS
+    healthy = [alias for alias in config["ALIASES"] if is_healthy(alias, config)]
+    return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current.get()
+        if state is None or model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        # внутри транзакции читаем то, что в ней же записали
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.target is None:
+            state.target = read_target(state.request, get_config())
+        return state.target
+
+    def db_for_write(self, model, **hints):
+        state = current.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_config()["ALIASES"]}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Делает запрос видимым ReplicaRouter; после записи закрепляет пользователя за primary"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = get_config()
+        if (
+            config["ALIASES"]
+            and isinstance(caches[config["CACHE"]], LocMemCache)
+            and getattr(settings, "WEB_CONCURRENCY", 1) > 1
+        ):
+            raise ImproperlyConfigured(
+                f'DATABASE_REPLICA["CACHE"]={config["CACHE"]!r} — память процесса: после записи '
+                "следующий запрос на другом воркере не увидит закрепления за primary. Нужен общий кэш (Redis)"
+            )
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = RequestState(request)
+        token = current.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        if state.wrote and (user_id := request_user_id(request)) is not None:
+            pin_primary(user_id)
+        return response
+
+    async def __acall__(self, request):
+        state = RequestState(request)
+        token = current.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        # сессионный пользователь может быть ещё ленивым — вычисляем его вне цикла событий
+        if state.wrote and (user_id := await sync_to_async(request_user_id)(request)) is not None:
+            await apin_primary(user_id)
+        return response
@@ -3,6 +3,8 @@ import os
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.environ.get("SECRET_KEY", "django-insecure-dev-key")
@@ -29,7 +31,6 @@ INSTALLED_APPS = [
     "ads",
     "users",
     "pets",
-    "channels",
     "chat",
     'forum',
 ]
@@ -41,6 +42,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "pet_project.db_routing.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -64,6 +66,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "pet_project.wsgi.application"
+# В продакшене — ASGI (gunicorn -k uvicorn.workers.UvicornWorker): async-вьюхи ads/chat и WebSocket в одном процессе
 ASGI_APPLICATION = "pet_project.asgi.application"
 
 # Для Channels (WebSocket)
@@ -74,15 +77,65 @@ CHANNEL_LAYERS = {
 }
 
 # Database
-DATABASES = {
-    "default": {
+def db_pool(prefix):
+    """Пул соединений psycopg на процесс: max_size × воркеры ≤ max_connections сервера"""
+    return {
+        "min_size": int(os.environ.get(f"{prefix}_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.environ.get(f"{prefix}_POOL_MAX_SIZE", "10")),
+        "timeout": float(os.environ.get(f"{prefix}_POOL_TIMEOUT", "10")),
+    }
+
+
+def postgres_database(host, port, pool, **extra):
+    return {
         "ENGINE": "django.db.backends.postgresql",
         "NAME": os.environ.get("POSTGRES_DB", "petmarket"),
         "USER": os.environ.get("POSTGRES_USER", "petuser"),
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD", "5v1234567"),
-        "HOST": os.environ.get("DB_HOST", "pet-db"),
-        "PORT": os.environ.get("DB_PORT", "5432"),
+        "HOST": host,
+        "PORT": port,
+        # с пулом CONN_MAX_AGE остаётся 0: соединение возвращается в пул в конце запроса
+        "OPTIONS": {"pool": pool} if os.environ.get("DB_POOL", "True") == "True" else {},
+        **extra,
     }
+
+
+DATABASES = {
+    "default": postgres_database(
+        os.environ.get("DB_HOST", "pet-db"), os.environ.get("DB_PORT", "5432"), db_pool("DB"),
+    ),
+}
+# DB_REPLICA_HOSTS=host[:port],... — реплики только для чтения, см. pet_project.db_routing
+for number, address in enumerate(filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(",")), start=1):
+    replica_host, _, replica_port = address.strip().partition(":")
+    DATABASES[f"replica_{number}"] = postgres_database(
+        replica_host, replica_port or DATABASES["default"]["PORT"], db_pool("DB_REPLICA"), TEST={"MIRROR": "default"},
+    )
+# DB_ENGINE=sqlite — локальные прогоны (generate_fake_data, run_benchmarks) без Postgres;
+# SQLITE_REPLICA_PATH — второй файл в роли реплики (check_replica_routing)
+if os.environ.get("DB_ENGINE") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+        }
+    }
+    if os.environ.get("SQLITE_REPLICA_PATH"):
+        DATABASES["replica_1"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ["SQLITE_REPLICA_PATH"],
+            "TEST": {"MIRROR": "default"},
+        }
+
+DATABASE_ROUTERS = ["pet_project.db_routing.ReplicaRouter"]
+DATABASE_REPLICA = {
+    "ALIASES": [alias for alias in DATABASES if alias.startswith("replica_")],
+    "VIEWS": ["ads.views.PetViewSet", "ads.views.CategoryViewSet", "forum"],
+    "STICKY_SECONDS": int(os.environ.get("DB_REPLICA_STICKY_SECONDS", "15")),
+    "MAX_LAG": float(os.environ.get("DB_REPLICA_MAX_LAG", "5")),
+    "LAG_CHECK_INTERVAL": 5,
+    # метки закрепления за primary должны видеть все воркеры — общий кэш (Redis, см. RESPONSE_CACHE_URL)
+    "CACHE": "responses",
 }
 
 AUTH_USER_MODEL = "users.User"
@@ -110,19 +163,40 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # DRF
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # прокси перед приложением (nginx): адрес клиента — последний из X-Forwarded-For,
+    # 0 — REMOTE_ADDR (приложение без прокси)
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", "1")),
 }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    # хэш пароля в токене — версия для кэша пользователей; смена пароля отзывает токены.
+    # Включение отзывает и все токены, выданные до деплоя (в них нет claim) — пользователи
+    # войдут заново. Мягкая раскатка: JWT_ACCEPT_UNVERSIONED=True на REFRESH_TOKEN_LIFETIME
+    "CHECK_REVOKE_TOKEN": True,
+    "TOKEN_OBTAIN_SERIALIZER": "users.authentication.PetTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.authentication.PetTokenRefreshSerializer",
+}
+
+# Пользователь по JWT (users.authentication): LRU в памяти процесса, TTL в секундах.
+# Поколения пользователей — в общем кэше CACHE: изменение и отзыв видны всем воркерам сразу.
+# STATELESS — поля профиля в access-токене, пользователь без запроса к БД; смена пароля
+# тогда действует только по истечении токена, поэтому ACCESS_TOKEN_LIFETIME стоит сократить
+JWT_USER_CACHE = {
+    "MAX_SIZE": 10000,
+    "TTL": 60,
+    "STATELESS": os.environ.get("JWT_STATELESS", "False") == "True",
+    "CACHE": "responses",
+    "ACCEPT_UNVERSIONED": os.environ.get("JWT_ACCEPT_UNVERSIONED", "False") == "True",
 }
 
 # Channels (Redis)
@@ -138,6 +212,51 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Микробатчинг сообщений в ChatConsumer (окно в мс, 0 — писать каждое сообщение сразу)
+CHAT_BATCH_WINDOW_MS = int(os.environ.get("CHAT_BATCH_WINDOW_MS", "0"))
+
+# Обработка фото объявлений (ads.photos): процессов в пуле, 0 — обрабатывать в потоке запроса
+IMAGE_PIPELINE_WORKERS = int(os.environ.get("IMAGE_PIPELINE_WORKERS", "2"))
+
+# Общий кэш "responses": поколения кэша ответов (ads.response_cache), версия каталога (ads.catalog),
+# метки read-your-writes (pet_project.db_routing), поколения пользователей (users.authentication).
+# Их меняют и веб-воркеры, и команды/фоновые процессы, поэтому по умолчанию — Redis из docker-compose.
+# Пустой RESPONSE_CACHE_URL — память процесса: только для одного процесса (WEB_CONCURRENCY=1, runserver)
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "4"))
+RESPONSE_CACHE_URL = os.environ.get("RESPONSE_CACHE_URL", f"redis://{REDIS_HOST}:{REDIS_PORT}/1")
+if not RESPONSE_CACHE_URL and WEB_CONCURRENCY > 1:
+    raise ImproperlyConfigured(
+        "RESPONSE_CACHE_URL пуст при WEB_CONCURRENCY > 1: воркеры не увидят инвалидацию друг друга"
+    )
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "responses": (
+        {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": RESPONSE_CACHE_URL}
+        if RESPONSE_CACHE_URL
+        else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "responses"}
+    ),
+}
+RESPONSE_CACHE = {
+    "ALIAS": "responses",
+    "TIMEOUT": 300,
+}
+
+# Статистика профиля (ads.stats): строку старше этого числа секунд пересчитывает rebuild_user_stats --stale
+USER_STATS_MAX_AGE = int(os.environ.get("USER_STATS_MAX_AGE", "60"))
+
+# Похожие объявления (ads.similar): соседей на объявление и файл модели для досчёта между пересборками
+SIMILAR_PETS = {
+    "K": int(os.environ.get("SIMILAR_PETS_K", "12")),
+    "MODEL_PATH": os.environ.get("SIMILAR_PETS_MODEL_PATH", BASE_DIR / "var" / "similar_pets.npz"),
+}
+
+# Буфер просмотров объявлений (ads.counters): локальный или общий в Redis
+VIEW_COUNTER = {
+    "BACKEND": os.environ.get("VIEW_COUNTER_BACKEND", "ads.counters.LocalViewCounterBackend"),
+    "DEDUP_WINDOW": 30 * 60,
+    "FLUSH_INTERVAL": 10,
+}
+
 # CORS & CSRF
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:8080",
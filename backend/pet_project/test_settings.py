@@ -0,0 +1,22 @@
+"""
+Настройки тестов: python manage.py test ads --settings=pet_project.test_settings
+SQLite в памяти, кэши и channel layer в памяти процесса, без реплик.
+
+Миграции в репозитории не хранятся, поэтому таблицы тестовой базы строятся прямо по моделям
+(MIGRATION_MODULES). Нужен полный проект: AUTH_USER_MODEL (users.User) и forum.models
+(их импортирует ads.stats) — без этих модулей django.setup() падает ещё до первого теста.
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}}
+DATABASE_REPLICA = {**DATABASE_REPLICA, "ALIASES": []}
+# все приложения без миграций: таблицы создаются одним проходом, внешние ключи — в конце
+MIGRATION_MODULES = {app.rsplit(".", 1)[-1]: None for app in INSTALLED_APPS}
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "responses": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "responses"},
+}
+CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+IMAGE_PIPELINE_WORKERS = 0
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+VIEW_COUNTER = {**VIEW_COUNTER, "FLUSH_INTERVAL": 0}
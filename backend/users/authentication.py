@@ -0,0 +1,293 @@
+"""
+Пользователь по JWT для DRF (CachedJWTAuthentication) и WebSocket (JWTAuthMiddleware).
+
+Строка users.User кэшируется в памяти процесса (LRU с TTL, JWT_USER_CACHE) по ключу
+(user_id, версия токена). Версия — claim simplejwt REVOKE_TOKEN_CLAIM, хэш пароля:
+после смены пароля старые токены не совпадут со свежей строкой. Запись в LRU помечена
+поколением пользователя из общего кэша (JWT_USER_CACHE["CACHE"]), оно сверяется при каждом
+попадании. Изменение пользователя и отзыв refresh-токена после коммита меняют поколение —
+устаревшая запись перестаёт отдаваться во всех воркерах сразу, а не через TTL.
+
+В режиме STATELESS access-токен несёт поля STATELESS_FIELDS, и пользователь собирается
+без обращения к БД; остальные поля модели отложены и догрузятся при первом обращении.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+User = get_user_model()
+
+DEFAULT_JWT_USER_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 60,
+    'STATELESS': False,
+    # общий кэш поколений пользователей: должен быть виден всем воркерам
+    'CACHE': 'default',
+    # принимать токены без REVOKE_TOKEN_CLAIM (выданные до включения CHECK_REVOKE_TOKEN)
+    'ACCEPT_UNVERSIONED': False,
+}
+# поля профиля в access-токене: всё, что читают сериализаторы и проверки прав
+STATELESS_FIELDS = ['username', 'first_name', 'last_name', 'email', 'avatar', 'is_active', 'is_staff', 'is_superuser']
+STATELESS_CLAIM = 'usr'
+GENERATION_PREFIX = 'users:jwt_user:generation:'
+# ключ поколения без обращений истекает: новое поколение — лишь промах LRU, не ошибка
+GENERATION_TIMEOUT = 24 * 3600
+
+
+def get_config():
+    return {**DEFAULT_JWT_USER_CACHE, **getattr(settings, 'JWT_USER_CACHE', {})}
+
+
+class UserCache:
+    """
+    LRU с TTL: {(user_id, версия): (срок, поколение, значения полей)}.
+    Запись другого поколения — промах. Каждому запросу — свой экземпляр User
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, generation):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, entry_generation, values = entry
+            if expires < time.monotonic() or entry_generation != generation:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        return build_user(values)
+
+    def put(self, key, user, generation):
+        values = {field.attname: getattr(user, field.attname) for field in User._meta.concrete_fields}
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, generation, values)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def evict(self, user_id):
+        user_id = str(user_id)
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def build_user(values):
+    """User из известных полей как из БД; отсутствующие поля отложены (догрузятся запросом)"""
+    fields = [field for field in User._meta.concrete_fields if field.attname in values]
+    return User.from_db('default', [field.attname for field in fields], [values[field.attname] for field in fields])
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        config = get_config()
+        _cache = UserCache(config['MAX_SIZE'], config['TTL'])
+    return _cache
+
+
+def get_shared_cache():
+    return caches[get_config()['CACHE']]
+
+
+def generation_key(user_id):
+    return f'{GENERATION_PREFIX}{user_id}'
+
+
+def get_generation(user_id):
+    return get_shared_cache().get_or_set(generation_key(user_id), time.time_ns, GENERATION_TIMEOUT)
+
+
+async def aget_generation(user_id):
+    return await get_shared_cache().aget_or_set(generation_key(user_id), time.time_ns, GENERATION_TIMEOUT)
+
+
+def invalidate_user(user_id):
+    """Новое поколение в общем кэше и вычистка LRU этого процесса; остальные заметят при попадании"""
+    get_shared_cache().set(generation_key(user_id), time.time_ns(), GENERATION_TIMEOUT)
+    get_cache().evict(user_id)
+
+
+def token_key(token):
+    try:
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken(_('Token contained no recognizable user identification'))
+    return str(user_id), token.get(api_settings.REVOKE_TOKEN_CLAIM)
+
+
+def check_user(user):
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+    return user
+
+
+def stateless_user(token):
+    """Пользователь из claims токена (режим STATELESS) или None"""
+    if get_config()['STATELESS'] and STATELESS_CLAIM in token:
+        values = {**token[STATELESS_CLAIM], User._meta.pk.attname: int(token[api_settings.USER_ID_CLAIM])}
+        return check_user(build_user(values))
+    return None
+
+
+def cached_user(token, generation):
+    """Пользователь из LRU процесса, если запись того же поколения, иначе None"""
+    user = get_cache().get(token_key(token), generation)
+    return None if user is None else check_user(user)
+
+
+def resolve_user(token):
+    """Пользователь по проверенному токену: из кэша, при промахе — одним запросом"""
+    user = stateless_user(token)
+    if user is None:
+        generation = get_generation(token_key(token)[0])
+        user = cached_user(token, generation) or load_user(token, generation)
+    return user
+
+
+async def aresolve_user(token):
+    """resolve_user для event loop: поколение — асинхронно, в поток БД только при промахе"""
+    user = stateless_user(token)
+    if user is None:
+        generation = await aget_generation(token_key(token)[0])
+        user = cached_user(token, generation) or await database_sync_to_async(load_user)(token, generation)
+    return user
+
+
+def load_user(token, generation=None):
+    """
+    Пользователь из БД с проверкой версии токена; кладётся в кэш. Поколение читается
+    до строки: изменение между ними оставит в LRU запись старого поколения, а не свежую метку
+    """
+    key = token_key(token)
+    user_id, version = key
+    if generation is None:
+        generation = get_generation(user_id)
+    try:
+        user = User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+    except (User.DoesNotExist, ValueError):
+        raise AuthenticationFailed(_('User not found'), code='user_not_found')
+    if api_settings.CHECK_REVOKE_TOKEN and version != get_md5_hash_password(user.password):
+        if version is not None or not get_config()['ACCEPT_UNVERSIONED']:
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+    get_cache().put(key, user, generation)
+    return check_user(user)
+
+
+def add_profile_claims(token, user):
+    """Поля профиля в токен — только в режиме STATELESS, иначе токены не раздуваются"""
+    if get_config()['STATELESS']:
+        token[STATELESS_CLAIM] = {
+            name: str(value) if name == 'avatar' else value
+            for name in STATELESS_FIELDS
+            if (value := getattr(user, name, None)) is not None
+        }
+    return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, в котором пользователь берётся из кэша users.authentication"""
+
+    def get_user(self, validated_token):
+        return resolve_user(validated_token)
+
+
+async def aauthenticate(request):
+    """
+    Пользователь запроса для async-вьюх: Bearer-токен (попадание в кэш — без потока БД)
+    или сессия. Ошибки токена — исключения DRF, как у CachedJWTAuthentication.
+    """
+    authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return await request.auser()
+    return await aresolve_user(authentication.get_validated_token(raw_token))
+
+
+class PetTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_profile_claims(super().get_token(user), user)
+
+
+class PetTokenRefreshSerializer(TokenRefreshSerializer):
+    """Обновление проверяет версию токена и перевыпускает claims профиля из БД"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        try:
+            user = load_user(refresh)
+        except AuthenticationFailed:
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        data = super().validate(attrs)
+        access = AccessToken(data['access'], verify=False)
+        data['access'] = str(add_profile_claims(access, user))
+        return data
+
+
+class JWTAuthMiddleware:
+    """
+    Channels: scope["user"] по ?token=<access>. Ставится внутрь AuthMiddlewareStack:
+    без токена остаётся пользователь сессии.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        values = parse_qs(scope.get('query_string', b'').decode()).get('token')
+        if values:
+            scope = dict(scope, user=await self.get_user(values[0]))
+        return await self.inner(scope, receive, send)
+
+    async def get_user(self, raw_token):
+        try:
+            # попадание в кэш не уходит в поток БД
+            return await aresolve_user(AccessToken(raw_token))
+        except (TokenError, InvalidToken, AuthenticationFailed):
+            return AnonymousUser()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_changed_user(sender, instance, **kwargs):
+    # после коммита: иначе другой воркер успеет закэшировать старую строку под новым поколением
+    transaction.on_commit(partial(invalidate_user, instance.pk))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def evict_blacklisted_user(sender, instance, **kwargs):
+    if instance.token.user_id is not None:
+        transaction.on_commit(partial(invalidate_user, instance.token.user_id))
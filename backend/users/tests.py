@@ -0,0 +1,42 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import generation_key, get_cache, get_generation, get_shared_cache, resolve_user
+
+User = get_user_model()
+
+
+class UserCacheGenerationTests(TestCase):
+    """Изменение пользователя в любом воркере сбрасывает его запись в LRU всех процессов"""
+
+    def setUp(self):
+        get_cache().clear()
+        get_shared_cache().clear()
+        self.user = User.objects.create_user(username='buyer', password='secret-pass')
+        self.token = AccessToken.for_user(self.user)
+
+    def test_cache_hit_skips_database(self):
+        resolve_user(self.token)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_user(self.token).pk, self.user.pk)
+
+    def test_change_in_other_worker_drops_cached_user(self):
+        resolve_user(self.token)
+        # другой воркер деактивировал пользователя: строка и поколение меняются не в этом процессе
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        get_shared_cache().set(generation_key(self.user.pk), time.time_ns())
+        with self.assertRaises(AuthenticationFailed):
+            resolve_user(self.token)
+
+    def test_save_bumps_generation_on_commit(self):
+        before = get_generation(self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.save()
+        self.assertEqual(get_generation(self.user.pk), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_generation(self.user.pk), before)
@@ -1,11 +1,12 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from ads.views import ProfileStatsView
 from . import views
 
 urlpatterns = [
     path("register/", views.RegisterView.as_view(), name="register"),
     path("profile/", views.ProfileView.as_view(), name="profile"),
-    path("profile/stats/", views.ProfileStatsView.as_view(), name="profile-stats"),
+    path("profile/stats/", ProfileStatsView.as_view(), name="profile-stats"),
 
     # JWT Auth endpoints (optional duplicates — main token endpoints also available in project urls)
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
@@ -30,8 +30,19 @@ function PetCard({ pet }) {
   return (
     <Link to={`/pets/${pet.id}`} className="pet-card">
       <div className="pet-image">
-        {pet.photo ? (
-          <img src={pet.photo} alt={pet.name} />
+        {pet.photo_variants ? (
+          <picture>
+            <source type="image/webp" srcSet={pet.photo_variants.srcset.webp} sizes="300px" />
+            <img
+              src={pet.photo_variants.thumb.jpeg}
+              srcSet={pet.photo_variants.srcset.jpeg}
+              sizes="300px"
+              alt={pet.name}
+              loading="lazy"
+            />
+          </picture>
+        ) : pet.photo ? (
+          <img src={pet.photo} alt={pet.name} loading="lazy" />
         ) : (
           <div className="no-photo">🐾</div>
         )}
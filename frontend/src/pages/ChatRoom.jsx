@@ -1,7 +1,15 @@
 import React, { useEffect, useRef, useState } from "react";
 import { useParams, Link } from "react-router-dom";
 import api from "../utils/api";
-import { getAccessToken, checkToken, logout } from "../utils/auth";
+import { checkToken, logout } from "../utils/auth";
+import {
+  addStreamListener,
+  markSeen,
+  sendChatMessage,
+  sendReadReceipt,
+  subscribeChat,
+  unsubscribeChat,
+} from "../utils/stream";
 import { toast } from "react-toastify";
 import "../styles/chat.css";
 
@@ -10,8 +18,9 @@ function ChatRoom() {
   const [messages, setMessages] = useState([]);
   const [chat, setChat] = useState(null);
   const [text, setText] = useState("");
-  const wsRef = useRef(null);
+  const lastIdRef = useRef(null);
   const scrollRef = useRef();
+  const chatId = Number(id);
 
   useEffect(() => {
     if (!checkToken()) {
@@ -23,12 +32,35 @@ function ChatRoom() {
   }, [id]);
 
   useEffect(() => {
-    connectWS();
+    lastIdRef.current = null;
+    const removeListener = addStreamListener(handleStreamEvent);
+    subscribeChat(chatId);
     return () => {
-      if (wsRef.current) wsRef.current.close();
+      unsubscribeChat(chatId);
+      removeListener();
     };
   }, [id]);
 
+  // добавляем только новые сообщения (после resume возможны дубли)
+  const appendMessages = (incoming) => {
+    if (!incoming.length) return;
+    lastIdRef.current = Math.max(lastIdRef.current || 0, ...incoming.map((m) => m.id));
+    markSeen(chatId, lastIdRef.current);
+    markRead(lastIdRef.current);
+    setMessages((prev) => {
+      const known = new Set(prev.map((m) => m.id));
+      return [...prev, ...incoming.filter((m) => !known.has(m.id))];
+    });
+    scrollToBottom();
+  };
+
+  // одна квитанция «прочитано до id» вместо отметки каждого сообщения
+  const markRead = (upTo) => {
+    if (!sendReadReceipt(chatId, upTo)) {
+      api.post(`/chats/${id}/read/`, { up_to: upTo }).catch(() => {});
+    }
+  };
+
   const fetchChat = async () => {
     try {
       const res = await api.get(`/chats/${id}/`);
@@ -41,47 +73,45 @@ function ChatRoom() {
   const fetchMessages = async () => {
     try {
       const res = await api.get(`/chats/${id}/messages/`);
-      setMessages(res.data);
+      const loaded = res.data.results || res.data;
+      setMessages(loaded);
+      if (loaded.length) {
+        lastIdRef.current = loaded[loaded.length - 1].id;
+        markSeen(chatId, lastIdRef.current);
+        markRead(lastIdRef.current);
+      }
       scrollToBottom();
     } catch {
       toast.error("Не удалось загрузить сообщения");
     }
   };
 
-  const connectWS = () => {
-    const token = getAccessToken();
-    if (!token) return;
-    const protocol = window.location.protocol === "https:" ? "wss" : "ws";
-    const host = window.location.host;
-    const wsUrl = `${protocol}://${host.replace(/:\d+$/, ":8000")}/ws/chat/${id}/?token=${token}`;
-    wsRef.current = new WebSocket(wsUrl);
-
-    wsRef.current.onmessage = (e) => {
+  // события общего соединения ws/stream/ — берём только свой диалог
+  const handleStreamEvent = async (data) => {
+    if (data.chat_id !== chatId) return;
+    if (data.type === "message" && data.message) {
+      appendMessages([data.message]);
+    } else if (data.type === "resync") {
       try {
-        const data = JSON.parse(e.data);
-        if (data.type === "message" && data.message) {
-          setMessages((prev) => [...prev, data.message]);
-          scrollToBottom();
-        }
-      } catch (err) {
-        console.error(err);
+        const res = await api.get(`/chats/${id}/messages/`, { params: { after: data.after } });
+        appendMessages(res.data.results);
+      } catch {
+        toast.error("Не удалось загрузить сообщения");
       }
-    };
+    }
   };
 
   const sendMessage = async () => {
     const msg = text.trim();
     if (!msg) return;
-    if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
-      wsRef.current.send(JSON.stringify({ type: "message", text: msg }));
+    if (sendChatMessage(chatId, msg)) {
       setText("");
       return;
     }
     try {
       const res = await api.post(`/chats/${id}/send/`, { text: msg });
-      setMessages((prev) => [...prev, res.data]);
+      appendMessages([res.data]);
       setText("");
-      scrollToBottom();
     } catch {
       toast.error("Ошибка отправки сообщения");
     }
@@ -59,7 +59,12 @@ function PetDetail() {
     <div className="pet-detail">
       <div className="pet-detail-content">
         <div className="pet-image">
-          {pet.photo ? (
+          {pet.photo_variants ? (
+            <picture>
+              <source type="image/webp" srcSet={pet.photo_variants.srcset.webp} />
+              <img src={pet.photo_variants.large.jpeg} srcSet={pet.photo_variants.srcset.jpeg} alt={pet.name} />
+            </picture>
+          ) : pet.photo ? (
             <img src={pet.photo} alt={pet.name} />
           ) : (
             <div className="no-photo">🐾</div>
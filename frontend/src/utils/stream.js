@@ -0,0 +1,83 @@
+import { getAccessToken } from './auth';
+
+// Одно WebSocket-соединение на вкладку (ws/stream/) для всех диалогов пользователя
+let socket = null;
+let reconnectTimer = null;
+const listeners = new Set();
+const subscriptions = new Map(); // chat_id -> id последнего полученного сообщения
+
+const streamUrl = (token) => {
+  const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+  const host = window.location.host.replace(/:\d+$/, ':8000');
+  return `${protocol}://${host}/ws/stream/?token=${token}`;
+};
+
+const sendFrame = (frame) => {
+  if (socket && socket.readyState === WebSocket.OPEN) {
+    socket.send(JSON.stringify(frame));
+    return true;
+  }
+  return false;
+};
+
+const connect = () => {
+  const token = getAccessToken();
+  if (!token || socket) return;
+  socket = new WebSocket(streamUrl(token));
+
+  socket.onopen = () => {
+    // после переподключения сервер дошлёт пропущенное по каждому открытому диалогу
+    subscriptions.forEach((after, chatId) => sendFrame({ type: 'subscribe', chat_id: chatId, after }));
+  };
+
+  socket.onmessage = (e) => {
+    try {
+      const data = JSON.parse(e.data);
+      if (data.type === 'message' && subscriptions.has(data.chat_id)) {
+        subscriptions.set(data.chat_id, Math.max(subscriptions.get(data.chat_id) || 0, data.message.id));
+      }
+      listeners.forEach((listener) => listener(data));
+    } catch (err) {
+      console.error(err);
+    }
+  };
+
+  socket.onclose = () => {
+    socket = null;
+    if (listeners.size && !reconnectTimer) {
+      reconnectTimer = setTimeout(() => {
+        reconnectTimer = null;
+        connect();
+      }, 3000);
+    }
+  };
+};
+
+export const addStreamListener = (listener) => {
+  listeners.add(listener);
+  connect();
+  return () => {
+    listeners.delete(listener);
+    if (!listeners.size && socket) socket.close();
+  };
+};
+
+export const subscribeChat = (chatId, after = null) => {
+  subscriptions.set(chatId, after);
+  sendFrame({ type: 'subscribe', chat_id: chatId, after });
+};
+
+export const unsubscribeChat = (chatId) => {
+  subscriptions.delete(chatId);
+  sendFrame({ type: 'unsubscribe', chat_id: chatId });
+};
+
+export const markSeen = (chatId, messageId) => {
+  if (subscriptions.has(chatId)) {
+    subscriptions.set(chatId, Math.max(subscriptions.get(chatId) || 0, messageId));
+  }
+};
+
+export const sendChatMessage = (chatId, text) => sendFrame({ type: 'message', chat_id: chatId, text });
+
+export const sendReadReceipt = (chatId, upTo) => sendFrame({ type: 'read', chat_id: chatId, up_to: upTo });